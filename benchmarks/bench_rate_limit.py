@@ -0,0 +1,73 @@
+"""Per-request cost of the rate limiter with the memory and SQLite bucket stores.
+
+Usage:
+    python benchmarks/bench_rate_limit.py [--requests 20000] [--clients 1000] [--threads 1]
+
+Each request checks the ``/generate`` limit for one of ``--clients`` keys, so
+most checks hit an existing bucket the way a busy server does. The SQLite
+store writes to a temp database.
+"""
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from modules.rate_limit import MemoryBucketStore, RateLimiter, SQLiteBucketStore, parse_rules  # noqa: E402
+
+
+def run(limiter: RateLimiter, requests: int, clients: int, threads: int) -> list[float]:
+    keys = [f"10.0.{i // 256}.{i % 256}" for i in range(clients)]
+    per_thread = requests // threads
+    samples: list[float] = []
+    lock = threading.Lock()
+
+    def work(seed: int):
+        rng = random.Random(seed)
+        local = []
+        for _ in range(per_thread):
+            key = rng.choice(keys)
+            start = time.perf_counter()
+            limiter.check("/generate", key)
+            local.append(time.perf_counter() - start)
+        with lock:
+            samples.extend(local)
+
+    workers = [threading.Thread(target=work, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return samples
+
+
+def report(name: str, samples: list[float]):
+    samples.sort()
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(
+        f"{name:>7}: mean {statistics.mean(samples) * 1e6:7.1f} us  "
+        f"median {statistics.median(samples) * 1e6:7.1f} us  p99 {p99 * 1e6:7.1f} us"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=1)
+    args = parser.parse_args()
+
+    rules = parse_rules("/generate=5/60")
+    report("memory", run(RateLimiter(rules, MemoryBucketStore(600)), args.requests, args.clients, args.threads))
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteBucketStore(Path(tmp) / "rate_limits.db", 600)
+        report("sqlite", run(RateLimiter(rules, store), args.requests, args.clients, args.threads))
+
+
+if __name__ == "__main__":
+    main()
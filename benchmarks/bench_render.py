@@ -0,0 +1,75 @@
+"""Time the final render at 1080x1920: libass burn-in vs. pre-rendered subtitle overlay.
+
+Usage:
+    python benchmarks/bench_render.py [--seconds 30] [--words-per-second 3] [--group 0] [--repeat 2]
+
+Synthetic inputs (test pattern background, sine voiceover, word-per-event
+subtitles) are generated with ffmpeg into a temp folder. The overlay timing
+includes building the sprites.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from modules.render_video import render_final_video  # noqa: E402
+from modules.utils import save_ass_subtitles  # noqa: E402
+
+VOCABULARY = "the quick brown fox jumps over a lazy dog while nobody watches it happen again".split()
+
+
+def make_inputs(folder: Path, seconds: int, words_per_second: float, group: int):
+    background = folder / "bg.mp4"
+    voice = folder / "voice.wav"
+    subs = folder / "subs.ass"
+    subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi", "-i", f"testsrc2=s=1080x1920:r=30:d={seconds}",
+         "-c:v", "libx264", "-preset", "veryfast", "-g", "30", str(background)],
+        check=True,
+    )
+    subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi", "-i", f"sine=f=220:d={seconds}", "-ar", "44100", str(voice)],
+        check=True,
+    )
+    step = 1 / words_per_second
+    words = [
+        {"start": i * step, "end": (i + 0.9) * step, "word": VOCABULARY[i % len(VOCABULARY)]}
+        for i in range(int(seconds * words_per_second))
+    ]
+    save_ass_subtitles(words, subs, group=group)
+    return background, voice, subs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=int, default=30)
+    parser.add_argument("--words-per-second", type=float, default=3.0)
+    parser.add_argument("--group", type=int, default=0, help="Karaoke words per event (0 = one word per event)")
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp)
+        background, voice, subs = make_inputs(folder, args.seconds, args.words_per_second, args.group)
+        results = {}
+        for name, overlay in (("burn-in (libass per frame)", False), ("overlay (sprites)", True)):
+            runs = []
+            for i in range(args.repeat):
+                start = time.perf_counter()
+                render_final_video(background, voice, subs, folder / f"out-{overlay}-{i}.mp4", prenormalized=True, overlay=overlay)
+                runs.append(time.perf_counter() - start)
+            results[name] = statistics.median(runs)
+
+    print(f"\n{args.seconds}s of 1080x1920 video, {args.words_per_second} words/s, group={args.group}")
+    baseline = results["burn-in (libass per frame)"]
+    for name, seconds in results.items():
+        print(f"{name:28} {seconds:7.2f}s  x{baseline / seconds:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Compare subtitle backends on CPU: WhisperX transcribe+align vs. forced alignment of the script.
+
+Usage:
+    python benchmarks/bench_subtitles.py --audio voice.wav --script script.txt [--model-size large-v3] [--repeat 3]
+
+Models are loaded once before timing so the numbers reflect per-job cost in
+the long-running server, not cold start. Also reports how many output words
+are not in the script (open transcription can invent or misspell words).
+"""
+import argparse
+import os
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# hide GPUs so both backends run on CPU
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+
+from modules.generate_subtitles import transcribe_words, align_script  # noqa: E402
+from modules.model_pool import warm_models  # noqa: E402
+
+_TOKEN_RE = re.compile(r"[^\w']+")
+
+
+def _normalize(word: str) -> str:
+    return _TOKEN_RE.sub("", word.lower())
+
+
+def _time(fn, repeat: int):
+    runs = []
+    words = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        words = fn()
+        runs.append(time.perf_counter() - start)
+    return runs, words
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--audio", required=True)
+    parser.add_argument("--script", required=True)
+    parser.add_argument("--model-size", default="large-v3")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    script_text = Path(args.script).read_text(encoding="utf-8")
+    script_words = {_normalize(w) for w in script_text.split()}
+
+    print("Loading models...")
+    warm_models([args.model_size], [args.language], device="cpu")
+
+    backends = {
+        "whisperx (transcribe + align)": lambda: transcribe_words(args.audio, model_size=args.model_size, test_mode=False),
+        "align (script only)": lambda: align_script(args.audio, script_text, language=args.language, test_mode=False),
+    }
+    print(f"{'backend':32} {'median s':>9} {'min s':>7} {'words':>6} {'not in script':>14}")
+    for name, fn in backends.items():
+        runs, words = _time(fn, args.repeat)
+        foreign = sum(1 for w in words if _normalize(w["word"]) not in script_words)
+        print(f"{name:32} {statistics.median(runs):9.2f} {min(runs):7.2f} {len(words):6d} {foreign:14d}")
+
+
+if __name__ == "__main__":
+    main()
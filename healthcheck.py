@@ -1,2 +1,20 @@
-import pipeline
-print('ok')
+"""Check that the pipeline imports and report whether the job queue has room.
+
+Exits 1 when the queue is saturated or, with ``JOB_EXECUTION=queue``, no
+worker is alive, matching the server's ``/ready`` endpoint.
+"""
+import json
+import os
+import sys
+
+import pipeline  # noqa: F401
+from modules.admission import job_slots, readiness
+from modules.job_store import get_job_store
+
+state = readiness(get_job_store(), job_slots(), queue_mode=os.getenv("JOB_EXECUTION", "inline") == "queue")
+print(json.dumps(state))
+if state["ready"]:
+    print("ok")
+else:
+    print("saturated" if state["saturated"] else "no live worker")
+sys.exit(0 if state["ready"] else 1)
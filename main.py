@@ -54,6 +54,7 @@ def run_cli():
     parser.add_argument("--dry-run", action="store_true", help="Run in test mode (no real API calls).")
     parser.add_argument("--debug", action="store_true", help="Enable debug output.")
     parser.add_argument("--validate-env", action="store_true", help="Check for .env and keys.")
+    parser.add_argument("--warm-backgrounds", nargs="*", metavar="VIDEO", help="Pre-normalize background videos (default: everything in assets/backgrounds).")
     args = parser.parse_args()
 
     if args.debug:
@@ -68,6 +69,13 @@ def run_cli():
     if args.validate_env:
         validate_env()
 
+    if args.warm_backgrounds is not None:
+        from modules.backgrounds import warm_cache
+
+        print("[INFO] Warming background cache...")
+        warmed = warm_cache(args.warm_backgrounds)
+        print(f"[OK] {len(warmed)} background(s) cached.")
+
     if args.dry_run:
         print("[INFO] Running in dry-run mode. No API calls will be made.")
         logging.info("Dry-run mode enabled.")
@@ -0,0 +1,74 @@
+"""Queue depth limits and wait estimates for incoming jobs."""
+import math
+import os
+
+from .job_store import JOB_LEASE_SECONDS
+
+# Queued (not yet started) jobs accepted before /generate answers 503
+MAX_QUEUE_DEPTH = int(os.getenv("MAX_QUEUE_DEPTH", "20"))
+# Assumed job length until some jobs have finished
+DEFAULT_JOB_SECONDS = float(os.getenv("DEFAULT_JOB_SECONDS", "120"))
+# Finished jobs averaged for the estimate
+ETA_SAMPLE_SIZE = 20
+
+
+def job_seconds(job: dict) -> float | None:
+    """Time a finished job spent in its pipeline stages."""
+    timings = job.get("stage_timings")
+    if timings:
+        # overlapping stages make this a slight overestimate, which is the safe side
+        return sum(timings.values())
+    return job.get("duration_seconds")
+
+
+def recent_job_seconds(store, sample: int = ETA_SAMPLE_SIZE) -> float:
+    """Mean duration of the most recently finished jobs, or ``DEFAULT_JOB_SECONDS``."""
+    durations = [d for d in (job_seconds(j) for j in store.recent("complete", sample)) if d]
+    return sum(durations) / len(durations) if durations else DEFAULT_JOB_SECONDS
+
+
+def queue_state(store, slots: int, max_depth: int | None = None) -> dict:
+    """Snapshot of the queue: depth, running jobs and whether new jobs are refused."""
+    max_depth = MAX_QUEUE_DEPTH if max_depth is None else max_depth
+    queued = store.count_by_status("queued")
+    processing = store.count_by_status("processing")
+    return {
+        "queued": queued,
+        "processing": processing,
+        "slots": slots,
+        "max_queue_depth": max_depth,
+        "saturated": max_depth > 0 and queued >= max_depth,
+    }
+
+
+def queue_position(store, job_id: str) -> int:
+    """1-based position of a queued job, 0 once it has started."""
+    return store.queue_position(job_id)
+
+
+def estimate_wait(position: int, slots: int, per_job: float) -> int:
+    """Seconds until a job at ``position`` finishes with ``slots`` jobs running at once."""
+    rounds = math.ceil(max(position, 1) / max(slots, 1))
+    return int(math.ceil(rounds * per_job))
+
+
+def retry_after(slots: int, per_job: float) -> int:
+    """Seconds until a slot is likely to free up."""
+    return max(1, int(math.ceil(per_job / max(slots, 1))))
+
+
+def readiness(store, slots: int, *, queue_mode: bool, max_depth: int | None = None) -> dict:
+    """:func:`queue_state` plus ``ready``: the queue has room and, in queue mode, a live worker drains it."""
+    state = queue_state(store, slots, max_depth)
+    ready = not state["saturated"]
+    if queue_mode:
+        state["workers"] = store.live_workers(JOB_LEASE_SECONDS)
+        ready = ready and state["workers"] > 0
+    return {**state, "ready": ready}
+
+
+def job_slots() -> int:
+    """Jobs that run at once: the server's threads inline, the worker's concurrency with a queue."""
+    if os.getenv("JOB_EXECUTION", "inline") == "queue":
+        return int(os.getenv("WORKER_CONCURRENCY", "2"))
+    return int(os.getenv("JOB_WORKERS", "3"))
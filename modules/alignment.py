@@ -0,0 +1,189 @@
+"""Word timings from the known script: TTS character alignment, an
+energy-based fallback aligner, and sentence segmentation for forced alignment."""
+import re
+import sys
+import wave
+from array import array
+from pathlib import Path
+
+from .utils import get_logger
+
+logger = get_logger(__name__)
+
+# Analysis frame for the energy aligner
+FRAME_SECONDS = 0.02
+# Frames quieter than this fraction of the loudest frame count as pauses
+VOICE_THRESHOLD = 0.05
+# Silences at least this long are treated as possible sentence breaks
+MIN_PAUSE_SECONDS = 0.2
+# Sentence boundaries only move to a pause this close to their estimate
+MAX_SNAP_SECONDS = 2.0
+
+_WORD_RE = re.compile(r"\w")
+_SENTENCE_RE = re.compile(r"(?<=[.!?…])\s+")
+
+
+def words_from_characters(alignment: dict, offset: float = 0.0) -> list[dict]:
+    """Turn ElevenLabs character timings into ``start``/``end``/``word`` segments.
+
+    ``alignment`` holds ``characters`` with matching
+    ``character_start_times_seconds`` and ``character_end_times_seconds``
+    lists. Tokens without a letter or digit (dashes, lone quotes) are dropped.
+    """
+    chars = alignment.get("characters") or []
+    starts = alignment.get("character_start_times_seconds") or []
+    ends = alignment.get("character_end_times_seconds") or []
+    words = []
+    current = None
+    for ch, start, end in zip(chars, starts, ends):
+        if ch.isspace():
+            if current is not None:
+                words.append(current)
+                current = None
+            continue
+        if current is None:
+            current = {"start": start, "end": end, "word": ch}
+        else:
+            current["word"] += ch
+            current["end"] = end
+    if current is not None:
+        words.append(current)
+    return [
+        {"start": round(w["start"] + offset, 3), "end": round(w["end"] + offset, 3), "word": w["word"]}
+        for w in words
+        if _WORD_RE.search(w["word"])
+    ]
+
+
+def shift_words(words: list[dict], offset: float) -> list[dict]:
+    return [{**w, "start": round(w["start"] + offset, 3), "end": round(w["end"] + offset, 3)} for w in words]
+
+
+def frame_energies(audio_path, frame_seconds: float = FRAME_SECONDS) -> list[float]:
+    """Mean square amplitude of each ``frame_seconds`` frame of a 16-bit WAV."""
+    with wave.open(str(audio_path), "rb") as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"unsupported sample width: {wf.getsampwidth()}")
+        channels = wf.getnchannels()
+        frames_per = max(1, int(wf.getframerate() * frame_seconds))
+        energies = []
+        while True:
+            data = wf.readframes(frames_per)
+            if not data:
+                break
+            samples = array("h")
+            samples.frombytes(data[: len(data) - len(data) % 2])
+            if sys.byteorder == "big":
+                samples.byteswap()
+            n = len(samples) // channels or 1
+            energies.append(sum(s * s for s in samples) / (n * channels))
+    return energies
+
+
+def voiced_frames(energies: list[float], threshold: float = VOICE_THRESHOLD) -> list[bool]:
+    peak = max(energies, default=0)
+    if peak <= 0:
+        # silent (e.g. test mode) audio: treat everything as speech
+        return [True] * len(energies)
+    return [e >= peak * threshold for e in energies]
+
+
+def proportional_align(text: str, audio_path, frame_seconds: float = FRAME_SECONDS) -> list[dict]:
+    """Spread the script's words over the voiced frames of ``audio_path``.
+
+    Each word gets speaking time proportional to its length, and pauses found
+    by the energy detector are skipped, so timings drift far less than a plain
+    even split over the clip.
+    """
+    tokens = [w for w in text.split() if _WORD_RE.search(w)]
+    energies = frame_energies(Path(audio_path), frame_seconds)
+    if not tokens or not energies:
+        return []
+    voiced_starts = [i * frame_seconds for i, v in enumerate(voiced_frames(energies)) if v]
+    total = len(voiced_starts) * frame_seconds
+
+    def real_time(t: float) -> float:
+        idx = min(int(t / frame_seconds), len(voiced_starts) - 1)
+        return voiced_starts[idx] + (t - idx * frame_seconds)
+
+    weights = [len(w) + 1 for w in tokens]
+    scale = total / sum(weights)
+    words = []
+    pos = 0.0
+    for token, weight in zip(tokens, weights):
+        span = weight * scale
+        start = real_time(pos)
+        end = real_time(pos + span - 1e-9)
+        words.append({"start": round(start, 3), "end": round(max(start, end), 3), "word": token})
+        pos += span
+    return words
+
+
+def split_sentences(text: str) -> list[str]:
+    sentences = []
+    for line in text.splitlines():
+        sentences.extend(s.strip() for s in _SENTENCE_RE.split(line) if _WORD_RE.search(s))
+    return sentences
+
+
+def pauses(energies: list[float], frame_seconds: float = FRAME_SECONDS, min_pause: float = MIN_PAUSE_SECONDS) -> list[float]:
+    """Midpoints of the silent stretches between voiced frames."""
+    voiced = voiced_frames(energies)
+    midpoints = []
+    run_start = None
+    seen_voice = False
+    for i, v in enumerate(voiced + [True]):
+        if not v and run_start is None:
+            run_start = i
+        elif v and run_start is not None:
+            if seen_voice and i < len(voiced) and (i - run_start) * frame_seconds >= min_pause:
+                midpoints.append((run_start + i) / 2 * frame_seconds)
+            run_start = None
+        seen_voice = seen_voice or v
+    return midpoints
+
+
+def sentence_segments(text: str, audio_path, frame_seconds: float = FRAME_SECONDS) -> list[dict]:
+    """Rough ``text``/``start``/``end`` segments for each script sentence.
+
+    Boundaries are first placed in proportion to sentence length, then moved
+    to the nearest detected pause, which is where a TTS voice breaks between
+    sentences. The segments only need to contain their sentence; the
+    alignment model finds the exact word times inside them.
+    """
+    sentences = split_sentences(text)
+    energies = frame_energies(Path(audio_path), frame_seconds)
+    duration = len(energies) * frame_seconds
+    if not sentences or not energies:
+        return []
+    gaps = pauses(energies, frame_seconds)
+
+    total_chars = sum(len(s) for s in sentences)
+    boundaries = [0.0]
+    consumed = 0
+    for sentence in sentences[:-1]:
+        consumed += len(sentence)
+        target = duration * consumed / total_chars
+        snapped = min(gaps, key=lambda g: abs(g - target)) if gaps else target
+        if abs(snapped - target) > MAX_SNAP_SECONDS:
+            snapped = target
+        # never snap backwards past the previous boundary
+        boundaries.append(snapped if snapped > boundaries[-1] else max(target, boundaries[-1]))
+    boundaries.append(duration)
+    return [
+        {"text": s, "start": round(start, 3), "end": round(end, 3)}
+        for s, start, end in zip(sentences, boundaries, boundaries[1:])
+    ]
+
+
+def fill_missing_times(words: list[dict]) -> list[dict]:
+    """Give words the aligner could not place (numbers, symbols) the times of their neighbours."""
+    filled = []
+    for i, w in enumerate(words):
+        if "start" in w and "end" in w:
+            filled.append(w)
+            continue
+        prev_end = filled[-1]["end"] if filled else 0.0
+        next_start = next((n["start"] for n in words[i + 1:] if "start" in n), prev_end)
+        filled.append({**w, "start": prev_end, "end": max(prev_end, next_start)})
+    return filled
@@ -0,0 +1,160 @@
+"""Combine transcription requests from concurrent jobs into WhisperX batches."""
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+
+from .generate_subtitles import transcribe_batch
+from .utils import get_logger, get_test_mode
+
+logger = get_logger(__name__)
+
+# How long the first request waits for others to join its batch; 0 (default) disables the batcher
+ASR_BATCH_WINDOW_MS = int(os.getenv("ASR_BATCH_WINDOW_MS", "0"))
+ASR_MAX_BATCH = int(os.getenv("ASR_MAX_BATCH", "8"))
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+class ASRBatcher:
+    """Single worker thread that collects requests for a short window and
+    transcribes them in one :func:`transcribe_batch` call per model size.
+
+    Files still run one at a time; each request's future resolves as soon as
+    its own file is done, not when the whole batch is.
+    """
+
+    def __init__(self, window_seconds: float, max_batch: int, transcribe=transcribe_batch):
+        self.window_seconds = window_seconds
+        self.max_batch = max(1, max_batch)
+        self._transcribe = transcribe
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = None
+        self._stats = {"batches": 0, "items": 0, "largest_batch": 0}
+        self._stats_lock = threading.Lock()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="asr-batcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Finish the requests already queued, then stop the worker."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, audio_path, *, model_size: str = "large-v3", test_mode: bool | None = None) -> Future:
+        if self._thread is None:
+            raise RuntimeError("ASR batcher is not running")
+        if test_mode is None:
+            test_mode = get_test_mode()
+        future: Future = Future()
+        self._queue.put((audio_path, model_size, test_mode, future))
+        return future
+
+    def transcribe(self, audio_path, **kwargs) -> list[dict]:
+        """Blocking equivalent of :func:`transcribe_words` that shares a batch."""
+        result = self.submit(audio_path, **kwargs).result()
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None, True
+        batch = [first]
+        deadline = time.monotonic() + self.window_seconds
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._collect()
+            if batch:
+                self._process(batch)
+
+    def _process(self, batch):
+        """Transcribe one batch; every future is resolved even if something unexpected fails."""
+        error = None
+        try:
+            groups = defaultdict(list)
+            for item in batch:
+                groups[(item[1], item[2])].append(item)
+            for (model_size, test_mode), items in groups.items():
+
+                def resolve(index, result, items=items):
+                    future = items[index][3]
+                    if not future.done():
+                        future.set_result(result)
+
+                try:
+                    results = list(self._transcribe(
+                        [i[0] for i in items], model_size=model_size, test_mode=test_mode, on_result=resolve
+                    ))
+                    if len(results) != len(items):
+                        raise RuntimeError(f"ASR backend returned {len(results)} results for {len(items)} files")
+                except Exception as e:
+                    results = [e] * len(items)
+                for (_, _, _, future), result in zip(items, results):
+                    if not future.done():
+                        future.set_result(result)
+            with self._stats_lock:
+                self._stats["batches"] += 1
+                self._stats["items"] += len(batch)
+                self._stats["largest_batch"] = max(self._stats["largest_batch"], len(batch))
+            if len(batch) > 1:
+                logger.info(f"Transcribed {len(batch)} queued jobs in one batch")
+        except Exception as e:
+            logger.error(f"ASR batch failed: {e}")
+            error = e
+        finally:
+            for _, _, _, future in batch:
+                if not future.done():
+                    future.set_exception(error or RuntimeError("ASR batch was interrupted"))
+
+
+def start_asr_batcher(window_ms: int | None = None, max_batch: int | None = None) -> ASRBatcher | None:
+    """Start the shared batcher; returns ``None`` when the window is 0 (disabled)."""
+    global _batcher
+    window_ms = ASR_BATCH_WINDOW_MS if window_ms is None else window_ms
+    if window_ms <= 0:
+        return None
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = ASRBatcher(window_ms / 1000, max_batch or ASR_MAX_BATCH).start()
+        return _batcher
+
+
+def stop_asr_batcher():
+    global _batcher
+    with _batcher_lock:
+        batcher, _batcher = _batcher, None
+    if batcher is not None:
+        batcher.stop()
+
+
+def get_asr_batcher() -> ASRBatcher | None:
+    """Return the running shared batcher, if any."""
+    return _batcher
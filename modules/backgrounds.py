@@ -0,0 +1,383 @@
+"""Library of background clips pre-normalized for rendering."""
+import bisect
+import hashlib
+import itertools
+import json
+import os
+import random
+import re
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import uuid
+from pathlib import Path
+
+from .utils import get_logger, get_data_dir, PROJECT_ROOT
+
+logger = get_logger(__name__)
+
+BACKGROUND_CACHE_DIR = Path(os.getenv("BACKGROUND_CACHE_DIR", str(get_data_dir() / "backgrounds")))
+BACKGROUNDS_ROOT = PROJECT_ROOT / "assets" / "backgrounds"
+VIDEO_EXTENSIONS = {".mp4", ".webm", ".mov", ".mkv", ".avi"}
+
+# Bump when the mezzanine encoding settings change
+MEZZANINE_VERSION = "v1"
+# Keyframe every second at 30 fps so seeks land close to the requested time
+MEZZANINE_GOP = 30
+
+OFFSET_STRATEGIES = ("start", "random", "round-robin", "seeded")
+# Offset strategy for renders that do not pick one, such as API jobs
+BACKGROUND_OFFSET = os.getenv("BACKGROUND_OFFSET", "start")
+
+_ASSET_ID_RE = re.compile(r"[0-9a-f]{64}")
+_HASH_BLOCK = 1024 * 1024
+_index_lock = threading.Lock()
+_hash_local = threading.local()
+_key_locks: dict[str, threading.Lock] = {}
+_round_robin: dict[str, itertools.count] = {}
+_keyframe_indexes: dict[str, dict] = {}
+
+
+def _hash_db() -> sqlite3.Connection:
+    """Per-thread connection to the path -> hash index, shared safely by every process."""
+    path = BACKGROUND_CACHE_DIR / "hash_index.db"
+    conns = getattr(_hash_local, "conns", None)
+    if conns is None:
+        conns = _hash_local.conns = {}
+    conn = conns.get(path)
+    if conn is None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS hashes (path TEXT PRIMARY KEY, stamp TEXT NOT NULL, sha256 TEXT NOT NULL)"
+        )
+        conns[path] = conn
+    return conn
+
+
+def _atomic_write_json(path: Path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _stamp(path: Path) -> str:
+    st = path.stat()
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def content_hash(path) -> str:
+    """Return the SHA-256 of a file, memoized by path, size and mtime."""
+    path = Path(path).resolve()
+    stamp = _stamp(path)
+    row = _hash_db().execute("SELECT stamp, sha256 FROM hashes WHERE path = ?", (str(path),)).fetchone()
+    if row and row[0] == stamp:
+        return row[1]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+            digest.update(block)
+    sha = digest.hexdigest()
+    record_hash(path, sha)
+    return sha
+
+
+def record_hash(path, sha: str):
+    """Remember a hash computed elsewhere (e.g. while receiving an upload) so it is not recomputed."""
+    path = Path(path).resolve()
+    _hash_db().execute(
+        "INSERT OR REPLACE INTO hashes (path, stamp, sha256) VALUES (?, ?, ?)", (str(path), _stamp(path), sha)
+    )
+
+
+def forget_hash(path):
+    """Drop the index entry of a file that is about to be deleted."""
+    _hash_db().execute("DELETE FROM hashes WHERE path = ?", (str(Path(path).resolve()),))
+
+
+def prune_hash_index() -> int:
+    """Remove entries for files that no longer exist; returns how many were dropped."""
+    conn = _hash_db()
+    missing = [(p,) for (p,) in conn.execute("SELECT path FROM hashes") if not os.path.exists(p)]
+    conn.executemany("DELETE FROM hashes WHERE path = ?", missing)
+    return len(missing)
+
+
+def mezzanine_path(sha: str) -> Path:
+    return BACKGROUND_CACHE_DIR / f"{sha}.{MEZZANINE_VERSION}.mp4"
+
+
+def normalize_background(src) -> Path:
+    """Return a cached 1080x1920, keyframe-dense copy of ``src``, transcoding it on first use."""
+    src = Path(src)
+    sha = content_hash(src)
+    dest = mezzanine_path(sha)
+    if dest.exists():
+        os.utime(dest)
+        return dest
+
+    with _index_lock:
+        lock = _key_locks.setdefault(sha, threading.Lock())
+    with lock:
+        if dest.exists():
+            return dest
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=dest.parent, suffix=".mp4")
+        os.close(fd)
+        cmd = [
+            "ffmpeg",
+            "-y",
+            "-i", str(src),
+            "-vf", "scale=1080:1920,setsar=1",
+            "-an",
+            "-c:v", "libx264",
+            "-preset", "veryfast",
+            "-crf", "18",
+            "-pix_fmt", "yuv420p",
+            "-g", str(MEZZANINE_GOP),
+            "-keyint_min", str(MEZZANINE_GOP),
+            "-sc_threshold", "0",
+            "-movflags", "+faststart",
+            tmp,
+        ]
+        logger.info(f"Normalizing background {src.name} -> {dest.name}")
+        try:
+            subprocess.run(cmd, check=True)
+            os.replace(tmp, dest)
+        finally:
+            Path(tmp).unlink(missing_ok=True)
+    return dest
+
+
+def find_backgrounds(root: Path = BACKGROUNDS_ROOT) -> list[Path]:
+    if not root.exists():
+        return []
+    return sorted(p for p in root.rglob("*") if p.is_file() and p.suffix.lower() in VIDEO_EXTENSIONS)
+
+
+def warm_cache(paths=None) -> list[Path]:
+    """Normalize every background under ``assets/backgrounds`` (or ``paths``) ahead of rendering."""
+    sources = [Path(p) for p in paths] if paths else find_backgrounds()
+    warmed = []
+    for src in sources:
+        try:
+            warmed.append(normalize_background(src))
+        except (OSError, subprocess.CalledProcessError) as e:
+            logger.error(f"Failed to normalize {src}: {e}")
+    return warmed
+
+
+def probe_keyframes(path) -> dict:
+    """Read duration and keyframe timestamps from the container without decoding."""
+    duration = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", str(path)],
+        check=True, capture_output=True, text=True,
+    ).stdout.strip()
+    packets = subprocess.run(
+        [
+            "ffprobe", "-v", "error",
+            "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,flags",
+            "-of", "csv=p=0",
+            str(path),
+        ],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    keyframes = []
+    for line in packets.splitlines():
+        pts, _, flags = line.partition(",")
+        if "K" in flags and pts not in ("", "N/A"):
+            keyframes.append(float(pts))
+    keyframes.sort()
+    return {"duration": float(duration), "keyframes": keyframes}
+
+
+def keyframe_index(path) -> dict:
+    """Return the cached ``{"duration", "keyframes"}`` index for a video, probing it once."""
+    sha = content_hash(path)
+    index = _keyframe_indexes.get(sha)
+    if index is not None:
+        return index
+    index_path = BACKGROUND_CACHE_DIR / f"{sha}.keyframes.json"
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (FileNotFoundError, ValueError):
+        index = probe_keyframes(path)
+        _atomic_write_json(index_path, index)
+    _keyframe_indexes[sha] = index
+    return index
+
+
+def probe_video(path) -> dict:
+    """Probe duration, resolution and keyframe timestamps of a video."""
+    size = subprocess.run(
+        [
+            "ffprobe", "-v", "error",
+            "-select_streams", "v:0",
+            "-show_entries", "stream=width,height",
+            "-of", "csv=p=0",
+            str(path),
+        ],
+        check=True, capture_output=True, text=True,
+    ).stdout.strip()
+    width, height = (int(v) for v in size.split(",")[:2])
+    return {**probe_keyframes(path), "width": width, "height": height}
+
+
+def library_dir() -> Path:
+    return BACKGROUND_CACHE_DIR / "library"
+
+
+def _link_or_copy(src: Path, dest: Path):
+    try:
+        os.link(src, dest)
+    except OSError:
+        # different filesystem, or links unsupported
+        shutil.copy2(src, dest)
+
+
+def _publish(tmp: Path, dest: Path) -> bool:
+    """Put the finished file ``tmp`` at ``dest`` in one step; ``False`` if ``dest`` already exists.
+
+    Library files are named by content hash, so an existing ``dest`` holds
+    the same bytes and is never replaced or removed.
+    """
+    try:
+        os.link(tmp, dest)
+    except FileExistsError:
+        return False
+    except OSError:
+        if dest.exists():
+            return False
+        # links unsupported; a rename is just as atomic
+        os.replace(tmp, dest)
+    return True
+
+
+def get_asset(asset_id: str) -> dict | None:
+    """Return the stored metadata of a library background, or ``None``."""
+    if not _ASSET_ID_RE.fullmatch(asset_id or ""):
+        return None
+    try:
+        with open(library_dir() / f"{asset_id}.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    return meta if (library_dir() / meta["file"]).exists() else None
+
+
+def asset_path(asset_id: str) -> Path | None:
+    meta = get_asset(asset_id)
+    return library_dir() / meta["file"] if meta else None
+
+
+def ingest_background(src, filename: str | None = None, sha: str | None = None) -> tuple[dict, bool]:
+    """Add ``src`` to the background library, keyed by its content hash.
+
+    The file is hard-linked into the library, and duration, resolution and
+    keyframes are probed once here so later renders never probe it again.
+    Returns the asset metadata and whether it was new; a clip that is
+    already stored is left as it is. The clip is staged under a unique name
+    and only linked into place once probed, so concurrent ingests of the same
+    clip, in this or another process, never remove each other's file.
+    """
+    src = Path(src)
+    sha = sha or content_hash(src)
+    with _index_lock:
+        lock = _key_locks.setdefault(sha, threading.Lock())
+    with lock:
+        existing = get_asset(sha)
+        if existing is not None:
+            return existing, False
+        suffix = Path(filename or src.name).suffix.lower()
+        suffix = suffix if suffix in VIDEO_EXTENSIONS else ".mp4"
+        dest = library_dir() / f"{sha}{suffix}"
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_name(f".{sha}.{uuid.uuid4().hex}{suffix}")
+        try:
+            _link_or_copy(src, tmp)
+            try:
+                info = probe_video(tmp)
+            except (OSError, ValueError, subprocess.CalledProcessError) as e:
+                raise ValueError(f"not a readable video: {e}") from e
+            # losing the race means another ingest stored the same bytes; its metadata matches ours
+            created = _publish(tmp, dest)
+        finally:
+            tmp.unlink(missing_ok=True)
+        record_hash(dest, sha)
+        existing = None if created else get_asset(sha)
+        if existing is not None:
+            return existing, False
+        index = {"duration": info["duration"], "keyframes": info["keyframes"]}
+        _atomic_write_json(BACKGROUND_CACHE_DIR / f"{sha}.keyframes.json", index)
+        _keyframe_indexes[sha] = index
+        meta = {
+            "id": sha,
+            "file": dest.name,
+            "filename": Path(filename or src.name).name,
+            "bytes": dest.stat().st_size,
+            "duration": info["duration"],
+            "width": info["width"],
+            "height": info["height"],
+            "keyframes": len(info["keyframes"]),
+        }
+        _atomic_write_json(library_dir() / f"{sha}.json", meta)
+    if created:
+        logger.info(f"Stored background {meta['filename']} as {sha[:12]}")
+    return meta, created
+
+
+def checkout_asset(asset_id: str, dest) -> Path:
+    """Hard-link a library background to ``dest`` for one job; removing ``dest`` leaves the library intact.
+
+    The link is indexed under the asset's hash so offset selection does not
+    hash it again; call :func:`forget_hash` before deleting it.
+    """
+    src = asset_path(asset_id)
+    if src is None:
+        raise FileNotFoundError(asset_id)
+    dest = Path(dest)
+    _link_or_copy(src, dest)
+    record_hash(dest, asset_id)
+    return dest
+
+
+def select_offset(path, audio_duration: float, strategy: str = "start", seed=None) -> float:
+    """Pick a start offset that leaves ``audio_duration`` seconds of background.
+
+    The chosen time is snapped back to the nearest preceding keyframe so an
+    input-side ``-ss`` starts decoding exactly where the segment begins.
+    """
+    if strategy == "start":
+        return 0.0
+    if strategy not in OFFSET_STRATEGIES:
+        raise ValueError(f"unknown offset strategy: {strategy}")
+    index = keyframe_index(path)
+    max_start = index["duration"] - audio_duration
+    if max_start <= 0:
+        return 0.0
+
+    if strategy == "random":
+        target = random.uniform(0, max_start)
+    elif strategy == "seeded":
+        target = random.Random(str(seed)).uniform(0, max_start)
+    else:
+        # consecutive calls walk through back-to-back segments of the clip
+        sha = content_hash(path)
+        with _index_lock:
+            counter = _round_robin.setdefault(sha, itertools.count())
+            n = next(counter)
+        target = (n * audio_duration) % (max_start + audio_duration)
+        target = min(target, max_start)
+
+    keyframes = index["keyframes"]
+    i = bisect.bisect_right(keyframes, target) - 1
+    return keyframes[i] if i >= 0 else 0.0
@@ -0,0 +1,270 @@
+"""Minimal stage scheduler used to run the pipeline as a dependency graph."""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+
+from .utils import get_logger
+
+logger = get_logger(__name__)
+
+# Process-wide pools so concurrent jobs share the CPU budget instead of
+# each starting its own WhisperX/libx264 work at the same time.
+DAG_CPU_WORKERS = int(os.getenv("DAG_CPU_WORKERS", "2"))
+DAG_IO_WORKERS = int(os.getenv("DAG_IO_WORKERS", "8"))
+
+_pools: dict[str, ThreadPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(kind: str) -> ThreadPoolExecutor:
+    with _pools_lock:
+        if kind not in _pools:
+            workers = DAG_CPU_WORKERS if kind == "cpu" else DAG_IO_WORKERS
+            _pools[kind] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"stage-{kind}")
+        return _pools[kind]
+
+
+class Cancelled(RuntimeError):
+    """Raised by :func:`run_stages` when its ``cancel`` event was set."""
+
+
+class Stage:
+    """One node of the pipeline graph.
+
+    ``fn(ctx)`` returns a dict merged into the shared context (its declared
+    ``outputs``). A stage starts once every stage in ``requires`` has
+    finished, whether it succeeded or not, mirroring the sequential pipeline
+    where later steps still ran after a non-strict failure. Set
+    ``skip_on_failure`` to skip the stage instead when a requirement failed or
+    was skipped, and ``when`` to decide at start time whether it runs at all.
+    ``critical`` stages abort the run on failure even without ``strict``.
+
+    ``artifacts(ctx)`` names the files the stage leaves behind, and
+    ``fingerprint(ctx)`` hashes its inputs; together they let a
+    :class:`StageManifest` skip the stage when nothing it depends on changed.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn,
+        *,
+        requires=(),
+        outputs=(),
+        pool: str = "io",
+        when=None,
+        skip_on_failure: bool = False,
+        critical: bool = False,
+        fingerprint=None,
+        artifacts=None,
+    ):
+        self.name = name
+        self.fn = fn
+        self.requires = tuple(requires)
+        self.outputs = tuple(outputs)
+        self.pool = pool
+        self.when = when
+        self.skip_on_failure = skip_on_failure
+        self.critical = critical
+        self.fingerprint = fingerprint
+        self.artifacts = artifacts
+
+
+def fingerprint_of(*parts) -> str:
+    """Stable hash of JSON-serializable parts."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _encode(value):
+    if isinstance(value, Path):
+        return {"__path__": str(value)}
+    if isinstance(value, dict):
+        return {k: _encode(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(v) for v in value]
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        if set(value) == {"__path__"}:
+            return Path(value["__path__"])
+        return {k: _decode(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    return value
+
+
+class StageManifest:
+    """Fingerprints and outputs of completed stages, stored as JSON next to their artifacts."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self._entries = {}
+
+    def lookup(self, stage: "Stage", fingerprint: str, ctx: dict) -> dict | None:
+        """Return the recorded outputs if ``stage`` ran with ``fingerprint`` and its artifacts still exist."""
+        entry = self._entries.get(stage.name)
+        if not entry or entry["fingerprint"] != fingerprint:
+            return None
+        outputs = _decode(entry["outputs"])
+        if stage.artifacts is not None:
+            files = stage.artifacts({**ctx, **outputs})
+            if not all(Path(p).exists() for p in files.values()):
+                return None
+        return outputs
+
+    def record(self, name: str, fingerprint: str, outputs: dict):
+        self._entries[name] = {"fingerprint": fingerprint, "outputs": _encode(outputs or {})}
+        self._save()
+
+    def invalidate(self, name: str):
+        if self._entries.pop(name, None) is not None:
+            self._save()
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+def _timed(fn, ctx):
+    start = time.perf_counter()
+    result = fn(ctx)
+    return result, time.perf_counter() - start
+
+
+def run_stages(stages, ctx: dict, *, strict: bool = False, errors: list | None = None, timings: dict | None = None, listener=None, cancel=None) -> dict:
+    """Run ``stages`` concurrently where their dependencies allow.
+
+    Failures are appended to ``errors`` (ordered by stage declaration, not
+    completion) as the exception's first argument. With ``strict`` no new
+    stage is started after the first failure and that exception is re-raised
+    once the running stages have finished. Returns the final state of every
+    stage: ``"done"``, ``"reused"``, ``"failed"`` or ``"skipped"``.
+
+    When ``ctx["stage_manifest"]`` holds a :class:`StageManifest`, stages
+    with a matching fingerprint are not run again; their recorded outputs are
+    merged into ``ctx`` instead. Each stage's artifacts are collected in
+    ``ctx["artifacts"]``.
+
+    Once ``cancel`` (a ``threading.Event``) is set no further stage starts;
+    the running ones finish and :class:`Cancelled` is raised.
+    """
+    errors = errors if errors is not None else []
+    timings = timings if timings is not None else {}
+    names = {s.name for s in stages}
+    for stage in stages:
+        missing = set(stage.requires) - names
+        if missing:
+            raise ValueError(f"Stage {stage.name} requires unknown stages: {sorted(missing)}")
+    order = {s.name: i for i, s in enumerate(stages)}
+
+    def notify(name, status):
+        if listener is not None:
+            try:
+                listener(name, status)
+            except Exception as e:
+                logger.debug(f"Stage listener failed: {e}")
+
+    state: dict[str, str] = {}
+    fingerprints: dict[str, str] = {}
+    artifacts = ctx.setdefault("artifacts", {}) if any(s.artifacts for s in stages) else {}
+    error_order: list[int] = []
+    pending = list(stages)
+    running = {}
+    abort_exc = None
+
+    while pending or running:
+        if cancel is not None and cancel.is_set() and abort_exc is None:
+            abort_exc = Cancelled("run cancelled")
+        progressed = True
+        while progressed and abort_exc is None:
+            progressed = False
+            for stage in list(pending):
+                if not all(r in state for r in stage.requires):
+                    continue
+                pending.remove(stage)
+                progressed = True
+                failed_dep = any(state[r] not in ("done", "reused") for r in stage.requires)
+                if (stage.skip_on_failure and failed_dep) or (stage.when is not None and not stage.when(ctx)):
+                    state[stage.name] = "skipped"
+                    notify(stage.name, "skipped")
+                    continue
+                # an early stage may create the manifest, so look it up each time
+                manifest = ctx.get("stage_manifest")
+                if manifest is not None and stage.fingerprint is not None:
+                    ctx["fingerprints"] = fingerprints
+                    try:
+                        fingerprint = stage.fingerprint(ctx)
+                    except Exception as e:
+                        # let the stage itself run and report the problem
+                        logger.debug(f"Could not fingerprint stage {stage.name}: {e}")
+                        fingerprint = None
+                    if fingerprint is not None:
+                        fingerprints[stage.name] = fingerprint
+                        outputs = manifest.lookup(stage, fingerprint, ctx)
+                        if outputs is not None:
+                            ctx.update(outputs)
+                            if stage.artifacts is not None:
+                                artifacts.update(stage.artifacts(ctx))
+                            state[stage.name] = "reused"
+                            logger.info(f"Reusing stage {stage.name}: inputs unchanged")
+                            notify(stage.name, "reused")
+                            continue
+                notify(stage.name, "started")
+                future = get_pool(stage.pool).submit(_timed, stage.fn, ctx)
+                running[future] = stage
+
+        if abort_exc is not None:
+            pending.clear()
+        if not running:
+            if pending:
+                raise ValueError(f"Stages can never start: {[s.name for s in pending]}")
+            break
+
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            stage = running.pop(future)
+            try:
+                result, elapsed = future.result()
+            except Exception as e:
+                state[stage.name] = "failed"
+                if stage.name in fingerprints:
+                    ctx["stage_manifest"].invalidate(stage.name)
+                errors.append(e.args[0] if e.args else str(e))
+                error_order.append(order[stage.name])
+                logger.debug(f"Stage {stage.name} failed: {e}")
+                notify(stage.name, "failed")
+                if (strict or stage.critical) and abort_exc is None:
+                    abort_exc = e
+                continue
+            timings[stage.name] = round(elapsed, 3)
+            ctx.update(result or {})
+            if stage.artifacts is not None:
+                artifacts.update(stage.artifacts(ctx))
+            if stage.name in fingerprints:
+                ctx["stage_manifest"].record(stage.name, fingerprints[stage.name], result)
+            state[stage.name] = "done"
+            notify(stage.name, "done")
+
+    # report errors in pipeline order regardless of which stage finished first
+    tail = len(errors) - len(error_order)
+    ordered = [e for _, e in sorted(zip(error_order, errors[tail:]), key=lambda pair: pair[0])]
+    errors[tail:] = ordered
+
+    if abort_exc is not None:
+        raise abort_exc
+    return state
@@ -1,37 +1,138 @@
+import os
+
 from .utils import save_ass_subtitles, get_logger, get_test_mode, ErrorCode
+from .model_pool import get_model_pool, default_device
+from .alignment import sentence_segments, fill_missing_times, proportional_align
 
 logger = get_logger(__name__)
 
+# Segments decoded per forward pass of the WhisperX model
+WHISPERX_BATCH_SIZE = int(os.getenv("WHISPERX_BATCH_SIZE", "8"))
+# Alignment model language when the script's language is unknown
+ALIGN_LANGUAGE = os.getenv("ALIGN_LANGUAGE", "en")
+
+DUMMY_WORDS = [
+    {"start": 0.0, "end": 1.0, "word": "test"},
+    {"start": 1.0, "end": 2.0, "word": "mode"},
+]
+
 def _generate_dummy_subtitles(path: str):
-    dummy = [
-        {"start": 0.0, "end": 1.0, "word": "test"},
-        {"start": 1.0, "end": 2.0, "word": "mode"},
-    ]
-    save_ass_subtitles(dummy, path)
+    save_ass_subtitles(DUMMY_WORDS, path)
 
-def generate_subtitles(audio_path, subtitle_path, *, model_size: str = "large-v3", test_mode: bool | None = None):
+def _whisperx_error(e: Exception) -> RuntimeError:
+    logger.error(f"{ErrorCode.WHISPERX_FAIL.value}: {e}")
+    err = RuntimeError(ErrorCode.WHISPERX_FAIL.value)
+    err.__cause__ = e
+    return err
+
+def transcribe_batch(audio_paths, *, model_size: str = "large-v3", batch_size: int | None = None, test_mode: bool | None = None, on_result=None) -> list:
+    """Transcribe and align several audio files one after another.
+
+    Each file is finished, alignment included, before the next one starts,
+    and ``on_result(index, result)`` is called as soon as it is, so a caller
+    waiting on the first file never waits for the rest. Returns, in input
+    order, the word segments for each file or the ``RuntimeError`` it failed
+    with.
+    """
     if test_mode is None:
         test_mode = get_test_mode()
 
+    results: list = [None] * len(audio_paths)
+
+    def finish(i, result):
+        results[i] = result
+        if on_result is not None:
+            on_result(i, result)
+
     if test_mode:
         logger.info("Test mode active: using dummy subtitles and skipping WhisperX")
-        _generate_dummy_subtitles(subtitle_path)
-        return
+        for i in range(len(audio_paths)):
+            finish(i, [dict(w) for w in DUMMY_WORDS])
+        return results
 
-    logger.info("Transcribing with WhisperX")
-    import whisperx
-    import torch
-    device = "cuda" if torch.cuda.is_available() else "cpu"
+    logger.info(f"Transcribing {len(audio_paths)} file(s) with WhisperX")
     try:
-        model = whisperx.load_model(model_size, device, compute_type="float32")
-        result = model.transcribe(audio_path)
-        model_a, metadata = whisperx.load_align_model(language_code=result["language"], device=device)
-        result_aligned = whisperx.align(result["segments"], model_a, metadata, audio_path, device)
-        save_ass_subtitles(result_aligned["word_segments"], subtitle_path)
-        logger.info(f"Subtitles saved to {subtitle_path}")
+        import whisperx
+        device = default_device()
+        pool = get_model_pool()
     except Exception as e:
-        logger.error(f"{ErrorCode.WHISPERX_FAIL.value}: {e}")
-        raise RuntimeError(ErrorCode.WHISPERX_FAIL.value) from e
+        err = _whisperx_error(e)
+        for i in range(len(audio_paths)):
+            finish(i, err)
+        return results
+
+    for i, path in enumerate(audio_paths):
+        try:
+            audio = whisperx.load_audio(str(path))
+            # the pool keeps both models resident, so checking them out per file is cheap
+            with pool.acquire("asr", model_size, device) as model:
+                result = model.transcribe(audio, batch_size=batch_size or WHISPERX_BATCH_SIZE)
+            with pool.acquire("align", result["language"], device) as (model_a, metadata):
+                aligned = whisperx.align(result["segments"], model_a, metadata, audio, device)
+            finish(i, aligned["word_segments"])
+        except Exception as e:
+            finish(i, _whisperx_error(e))
+    return results
+
+def transcribe_words(audio_path, *, model_size: str = "large-v3", test_mode: bool | None = None) -> list[dict]:
+    """Return word segments (``start``, ``end``, ``word``) for the audio."""
+    result = transcribe_batch([audio_path], model_size=model_size, test_mode=test_mode)[0]
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+def align_script(audio_path, script_text: str, *, language: str | None = None, test_mode: bool | None = None) -> list[dict]:
+    """Word segments for a known script using only the wav2vec2 alignment model.
+
+    The script is cut into sentences placed on the audio by an energy pass,
+    and each sentence is force-aligned; the Whisper decoder never runs, so
+    the words are exactly the script's.
+    """
+    if test_mode is None:
+        test_mode = get_test_mode()
+
+    if test_mode:
+        logger.info("Test mode active: spreading script words over the audio, skipping alignment model")
+        return proportional_align(script_text, audio_path)
+
+    language = language if language and language != "unknown" else ALIGN_LANGUAGE
+    logger.info(f"Force-aligning script ({language}) with WhisperX")
+    try:
+        import whisperx
+        device = default_device()
+        segments = sentence_segments(script_text, audio_path)
+        audio = whisperx.load_audio(str(audio_path))
+        with get_model_pool().acquire("align", language, device) as (model_a, metadata):
+            aligned = whisperx.align(segments, model_a, metadata, audio, device)
+        return fill_missing_times(aligned["word_segments"])
+    except Exception as e:
+        raise _whisperx_error(e) from e
+
+def _write_subtitles(words, subtitle_path):
+    try:
+        save_ass_subtitles(words, subtitle_path)
+    except Exception as e:
+        raise _whisperx_error(e) from e
+    logger.info(f"Subtitles saved to {subtitle_path}")
+
+def generate_subtitles(audio_path, subtitle_path, *, model_size: str = "large-v3", test_mode: bool | None = None):
+    words = transcribe_words(audio_path, model_size=model_size, test_mode=test_mode)
+    _write_subtitles(words, subtitle_path)
+
+def generate_subtitles_batch(audio_paths, subtitle_paths, *, model_size: str = "large-v3", batch_size: int | None = None, test_mode: bool | None = None) -> list:
+    """Write one ``.ass`` per input; returns ``None`` or the error for each file."""
+    errors = []
+    results = transcribe_batch(audio_paths, model_size=model_size, batch_size=batch_size, test_mode=test_mode)
+    for words, subtitle_path in zip(results, subtitle_paths):
+        if isinstance(words, Exception):
+            errors.append(words)
+            continue
+        try:
+            _write_subtitles(words, subtitle_path)
+            errors.append(None)
+        except RuntimeError as e:
+            errors.append(e)
+    return errors
 
 if __name__ == "__main__":
     generate_subtitles("temp/voice.wav", "temp/subtitles.ass")
@@ -0,0 +1,182 @@
+"""Shared HTTP client with pooling, timeouts, retries and a circuit breaker."""
+import os
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .utils import get_logger
+
+logger = get_logger(__name__)
+
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "120"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "30"))
+HTTP_BREAKER_THRESHOLD = int(os.getenv("HTTP_BREAKER_THRESHOLD", "5"))
+HTTP_BREAKER_RESET = float(os.getenv("HTTP_BREAKER_RESET", "30"))
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without contacting the upstream while the circuit is open."""
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Return the delay in seconds from a Retry-After header, if any."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class HTTPClient:
+    """Thread-safe wrapper around a pooled ``requests.Session``.
+
+    Failed attempts (connection errors, timeouts and retryable statuses) are
+    retried with full-jitter exponential backoff; a 429/503 ``Retry-After``
+    takes precedence over the computed delay. After ``breaker_threshold``
+    consecutive failed requests the circuit opens and calls fail fast with
+    :class:`CircuitOpenError` for ``breaker_reset`` seconds, after which a
+    single probe request is let through.
+    """
+
+    def __init__(
+        self,
+        *,
+        pool_size: int = HTTP_POOL_SIZE,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+        read_timeout: float = HTTP_READ_TIMEOUT,
+        max_retries: int = HTTP_MAX_RETRIES,
+        backoff_base: float = HTTP_BACKOFF_BASE,
+        backoff_max: float = HTTP_BACKOFF_MAX,
+        breaker_threshold: int = HTTP_BREAKER_THRESHOLD,
+        breaker_reset: float = HTTP_BREAKER_RESET,
+    ):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+
+        self._lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._open_until = 0.0
+        self._probing = False
+        self._latencies = deque(maxlen=200)
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.circuit_opens = 0
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _before_request(self):
+        with self._lock:
+            if self._open_until == 0.0:
+                return
+            if time.monotonic() < self._open_until or self._probing:
+                raise CircuitOpenError("upstream circuit open")
+            # half-open: let one request through to test the upstream
+            self._probing = True
+
+    def _record(self, ok: bool):
+        with self._lock:
+            self._probing = False
+            if ok:
+                self._consecutive_failures = 0
+                self._open_until = 0.0
+                return
+            self.failures += 1
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= self.breaker_threshold:
+                if self._open_until == 0.0 or time.monotonic() >= self._open_until:
+                    self.circuit_opens += 1
+                    logger.warning(f"Circuit opened after {self._consecutive_failures} failures")
+                self._open_until = time.monotonic() + self.breaker_reset
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request, retrying transient failures. Non-retryable responses are returned as-is."""
+        self._before_request()
+        kwargs.setdefault("timeout", self.timeout)
+        ok = False
+        try:
+            for attempt in range(self.max_retries + 1):
+                start = time.perf_counter()
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    self._latencies.append(time.perf_counter() - start)
+                    with self._lock:
+                        self.requests += 1
+                    if attempt == self.max_retries:
+                        raise
+                    delay = self._backoff(attempt)
+                    logger.warning(f"{method} {url} failed ({e}); retrying in {delay:.1f}s")
+                else:
+                    self._latencies.append(time.perf_counter() - start)
+                    with self._lock:
+                        self.requests += 1
+                    if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                        ok = response.status_code < 500
+                        return response
+                    delay = parse_retry_after(response.headers.get("Retry-After"))
+                    if delay is None:
+                        delay = self._backoff(attempt)
+                    delay = min(delay, self.backoff_max)
+                    logger.warning(f"{method} {url} returned {response.status_code}; retrying in {delay:.1f}s")
+                    response.close()
+                with self._lock:
+                    self.retries += 1
+                time.sleep(delay)
+        finally:
+            # every exit, including unexpected exceptions, ends a half-open probe
+            self._record(ok)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = list(self._latencies)
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "failures": self.failures,
+                "circuit_opens": self.circuit_opens,
+                "circuit_open": self._open_until > time.monotonic(),
+                "latency_avg_ms": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else None,
+                "latency_max_ms": round(max(latencies) * 1000, 1) if latencies else None,
+            }
+
+
+_CLIENT: HTTPClient | None = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_http_client() -> HTTPClient:
+    """Return the process-wide HTTP client."""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = HTTPClient()
+        return _CLIENT
@@ -0,0 +1,513 @@
+"""Job state shared by every server worker process."""
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from .utils import get_logger, get_data_dir
+
+logger = get_logger(__name__)
+
+# "sqlite" (default, shared across processes) or "memory" (single process)
+JOB_STORE_BACKEND = os.getenv("JOB_STORE", "sqlite")
+JOB_STORE_PATH = Path(os.getenv("JOB_STORE_PATH", str(get_data_dir() / "jobs.db")))
+
+# A processing job whose lease is older than this is handed to another worker
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+# Leases a job may lose (worker crashes) before it is failed instead of retried
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+ACTIVE_STATUSES = ("queued", "processing")
+TERMINAL_STATUSES = ("complete", "failed")
+
+
+class JobStore:
+    """Interface for job storage backends.
+
+    Jobs are plain dicts with ``job_id``, ``status``, ``created_at`` and
+    ``updated_at`` plus any extra fields passed to :meth:`create`,
+    :meth:`update` or :meth:`transition`.
+    """
+
+    def create(self, job_id: str, status: str = "queued", *, owner: str | None = None,
+               lease_seconds: float = JOB_LEASE_SECONDS, **fields) -> dict:
+        """Add a job; with ``owner`` it starts out leased to that process and no worker takes it."""
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> dict | None:
+        raise NotImplementedError
+
+    def update(self, job_id: str, **fields) -> bool:
+        raise NotImplementedError
+
+    def transition(self, job_id: str, from_statuses, to_status: str, *, owner: str | None = None, **fields) -> bool:
+        """Atomically move a job to ``to_status`` if it is in one of ``from_statuses``.
+
+        With ``owner`` the move also requires the job's lease to still belong
+        to that worker, so a worker that lost its lease cannot overwrite the
+        result of the one that took the job over.
+        """
+        raise NotImplementedError
+
+    def list_by_status(self, *statuses: str) -> list[dict]:
+        raise NotImplementedError
+
+    def count_by_status(self, *statuses: str) -> int:
+        """Jobs in ``statuses`` that some process will still run, i.e. whose lease has not expired."""
+        raise NotImplementedError
+
+    def queue_position(self, job_id: str) -> int:
+        """1-based position of a queued job among the live ones, 0 if it is not queued."""
+        raise NotImplementedError
+
+    def recent(self, status: str, limit: int) -> list[dict]:
+        """Up to ``limit`` jobs in ``status``, most recently updated first."""
+        raise NotImplementedError
+
+    def lease(self, owner: str, lease_seconds: float = JOB_LEASE_SECONDS, **fields) -> dict | None:
+        """Claim the oldest queued job, or one whose worker stopped heartbeating.
+
+        The job moves to ``processing`` with ``lease_owner`` set to ``owner``
+        and ``attempts`` incremented. A job whose lease already expired
+        ``JOB_MAX_ATTEMPTS`` times is failed instead. Returns ``None`` when
+        nothing is waiting.
+        """
+        raise NotImplementedError
+
+    def heartbeat(self, job_id: str, owner: str, lease_seconds: float = JOB_LEASE_SECONDS) -> bool:
+        """Extend ``owner``'s lease on a processing job; ``False`` if the lease was lost."""
+        raise NotImplementedError
+
+    def renew(self, owner: str, lease_seconds: float = JOB_LEASE_SECONDS) -> int:
+        """Extend the leases on every queued or processing job held by ``owner``."""
+        raise NotImplementedError
+
+    def fail_orphans(self, error: str) -> list[dict]:
+        """Fail every queued or processing job without a live lease and return them.
+
+        Only for deployments without workers: there nothing will ever lease
+        such a job, so it would otherwise stay active forever.
+        """
+        raise NotImplementedError
+
+    def sweep(self, ttl_seconds: float) -> list[str]:
+        """Delete finished jobs not updated for ``ttl_seconds`` and return their ids."""
+        raise NotImplementedError
+
+    def mark_worker_alive(self, owner: str):
+        """Record that worker ``owner`` is running, whether or not it holds a job."""
+        raise NotImplementedError
+
+    def live_workers(self, within_seconds: float) -> int:
+        """Workers that called :meth:`mark_worker_alive` in the last ``within_seconds``."""
+        raise NotImplementedError
+
+    def is_active(self, job_id: str) -> bool:
+        job = self.get(job_id)
+        return bool(job) and job["status"] in ACTIVE_STATUSES
+
+
+_LEASE_ERROR = "Job abandoned by its workers too many times"
+
+
+def _leasable(job: dict, now: float) -> bool:
+    # jobs created with an owner are run by that process and never taken over
+    if job["status"] == "queued":
+        return job.get("lease_owner") is None
+    return job["status"] == "processing" and job.get("lease_expires") is not None and job["lease_expires"] < now
+
+
+def _live(job: dict, now: float) -> bool:
+    return job.get("lease_expires") is None or job["lease_expires"] >= now
+
+
+# SQL twin of _live, taking ``now`` as its parameter
+_LIVE_SQL = "(lease_expires IS NULL OR lease_expires >= ?)"
+
+
+class MemoryJobStore(JobStore):
+    def __init__(self):
+        self._jobs: dict[str, dict] = {}
+        self._workers: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id, status="queued", *, owner=None, lease_seconds=JOB_LEASE_SECONDS, **fields):
+        now = time.time()
+        job = {**fields, "job_id": job_id, "status": status, "created_at": now, "updated_at": now}
+        if owner is not None:
+            job.update(lease_owner=owner, lease_expires=now + lease_seconds)
+        with self._lock:
+            self._jobs[job_id] = job
+        return dict(job)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            job.update(fields, updated_at=time.time())
+            return True
+
+    def transition(self, job_id, from_statuses, to_status, *, owner=None, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] not in from_statuses:
+                return False
+            if owner is not None and job.get("lease_owner") != owner:
+                return False
+            job.update(fields, status=to_status, updated_at=time.time())
+            return True
+
+    def list_by_status(self, *statuses):
+        with self._lock:
+            return [dict(j) for j in self._jobs.values() if j["status"] in statuses]
+
+    def count_by_status(self, *statuses):
+        now = time.time()
+        with self._lock:
+            return sum(1 for j in self._jobs.values() if j["status"] in statuses and _live(j, now))
+
+    def queue_position(self, job_id):
+        now = time.time()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] != "queued":
+                return 0
+            return sum(
+                1
+                for j in self._jobs.values()
+                if j["status"] == "queued" and j["created_at"] <= job["created_at"] and _live(j, now)
+            )
+
+    def recent(self, status, limit):
+        with self._lock:
+            jobs = [j for j in self._jobs.values() if j["status"] == status]
+            jobs.sort(key=lambda j: j["updated_at"], reverse=True)
+            return [dict(j) for j in jobs[:limit]]
+
+    def lease(self, owner, lease_seconds=JOB_LEASE_SECONDS, **fields):
+        now = time.time()
+        with self._lock:
+            for job in sorted(self._jobs.values(), key=lambda j: j["created_at"]):
+                if not _leasable(job, now):
+                    continue
+                attempts = job.get("attempts", 0) + 1
+                if attempts > JOB_MAX_ATTEMPTS:
+                    job.update(status="failed", error=_LEASE_ERROR, updated_at=now)
+                    continue
+                job.update(
+                    fields,
+                    status="processing",
+                    lease_owner=owner,
+                    lease_expires=now + lease_seconds,
+                    attempts=attempts,
+                    updated_at=now,
+                )
+                return dict(job)
+        return None
+
+    def heartbeat(self, job_id, owner, lease_seconds=JOB_LEASE_SECONDS):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] != "processing" or job.get("lease_owner") != owner:
+                return False
+            job.update(lease_expires=time.time() + lease_seconds, updated_at=time.time())
+            return True
+
+    def renew(self, owner, lease_seconds=JOB_LEASE_SECONDS):
+        expires = time.time() + lease_seconds
+        with self._lock:
+            held = [j for j in self._jobs.values() if j["status"] in ACTIVE_STATUSES and j.get("lease_owner") == owner]
+            for job in held:
+                job["lease_expires"] = expires
+        return len(held)
+
+    def fail_orphans(self, error):
+        now = time.time()
+        with self._lock:
+            orphans = [
+                j for j in self._jobs.values()
+                if j["status"] in ACTIVE_STATUSES and (j.get("lease_owner") is None or not _live(j, now))
+            ]
+            for job in orphans:
+                job.update(status="failed", error=error, updated_at=now)
+            return [dict(j) for j in orphans]
+
+    def sweep(self, ttl_seconds):
+        cutoff = time.time() - ttl_seconds
+        with self._lock:
+            expired = [
+                job_id
+                for job_id, j in self._jobs.items()
+                if j["status"] in TERMINAL_STATUSES and j["updated_at"] < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+        return expired
+
+    def mark_worker_alive(self, owner):
+        with self._lock:
+            self._workers[owner] = time.time()
+
+    def live_workers(self, within_seconds):
+        cutoff = time.time() - within_seconds
+        with self._lock:
+            return sum(1 for seen in self._workers.values() if seen >= cutoff)
+
+
+class SQLiteJobStore(JobStore):
+    """Jobs in a WAL-mode SQLite database, safe to share between processes.
+
+    ``status`` and timestamps are indexed columns; every other field lives in
+    a JSON ``data`` column. Each thread gets its own connection.
+    """
+
+    _COLUMNS = ("job_id", "status", "created_at", "updated_at", "lease_owner", "lease_expires")
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                data TEXT NOT NULL DEFAULT '{}'
+            )"""
+        )
+        columns = {r["name"] for r in conn.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("lease_owner", "TEXT"), ("lease_expires", "REAL")):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, updated_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_lease ON jobs (status, lease_expires)")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_created ON jobs (status, created_at)")
+        conn.execute("CREATE TABLE IF NOT EXISTS workers (owner TEXT PRIMARY KEY, seen_at REAL NOT NULL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _row_to_job(self, row) -> dict:
+        job = json.loads(row["data"])
+        job.update({c: row[c] for c in self._COLUMNS})
+        return job
+
+    def create(self, job_id, status="queued", *, owner=None, lease_seconds=JOB_LEASE_SECONDS, **fields):
+        now = time.time()
+        expires = now + lease_seconds if owner is not None else None
+        self._conn().execute(
+            """INSERT INTO jobs (job_id, status, created_at, updated_at, lease_owner, lease_expires, data)
+            VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (job_id, status, now, now, owner, expires, json.dumps(fields)),
+        )
+        job = {**fields, "job_id": job_id, "status": status, "created_at": now, "updated_at": now}
+        if owner is not None:
+            job.update(lease_owner=owner, lease_expires=expires)
+        return job
+
+    def get(self, job_id):
+        row = self._conn().execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def _write(self, job_id, from_statuses, to_status, fields, owner=None) -> bool:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT status, data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None or (from_statuses is not None and row["status"] not in from_statuses):
+                conn.execute("ROLLBACK")
+                return False
+            data = json.loads(row["data"])
+            data.update(fields)
+            fence, params = "", ()
+            if owner is not None:
+                fence, params = " AND lease_owner = ?", (owner,)
+            cur = conn.execute(
+                f"UPDATE jobs SET status = ?, updated_at = ?, data = ? WHERE job_id = ?{fence}",
+                (to_status or row["status"], time.time(), json.dumps(data), job_id, *params),
+            )
+            conn.execute("COMMIT")
+            return cur.rowcount == 1
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def update(self, job_id, **fields):
+        return self._write(job_id, None, None, fields)
+
+    def transition(self, job_id, from_statuses, to_status, *, owner=None, **fields):
+        return self._write(job_id, tuple(from_statuses), to_status, fields, owner)
+
+    def list_by_status(self, *statuses):
+        marks = ",".join("?" * len(statuses))
+        rows = self._conn().execute(
+            f"SELECT * FROM jobs WHERE status IN ({marks}) ORDER BY created_at", statuses
+        ).fetchall()
+        return [self._row_to_job(r) for r in rows]
+
+    def count_by_status(self, *statuses):
+        marks = ",".join("?" * len(statuses))
+        return self._conn().execute(
+            f"SELECT COUNT(*) FROM jobs WHERE status IN ({marks}) AND {_LIVE_SQL}", (*statuses, time.time())
+        ).fetchone()[0]
+
+    def queue_position(self, job_id):
+        # a job that is not queued has no created_at to compare against, so counts 0
+        return self._conn().execute(
+            f"""SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND {_LIVE_SQL} AND created_at <= (
+                SELECT created_at FROM jobs WHERE job_id = ? AND status = 'queued'
+            )""",
+            (time.time(), job_id),
+        ).fetchone()[0]
+
+    def recent(self, status, limit):
+        rows = self._conn().execute(
+            "SELECT * FROM jobs WHERE status = ? ORDER BY updated_at DESC LIMIT ?", (status, limit)
+        ).fetchall()
+        return [self._row_to_job(r) for r in rows]
+
+    def lease(self, owner, lease_seconds=JOB_LEASE_SECONDS, **fields):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            while True:
+                now = time.time()
+                row = conn.execute(
+                    """SELECT * FROM jobs
+                    WHERE (status = 'queued' AND lease_owner IS NULL)
+                    OR (status = 'processing' AND lease_expires < ?)
+                    ORDER BY created_at LIMIT 1""",
+                    (now,),
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                data = json.loads(row["data"])
+                data["attempts"] = data.get("attempts", 0) + 1
+                if data["attempts"] > JOB_MAX_ATTEMPTS:
+                    data["error"] = _LEASE_ERROR
+                    conn.execute(
+                        "UPDATE jobs SET status = 'failed', updated_at = ?, data = ? WHERE job_id = ?",
+                        (now, json.dumps(data), row["job_id"]),
+                    )
+                    continue
+                data.update(fields)
+                conn.execute(
+                    """UPDATE jobs SET status = 'processing', updated_at = ?, lease_owner = ?,
+                    lease_expires = ?, data = ? WHERE job_id = ?""",
+                    (now, owner, now + lease_seconds, json.dumps(data), row["job_id"]),
+                )
+                conn.execute("COMMIT")
+                return {
+                    **data,
+                    "job_id": row["job_id"],
+                    "status": "processing",
+                    "created_at": row["created_at"],
+                    "updated_at": now,
+                    "lease_owner": owner,
+                    "lease_expires": now + lease_seconds,
+                }
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def heartbeat(self, job_id, owner, lease_seconds=JOB_LEASE_SECONDS):
+        now = time.time()
+        cur = self._conn().execute(
+            """UPDATE jobs SET lease_expires = ?, updated_at = ?
+            WHERE job_id = ? AND status = 'processing' AND lease_owner = ?""",
+            (now + lease_seconds, now, job_id, owner),
+        )
+        return cur.rowcount == 1
+
+    def renew(self, owner, lease_seconds=JOB_LEASE_SECONDS):
+        marks = ",".join("?" * len(ACTIVE_STATUSES))
+        cur = self._conn().execute(
+            f"UPDATE jobs SET lease_expires = ? WHERE lease_owner = ? AND status IN ({marks})",
+            (time.time() + lease_seconds, owner, *ACTIVE_STATUSES),
+        )
+        return cur.rowcount
+
+    def fail_orphans(self, error):
+        marks = ",".join("?" * len(ACTIVE_STATUSES))
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            rows = conn.execute(
+                f"""SELECT * FROM jobs WHERE status IN ({marks})
+                AND (lease_owner IS NULL OR lease_expires < ?)""",
+                (*ACTIVE_STATUSES, now),
+            ).fetchall()
+            orphans = []
+            for row in rows:
+                job = self._row_to_job(row)
+                data = json.loads(row["data"])
+                data["error"] = error
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', updated_at = ?, data = ? WHERE job_id = ?",
+                    (now, json.dumps(data), row["job_id"]),
+                )
+                orphans.append({**job, "error": error, "status": "failed", "updated_at": now})
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return orphans
+
+    def sweep(self, ttl_seconds):
+        cutoff = time.time() - ttl_seconds
+        marks = ",".join("?" * len(TERMINAL_STATUSES))
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                f"SELECT job_id FROM jobs WHERE status IN ({marks}) AND updated_at < ?",
+                (*TERMINAL_STATUSES, cutoff),
+            ).fetchall()
+            expired = [r["job_id"] for r in rows]
+            conn.executemany("DELETE FROM jobs WHERE job_id = ?", [(j,) for j in expired])
+            # workers gone for as long as a finished job is kept are not coming back
+            conn.execute("DELETE FROM workers WHERE seen_at < ?", (cutoff,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return expired
+
+    def mark_worker_alive(self, owner):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO workers (owner, seen_at) VALUES (?, ?)", (owner, time.time())
+        )
+
+    def live_workers(self, within_seconds):
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM workers WHERE seen_at >= ?", (time.time() - within_seconds,)
+        ).fetchone()[0]
+
+
+def get_job_store() -> JobStore:
+    """Create the job store selected by the ``JOB_STORE`` env var."""
+    if JOB_STORE_BACKEND == "memory":
+        return MemoryJobStore()
+    if JOB_STORE_BACKEND == "sqlite":
+        return SQLiteJobStore(JOB_STORE_PATH)
+    raise ValueError(f"Unknown JOB_STORE backend: {JOB_STORE_BACKEND}")
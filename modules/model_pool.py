@@ -0,0 +1,204 @@
+"""Process-resident registry of loaded WhisperX models."""
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from .utils import get_logger
+
+logger = get_logger(__name__)
+
+# 0 disables the budget (models are never evicted)
+MODEL_POOL_MAX_MB = int(os.getenv("MODEL_POOL_MAX_MB", "0"))
+
+
+def _rss_bytes() -> int:
+    """Return the resident set size of this process, or 0 if unknown."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def default_device() -> str:
+    import torch
+
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def _load_asr(model_size: str, device: str):
+    import whisperx
+
+    return whisperx.load_model(model_size, device, compute_type="float32")
+
+
+def _load_align(language: str, device: str):
+    import whisperx
+
+    return whisperx.load_align_model(language_code=language, device=device)
+
+
+class _Entry:
+    def __init__(self, model, size_bytes: int, load_seconds: float):
+        self.model = model
+        self.size_bytes = size_bytes
+        self.load_seconds = load_seconds
+        self.lock = threading.Lock()
+        self.users = 0
+        self.hits = 0
+
+
+class ModelPool:
+    """Keep loaded models per (kind, name, device) and share them across threads.
+
+    ``kind`` is ``"asr"`` (keyed by model size) or ``"align"`` (keyed by
+    language code). Entries are evicted least-recently-used first once the
+    estimated resident size exceeds ``max_bytes``; models currently in use are
+    never evicted.
+    """
+
+    def __init__(self, max_bytes: int = 0, loaders: dict | None = None, size_of=None):
+        self.max_bytes = max_bytes
+        self._loaders = loaders or {"asr": _load_asr, "align": _load_align}
+        self._size_of = size_of
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: dict[tuple, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _checkout(self, key: tuple) -> _Entry | None:
+        # caller holds self._lock
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            entry.users += 1
+            entry.hits += 1
+            self.hits += 1
+        return entry
+
+    def _get_or_load(self, key: tuple) -> _Entry:
+        with self._lock:
+            entry = self._checkout(key)
+            if entry is not None:
+                return entry
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Only one thread loads a given model; others wait and then hit.
+        with load_lock:
+            with self._lock:
+                entry = self._checkout(key)
+                if entry is not None:
+                    return entry
+            kind, name, device = key
+            logger.info(f"Loading {kind} model '{name}' on {device}")
+            rss_before = _rss_bytes()
+            start = time.perf_counter()
+            model = self._loaders[kind](name, device)
+            load_seconds = time.perf_counter() - start
+            if self._size_of is not None:
+                size = self._size_of(model)
+            else:
+                size = max(_rss_bytes() - rss_before, 0)
+            entry = _Entry(model, size, load_seconds)
+            entry.users = 1
+            logger.info(f"Loaded {kind} model '{name}' in {load_seconds:.1f}s (~{size / 2**20:.0f} MB)")
+            with self._lock:
+                self.misses += 1
+                self._entries[key] = entry
+                self._evict()
+            return entry
+
+    def _evict(self):
+        # caller holds self._lock
+        if not self.max_bytes:
+            return
+        evicted = False
+        for key in list(self._entries):
+            if self.resident_bytes() <= self.max_bytes:
+                break
+            entry = self._entries[key]
+            if entry.users:
+                continue
+            del self._entries[key]
+            self.evictions += 1
+            evicted = True
+            logger.info(f"Evicted {key[0]} model '{key[1]}' ({entry.size_bytes / 2**20:.0f} MB)")
+        if evicted:
+            gc.collect()
+
+    @contextmanager
+    def acquire(self, kind: str, name: str, device: str):
+        """Yield the loaded model, holding its lock for the duration of use."""
+        entry = self._get_or_load((kind, name, device))
+        try:
+            with entry.lock:
+                yield entry.model
+        finally:
+            with self._lock:
+                entry.users -= 1
+                self._evict()
+
+    def warm(self, kind: str, name: str, device: str):
+        with self.acquire(kind, name, device):
+            pass
+
+    def resident_bytes(self) -> int:
+        return sum(e.size_bytes for e in self._entries.values())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        gc.collect()
+
+    def stats(self) -> dict:
+        with self._lock:
+            models = [
+                {
+                    "kind": kind,
+                    "name": name,
+                    "device": device,
+                    "size_mb": round(e.size_bytes / 2**20, 1),
+                    "load_seconds": round(e.load_seconds, 2),
+                    "hits": e.hits,
+                    "in_use": e.users,
+                }
+                for (kind, name, device), e in self._entries.items()
+            ]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "resident_mb": round(self.resident_bytes() / 2**20, 1),
+                "budget_mb": round(self.max_bytes / 2**20, 1),
+                "process_rss_mb": round(_rss_bytes() / 2**20, 1),
+                "models": models,
+            }
+
+
+_POOL: ModelPool | None = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_model_pool() -> ModelPool:
+    """Return the process-wide model pool."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ModelPool(max_bytes=MODEL_POOL_MAX_MB * 2**20)
+        return _POOL
+
+
+def warm_models(model_sizes, languages=(), device: str | None = None):
+    """Load the given ASR model sizes and alignment languages ahead of use."""
+    device = device or default_device()
+    pool = get_model_pool()
+    for size in model_sizes:
+        pool.warm("asr", size, device)
+    for language in languages:
+        pool.warm("align", language, device)
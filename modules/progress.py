@@ -0,0 +1,139 @@
+"""Job progress events: in-process fan-out to stream subscribers plus a snapshot in the job store."""
+import asyncio
+import os
+import threading
+
+from .utils import get_logger
+
+logger = get_logger(__name__)
+
+# Render percentages are written to the job store in steps this large
+PROGRESS_PERSIST_STEP = int(os.getenv("PROGRESS_PERSIST_STEP", "5"))
+# Events buffered per subscriber before the oldest are dropped
+SUBSCRIBER_BUFFER = 256
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+class Subscription:
+    """Events for one job delivered to one asyncio consumer."""
+
+    def __init__(self, broker: "ProgressBroker", job_id: str, loop: asyncio.AbstractEventLoop):
+        self.broker = broker
+        self.job_id = job_id
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_BUFFER)
+
+    def _put(self, event: dict):
+        if self.queue.full():
+            # a slow client loses the oldest events; the next snapshot catches it up
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: float) -> dict | None:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class ProgressBroker:
+    """Publish from any thread; subscribers receive events on their own event loop."""
+
+    def __init__(self):
+        self._subscribers: dict[str, set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, job_id: str) -> Subscription:
+        sub = Subscription(self, job_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.setdefault(job_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            subs = self._subscribers.get(sub.job_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.job_id]
+
+    def publish(self, job_id: str, event: dict):
+        with self._lock:
+            subs = list(self._subscribers.get(job_id, ()))
+        for sub in subs:
+            try:
+                sub.loop.call_soon_threadsafe(sub._put, event)
+            except RuntimeError:
+                # the subscriber's loop already closed
+                self.unsubscribe(sub)
+
+    def subscriber_count(self, job_id: str) -> int:
+        with self._lock:
+            return len(self._subscribers.get(job_id, ()))
+
+
+def get_progress_broker() -> ProgressBroker:
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = ProgressBroker()
+        return _broker
+
+
+class ProgressReporter:
+    """Turns pipeline callbacks into numbered events for one job.
+
+    Every event goes to the process's broker. The accumulated state
+    (stage statuses, render percent, job status) is also saved as the job's
+    ``progress`` field, so streams served by another process, such as the
+    web tier when jobs run in ``python -m worker``, can follow along.
+    """
+
+    def __init__(self, store, job_id: str, broker: ProgressBroker | None = None):
+        self.store = store
+        self.job_id = job_id
+        self.broker = broker or get_progress_broker()
+        self.state = {"seq": 0, "stages": {}, "render_percent": None, "status": None}
+        self._persisted_percent = None
+        self._lock = threading.Lock()
+
+    def _emit(self, event: dict, persist: bool):
+        with self._lock:
+            self.state["seq"] += 1
+            event = {**event, "seq": self.state["seq"]}
+            snapshot = {**self.state, "stages": dict(self.state["stages"])}
+            # inside the lock so subscribers see events in seq order
+            self.broker.publish(self.job_id, event)
+        if persist:
+            try:
+                self.store.update(self.job_id, progress=snapshot)
+            except Exception as e:
+                logger.debug(f"Could not save progress for {self.job_id}: {e}")
+
+    def stage(self, name: str, status: str):
+        """``run_stages`` listener."""
+        with self._lock:
+            self.state["stages"][name] = status
+        self._emit({"type": "stage", "stage": name, "status": status}, persist=True)
+
+    def render(self, percent: int):
+        with self._lock:
+            self.state["render_percent"] = percent
+            persist = (
+                self._persisted_percent is None
+                or percent >= 100
+                or percent - self._persisted_percent >= PROGRESS_PERSIST_STEP
+            )
+            if persist:
+                self._persisted_percent = percent
+        self._emit({"type": "render", "percent": percent}, persist=persist)
+
+    def status(self, status: str, **fields):
+        with self._lock:
+            self.state["status"] = status
+        self._emit({"type": "status", "status": status, **fields}, persist=True)
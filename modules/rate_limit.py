@@ -0,0 +1,175 @@
+"""Token-bucket rate limiting shared by every server worker process."""
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from .utils import get_logger, get_data_dir
+
+logger = get_logger(__name__)
+
+# "sqlite" (default, shared across processes) or "memory" (single process)
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "sqlite")
+RATE_LIMIT_PATH = Path(os.getenv("RATE_LIMIT_PATH", str(get_data_dir() / "rate_limits.db")))
+# Comma separated "route=requests/seconds" rules; "route@key=..." overrides one client
+RATE_LIMIT_RULES = os.getenv("RATE_LIMIT_RULES", "/generate=5/60,/backgrounds=20/60")
+# Buckets untouched for this long are dropped (never before they would be full again)
+RATE_LIMIT_IDLE_SECONDS = float(os.getenv("RATE_LIMIT_IDLE_SECONDS", "600"))
+
+
+class Limit:
+    """``requests`` per ``seconds``: the bucket holds ``requests`` tokens and refills continuously."""
+
+    def __init__(self, requests: int, seconds: float):
+        self.capacity = float(requests)
+        self.rate = requests / seconds
+
+    @property
+    def refill_seconds(self) -> float:
+        return self.capacity / self.rate
+
+    def take(self, tokens: float | None, updated: float | None, now: float) -> tuple[float, float]:
+        """Return the bucket's tokens after a request and how long until the next one is allowed.
+
+        A missing bucket counts as full. ``tokens`` drops below 1 only when
+        the request is refused, in which case nothing is taken.
+        """
+        if tokens is None:
+            tokens = self.capacity
+        else:
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            return tokens - 1, 0.0
+        return tokens, (1 - tokens) / self.rate
+
+    def __repr__(self):
+        return f"Limit({self.capacity:g}/{self.refill_seconds:g}s)"
+
+
+def parse_rules(spec: str) -> dict[str, Limit]:
+    """Parse ``"/generate=5/60,/generate@10.0.0.1=50/60"`` into limits by rule key."""
+    rules = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        key, _, value = item.partition("=")
+        requests, _, seconds = value.partition("/")
+        rules[key.strip()] = Limit(int(requests), float(seconds or 60))
+    return rules
+
+
+class MemoryBucketStore:
+    """Buckets in an LRU-ordered dict; idle ones are popped from the front."""
+
+    def __init__(self, idle_seconds: float):
+        self.idle_seconds = idle_seconds
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, limit: Limit, now: float) -> float:
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (None, None))
+            tokens, wait = limit.take(tokens, updated, now)
+            self._buckets[key] = (tokens, now)
+            while self._buckets:
+                oldest = next(iter(self._buckets.values()))
+                if now - oldest[1] <= self.idle_seconds:
+                    break
+                self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteBucketStore:
+    """Buckets in a WAL-mode SQLite table so every worker process draws from the same one."""
+
+    def __init__(self, path: Path, idle_seconds: float):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.idle_seconds = idle_seconds
+        self._local = threading.local()
+        self._last_evict = 0.0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            )"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS buckets_updated ON buckets (updated)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, limit: Limit, now: float) -> float:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, wait = limit.take(*(row or (None, None)), now)
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now)
+            )
+            if now - self._last_evict > self.idle_seconds / 2:
+                self._last_evict = now
+                conn.execute("DELETE FROM buckets WHERE updated < ?", (now - self.idle_seconds,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM buckets").fetchone()[0]
+
+    def clear(self):
+        self._conn().execute("DELETE FROM buckets")
+
+
+class RateLimiter:
+    """Per-route token buckets keyed by client, with optional per-client overrides."""
+
+    def __init__(self, rules: dict[str, Limit], store=None):
+        self.rules = rules
+        # an evicted bucket must already have refilled, or dropping it would grant extra requests
+        longest = max((limit.refill_seconds for limit in rules.values()), default=0)
+        idle = max(RATE_LIMIT_IDLE_SECONDS, longest)
+        if store is None:
+            store = SQLiteBucketStore(RATE_LIMIT_PATH, idle) if RATE_LIMIT_STORE == "sqlite" else MemoryBucketStore(idle)
+        self.store = store
+
+    def limit_for(self, route: str, key: str) -> Limit | None:
+        return self.rules.get(f"{route}@{key}") or self.rules.get(route)
+
+    def check(self, route: str, key: str) -> int:
+        """Take a token for ``key`` on ``route``; returns 0 if allowed, else seconds to wait."""
+        limit = self.limit_for(route, key)
+        if limit is None:
+            return 0
+        wait = self.store.take(f"{route}@{key}", limit, time.time())
+        return math.ceil(wait) if wait > 0 else 0
+
+    def clear(self):
+        self.store.clear()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Create the rate limiter configured by the ``RATE_LIMIT_*`` env vars."""
+    if RATE_LIMIT_STORE not in ("sqlite", "memory"):
+        raise ValueError(f"Unknown RATE_LIMIT_STORE backend: {RATE_LIMIT_STORE}")
+    return RateLimiter(parse_rules(RATE_LIMIT_RULES))
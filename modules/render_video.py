@@ -1,12 +1,41 @@
 
 import subprocess
+import tempfile
+from contextlib import ExitStack
 from pathlib import Path
 
 from .utils import get_logger, ErrorCode
+from .subtitle_overlay import build_overlay
 
 logger = get_logger(__name__)
 
-def render_final_video(background_video, audio_file, subtitle_file, output_path, *, thumbnail: bool = False):
+def render_final_video(
+    background_video,
+    audio_file,
+    subtitle_file,
+    output_path,
+    *,
+    thumbnail: bool = False,
+    compressed_path=None,
+    prenormalized: bool = False,
+    start_offset: float = 0.0,
+    overlay: bool = False,
+    progress=None,
+    duration: float | None = None,
+):
+    """Burn subtitles over the background and mux the voiceover into ``output_path``.
+
+    When ``compressed_path`` is given the compressed copy (and the thumbnail,
+    if requested) are written by the same ffmpeg process in a single pass.
+    ``prenormalized`` backgrounds are already 1080x1920 and skip scaling.
+    ``start_offset`` seeks the background on the input side, so only the
+    segment that is actually used gets decoded. With ``overlay`` the
+    subtitles are pre-rendered into sprites and composited with ``overlay``
+    instead of running libass on every frame of the encode.
+
+    ``progress(percent)`` is called as ffmpeg reports its position through
+    ``-progress``, relative to ``duration`` seconds of output.
+    """
     logger.info(f"Using background video: {background_video}")
     logger.info(f"Using audio file: {audio_file}")
     logger.info(f"Using subtitle file: {subtitle_file}")
@@ -27,41 +56,141 @@ def render_final_video(background_video, audio_file, subtitle_file, output_path,
         logger.error(f"{ErrorCode.WHISPERX_FAIL.value}: subtitle missing {subtitle_file}")
         raise FileNotFoundError(ErrorCode.WHISPERX_FAIL.value)
 
-    subtitle_path_escaped = str(subtitle_file).replace('\\', '/').replace(':', '\\:')
-
-    ffmpeg_cmd = [
-        "ffmpeg",
-        "-y",
-        "-i", str(background_video),
-        "-i", str(audio_file),
-        "-filter_complex",
-        f"[0:v]scale=1080:1920,setsar=1,subtitles='{subtitle_path_escaped}'[v]",
-        "-map", "[v]",
-        "-map", "1:a",
-        "-c:v", "libx264",
-        "-c:a", "aac",
-        "-shortest",
-        str(output_path)
-    ]
+    with ExitStack() as stack:
+        scale = "" if prenormalized else "scale=1080:1920,setsar=1,"
+        seek = ["-ss", f"{start_offset:.3f}"] if start_offset > 0 else []
+        if overlay:
+            sprite_dir = stack.enter_context(tempfile.TemporaryDirectory(dir=subtitle_file.parent, prefix=".overlay-"))
+            playlist = build_overlay(subtitle_file, Path(sprite_dir))
+            extra_inputs = ["-f", "concat", "-safe", "0", "-i", str(playlist)]
+            video_filter = f"[0:v]{scale}null[bg];[bg][2:v]overlay=eof_action=pass"
+        else:
+            subtitle_path_escaped = str(subtitle_file).replace('\\', '/').replace(':', '\\:')
+            extra_inputs = []
+            video_filter = f"[0:v]{scale}subtitles='{subtitle_path_escaped}'"
 
-    try:
-        subprocess.run(ffmpeg_cmd, check=True)
-        logger.info(f"Final video rendered: {output_path}")
-        if thumbnail:
-            thumb = Path(output_path).with_suffix(".png")
-            subprocess.run([
+        if compressed_path is not None:
+            # Single decode/filter pass feeding every output through split
+            ffmpeg_cmd = build_single_pass_cmd(
+                background_video,
+                audio_file,
+                video_filter,
+                output_path,
+                seek=seek,
+                compressed_path=Path(compressed_path).resolve(),
+                thumbnail_path=output_path.with_suffix(".png") if thumbnail else None,
+                extra_inputs=extra_inputs,
+            )
+        else:
+            ffmpeg_cmd = [
                 "ffmpeg",
                 "-y",
-                "-i",
-                str(output_path),
-                "-ss",
-                "00:00:01",
-                "-vframes",
-                "1",
-                str(thumb),
-            ], check=True)
-            logger.info(f"Thumbnail saved to {thumb}")
+                *seek,
+                "-i", str(background_video),
+                "-i", str(audio_file),
+                *extra_inputs,
+                "-filter_complex",
+                f"{video_filter}[v]",
+                "-map", "[v]",
+                "-map", "1:a",
+                "-c:v", "libx264",
+                "-c:a", "aac",
+                "-shortest",
+                str(output_path)
+            ]
+
+        try:
+            if progress is not None and duration:
+                run_with_progress(ffmpeg_cmd, duration, progress)
+            else:
+                subprocess.run(ffmpeg_cmd, check=True)
+            logger.info(f"Final video rendered: {output_path}")
+        except subprocess.CalledProcessError as e:
+            logger.error(f"{ErrorCode.RENDER_FAIL.value}: {e}")
+            raise RuntimeError(ErrorCode.RENDER_FAIL.value) from e
+
+    if compressed_path is not None:
+        logger.info(f"Compressed video saved to {compressed_path}")
+        if thumbnail:
+            logger.info(f"Thumbnail saved to {output_path.with_suffix('.png')}")
+    elif thumbnail:
+        extract_thumbnail(output_path, output_path.with_suffix(".png"))
+
+
+def parse_progress(lines, duration: float):
+    """Yield whole percentages from ffmpeg ``-progress`` key=value lines, each once."""
+    last = None
+    for line in lines:
+        key, _, value = line.strip().partition("=")
+        if key == "out_time_us" and value.isdigit():
+            percent = min(99, int(int(value) / 1e6 / duration * 100))
+        elif key == "progress" and value == "end":
+            percent = 100
+        else:
+            continue
+        if percent != last:
+            last = percent
+            yield percent
+
+
+def run_with_progress(cmd: list, duration: float, callback):
+    """Run an ffmpeg command, reporting its progress to ``callback`` as it encodes."""
+    cmd = [cmd[0], "-progress", "pipe:1", "-nostats", *cmd[1:]]
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True) as proc:
+        for percent in parse_progress(proc.stdout, duration):
+            try:
+                callback(percent)
+            except Exception as e:
+                logger.debug(f"Progress callback failed: {e}")
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+
+
+def extract_thumbnail(video_path, thumb_path):
+    """Save the frame 1s into ``video_path`` as a PNG."""
+    try:
+        subprocess.run([
+            "ffmpeg",
+            "-y",
+            "-i",
+            str(video_path),
+            "-ss",
+            "00:00:01",
+            "-vframes",
+            "1",
+            str(thumb_path),
+        ], check=True)
+        logger.info(f"Thumbnail saved to {thumb_path}")
     except subprocess.CalledProcessError as e:
         logger.error(f"{ErrorCode.RENDER_FAIL.value}: {e}")
         raise RuntimeError(ErrorCode.RENDER_FAIL.value) from e
 
+
+def build_single_pass_cmd(background_video, audio_file, video_filter, output_path, *, compressed_path, thumbnail_path=None, seek=(), extra_inputs=()):
+    """Build one ffmpeg command writing the final MP4, the ~1 Mbps MP4 and optionally the thumbnail."""
+    labels = ["[vfull]", "[vsmall]"]
+    if thumbnail_path is not None:
+        labels.append("[vthumb]")
+    graph = f"{video_filter},split={len(labels)}{''.join(labels)}"
+    if thumbnail_path is not None:
+        # same frame the separate thumbnail pass grabbed: 1s into the video
+        graph += ";[vthumb]trim=start=1,setpts=PTS-STARTPTS[thumb]"
+
+    cmd = [
+        "ffmpeg",
+        "-y",
+        *seek,
+        "-i", str(background_video),
+        "-i", str(audio_file),
+        *extra_inputs,
+        "-filter_complex", graph,
+        "-map", "[vfull]", "-map", "1:a",
+        "-c:v", "libx264", "-c:a", "aac", "-shortest",
+        str(output_path),
+        "-map", "[vsmall]", "-map", "1:a",
+        "-c:v", "libx264", "-b:v", "1M", "-bufsize", "1M", "-c:a", "aac", "-shortest",
+        str(compressed_path),
+    ]
+    if thumbnail_path is not None:
+        cmd += ["-map", "[thumb]", "-frames:v", "1", str(thumbnail_path)]
+    return cmd
@@ -0,0 +1,159 @@
+"""Pre-render an ASS subtitle track into sprites so the main encode only overlays them.
+
+libass runs once per distinct on-screen text instead of once per video frame:
+every distinct event is rasterized into a transparent 1080x1920 PNG in a
+single ffmpeg call, and an ffconcat playlist shows each sprite for as long as
+its event lasts. Karaoke phrases are expanded into one state per highlighted
+word first, so the highlight still advances.
+"""
+import re
+import subprocess
+from pathlib import Path
+
+from .utils import get_logger, ass_timestamp, ErrorCode
+
+logger = get_logger(__name__)
+
+# Rate at which sprites are rendered; each sprite owns one frame
+SPRITE_FPS = 10
+FRAME_SIZE = "1080x1920"
+
+_TIME_RE = re.compile(r"(\d+):(\d{2}):(\d{2})\.(\d{2})")
+_KARAOKE_RE = re.compile(r"\{\\k(\d+)\}([^{]*)")
+# \k duration that outlasts any sprite, keeping the words after it unhighlighted
+_NEVER = 10**6
+
+
+def parse_ass_time(value: str) -> float:
+    h, m, s, cs = (int(g) for g in _TIME_RE.fullmatch(value.strip()).groups())
+    return h * 3600 + m * 60 + s + cs / 100
+
+
+def parse_ass(path) -> tuple[str, list[dict]]:
+    """Split an ASS file into its header and ``Dialogue`` events.
+
+    Events keep every field except the times as ``fields`` so they can be
+    written back unchanged.
+    """
+    header_lines = []
+    events = []
+    with open(path, "r", encoding="utf-8-sig") as f:
+        for line in f:
+            if line.startswith("Dialogue:"):
+                layer, start, end, rest = line[len("Dialogue:"):].strip().split(",", 3)
+                # Style, Name, MarginL, MarginR, MarginV, Effect; the text may contain commas
+                parts = rest.split(",", 6)
+                style_etc, text = ",".join(parts[:6]), parts[6] if len(parts) > 6 else ""
+                events.append({
+                    "start": parse_ass_time(start),
+                    "end": parse_ass_time(end),
+                    "fields": (layer.strip(), style_etc),
+                    "text": text.rstrip("\n"),
+                })
+            elif not events:
+                header_lines.append(line)
+    return "".join(header_lines), events
+
+
+def expand_karaoke(events: list[dict]) -> list[dict]:
+    """Replace each karaoke event with one static event per highlight state."""
+    expanded = []
+    for event in events:
+        syllables = _KARAOKE_RE.findall(event["text"])
+        if not syllables:
+            expanded.append(event)
+            continue
+        t = event["start"]
+        for i, (centis, _) in enumerate(syllables):
+            end = event["end"] if i == len(syllables) - 1 else min(t + int(centis) / 100, event["end"])
+            # libass highlights syllable j once the \k durations before it have
+            # elapsed, so word i itself carries the never-ending duration
+            text = "".join(
+                f"{{\\k{0 if j < i else _NEVER}}}{syllable}" for j, (_, syllable) in enumerate(syllables)
+            )
+            if end > t:
+                expanded.append({**event, "start": t, "end": end, "text": text})
+            t = end
+    return expanded
+
+
+def plan_overlay(events: list[dict]) -> tuple[list[tuple], list[tuple[int | None, float]]]:
+    """Return the distinct sprites and a ``(sprite index or None, duration)`` timeline.
+
+    Events showing the same text in the same style share a sprite; ``None``
+    entries are gaps where nothing is shown.
+    """
+    sprites: list[tuple] = []
+    index: dict[tuple, int] = {}
+    timeline: list[tuple[int | None, float]] = []
+    t = 0.0
+    for event in sorted(expand_karaoke(events), key=lambda e: e["start"]):
+        start = max(event["start"], t)
+        if event["end"] <= start:
+            continue
+        if start > t:
+            timeline.append((None, start - t))
+        key = (event["fields"], event["text"])
+        if key not in index:
+            index[key] = len(sprites)
+            sprites.append(key)
+        timeline.append((index[key], event["end"] - start))
+        t = event["end"]
+    return sprites, timeline
+
+
+def render_sprites(header: str, sprites: list[tuple], out_dir: Path) -> Path:
+    """Rasterize every sprite (plus one blank frame) with libass in one ffmpeg run."""
+    step = 1 / SPRITE_FPS
+    sprite_ass = out_dir / "sprites.ass"
+    with open(sprite_ass, "w", encoding="utf-8") as f:
+        f.write(header)
+        for i, ((layer, style_etc), text) in enumerate(sprites):
+            start, end = ass_timestamp(i * step), ass_timestamp((i + 1) * step)
+            f.write(f"Dialogue: {layer},{start},{end},{style_etc},{text}\n")
+
+    escaped = str(sprite_ass).replace("\\", "/").replace(":", "\\:")
+    cmd = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"color=c=black@0.0:s={FRAME_SIZE}:r={SPRITE_FPS},format=rgba",
+        "-vf", f"subtitles='{escaped}':alpha=1",
+        "-frames:v", str(len(sprites) + 1),
+        "-start_number", "0",
+        str(out_dir / "%05d.png"),
+    ]
+    try:
+        subprocess.run(cmd, check=True)
+    except subprocess.CalledProcessError as e:
+        logger.error(f"{ErrorCode.RENDER_FAIL.value}: sprite rendering failed: {e}")
+        raise RuntimeError(ErrorCode.RENDER_FAIL.value) from e
+    return out_dir
+
+
+def sprite_path(out_dir: Path, number: int) -> Path:
+    return out_dir / f"{number:05d}.png"
+
+
+def write_ffconcat(timeline, sprite_count: int, out_dir: Path) -> Path:
+    """Write the playlist that shows each sprite for its event's duration."""
+    blank = sprite_path(out_dir, sprite_count)
+    playlist = out_dir / "overlay.ffconcat"
+    with open(playlist, "w", encoding="utf-8") as f:
+        f.write("ffconcat version 1.0\n")
+        for sprite, duration in timeline:
+            path = blank if sprite is None else sprite_path(out_dir, sprite)
+            f.write(f"file '{path}'\nduration {duration:.3f}\n")
+        # the last entry's duration only applies when the file is listed again
+        f.write(f"file '{blank}'\nduration {1 / SPRITE_FPS:.3f}\n")
+        f.write(f"file '{blank}'\n")
+    return playlist
+
+
+def build_overlay(subtitle_file, out_dir: Path) -> Path:
+    """Render ``subtitle_file`` into sprites under ``out_dir`` and return the ffconcat playlist."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    header, events = parse_ass(subtitle_file)
+    sprites, timeline = plan_overlay(events)
+    render_sprites(header, sprites, out_dir)
+    logger.info(f"Rendered {len(sprites)} subtitle sprite(s) for {len(events)} event(s)")
+    return write_ffconcat(timeline, len(sprites), out_dir)
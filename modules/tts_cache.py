@@ -0,0 +1,170 @@
+"""Content-addressed on-disk cache for synthesized voiceovers."""
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import unicodedata
+from pathlib import Path
+
+from .utils import get_logger, get_data_dir
+
+logger = get_logger(__name__)
+
+TTS_CACHE_DIR = Path(os.getenv("TTS_CACHE_DIR", str(get_data_dir() / "tts_cache")))
+# 0 disables the cache
+TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "1024"))
+
+# Other processes' writes are only counted once the cache is rescanned, at least this often
+RESCAN_SECONDS = 600
+
+# Bump when the stored audio format changes so stale entries are not reused
+CACHE_FORMAT = "wav-44100-mono-v1"
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace and unicode variants that do not change the speech."""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def make_key(text: str, voice_id: str, voice_settings: dict) -> str:
+    payload = json.dumps(
+        {
+            "text": normalize_text(text),
+            "voice_id": voice_id,
+            "voice_settings": voice_settings,
+            "format": CACHE_FORMAT,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """Size-bounded LRU cache of WAV files keyed by :func:`make_key`.
+
+    Entries are written to a temp file in the cache directory and moved into
+    place with ``os.replace`` so readers never see a partial file, even when
+    several jobs store the same key at once. Recency is tracked through the
+    file mtime, which is refreshed on every hit. The cache's size is kept as a
+    running total, so a put only scans the directory when the total crosses
+    ``max_bytes`` or is older than ``RESCAN_SECONDS``.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._total: int | None = None
+        self._scanned_at = 0.0
+
+    def path_for(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.wav"
+
+    def get(self, key: str) -> Path | None:
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def words_path(self, key: str) -> Path:
+        return self.path_for(key).with_suffix(".words.json")
+
+    def get_words(self, key: str) -> list[dict] | None:
+        """Word timings stored next to the entry's audio, if any."""
+        try:
+            with open(self.words_path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put_words(self, key: str, words: list[dict]):
+        path = self.words_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(words, f)
+        os.replace(tmp, path)
+
+    def fetch(self, key: str, dest: Path) -> bool:
+        """Copy the entry for ``key`` to ``dest``. Return False on a miss."""
+        path = self.get(key)
+        if path is None:
+            return False
+        try:
+            shutil.copyfile(path, dest)
+        except FileNotFoundError:
+            # evicted by another process between lookup and copy
+            return False
+        return True
+
+    def put(self, key: str, src: Path) -> Path:
+        path = self.path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            replaced = path.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        os.close(fd)
+        try:
+            shutil.copyfile(src, tmp)
+            size = os.path.getsize(tmp)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        with self._lock:
+            stale = self._total is None or time.monotonic() - self._scanned_at > RESCAN_SECONDS
+            if not stale:
+                self._total += size - replaced
+            over = stale or self._total > self.max_bytes
+        if over:
+            self.evict()
+        return path
+
+    def evict(self):
+        """Rescan the cache and delete the least recently used entries until it fits ``max_bytes``."""
+        with self._lock:
+            entries = []
+            total = 0
+            for path in self.root.glob("*/*.wav"):
+                try:
+                    st = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+            if total > self.max_bytes:
+                entries.sort()
+                for _, size, path in entries:
+                    if total <= self.max_bytes:
+                        break
+                    path.unlink(missing_ok=True)
+                    path.with_suffix(".words.json").unlink(missing_ok=True)
+                    total -= size
+                    logger.debug(f"Evicted cached voiceover {path.name}")
+            self._total = total
+            self._scanned_at = time.monotonic()
+
+
+_CACHE: TTSCache | None = None
+
+
+def get_tts_cache() -> TTSCache | None:
+    """Return the shared voiceover cache, or None when it is disabled."""
+    global _CACHE
+    if TTS_CACHE_MAX_MB <= 0:
+        return None
+    if _CACHE is None:
+        _CACHE = TTSCache(TTS_CACHE_DIR, TTS_CACHE_MAX_MB * 2**20)
+    return _CACHE
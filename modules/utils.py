@@ -10,8 +10,10 @@ from enum import Enum
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 JOBS_DIR = PROJECT_ROOT / os.getenv("JOBS_DIR", "temp/jobs")
 OUTPUT_DIR = PROJECT_ROOT / os.getenv("OUTPUT_DIR", "output")
+DATA_DIR = PROJECT_ROOT / os.getenv("DATA_DIR", "data")
 JOBS_DIR.mkdir(parents=True, exist_ok=True)
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+DATA_DIR.mkdir(parents=True, exist_ok=True)
 
 LOG_COLORS = {
     logging.INFO: "\033[36m",    # Cyan
@@ -28,6 +30,7 @@ class ErrorCode(str, Enum):
     RENDER_FAIL = "RENDER_FAIL"
     THUMBNAIL_FAIL = "THUMBNAIL_FAIL"
     COMPRESS_FAIL = "COMPRESS_FAIL"
+    WORKSPACE_QUOTA = "WORKSPACE_QUOTA"
 
 class _ColorFormatter(logging.Formatter):
     def format(self, record):
@@ -66,42 +69,102 @@ def get_test_mode(cli_flag: bool | None = None) -> bool:
     env = os.getenv("TEST_MODE")
     return env == "1" or str(env).lower() == "true"
 
-def save_ass_subtitles(segments, path):
-    header = """[Script Info]
-ScriptType: v4.00+
-Collisions: Normal
-PlayResX: 608
-PlayResY: 1080
-WrapStyle: 2
-
-[V4+ Styles]
-Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
-Style: Default,Bangers,110,&H00FFFFFF,&H000000FF,&H00000000,&H64000000,-1,0,0,0,100,100,0,0,1,3,0,5,10,10,540,1
-
-[Events]
-Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
-"""
-
-    def to_ass_timestamp(seconds):
-        hours = int(seconds // 3600)
-        minutes = int((seconds % 3600) // 60)
-        secs = int(seconds % 60)
-        centis = int((seconds - int(seconds)) * 100)
-        return f"{hours:d}:{minutes:02d}:{secs:02d}.{centis:02d}"
-
-    def remove_punctuation(text):
-        return re.sub(r'[^\w\s]', '', text)
-
-    body = ""
+STYLES_DIR = PROJECT_ROOT / "assets" / "styles"
+# Name of the assets/styles/<name>.ass file providing the subtitle header
+SUBTITLE_STYLE = os.getenv("SUBTITLE_STYLE", "default")
+# Words per karaoke phrase; 0 writes one event per word
+SUBTITLE_GROUP_WORDS = int(os.getenv("SUBTITLE_GROUP_WORDS", "0"))
+# A pause longer than this starts a new phrase
+SUBTITLE_GROUP_GAP = 0.6
+# Where word timings come from: "whisperx", "tts" (ElevenLabs alignment) or "align" (forced alignment)
+SUBTITLE_BACKEND = os.getenv("SUBTITLE_BACKEND", "whisperx")
+# Overlay pre-rendered subtitle sprites instead of burning subtitles in with libass
+SUBTITLE_OVERLAY = os.getenv("SUBTITLE_OVERLAY") == "1"
+
+_EVENTS_FORMAT = "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+_SENTENCE_END_RE = re.compile(r"[.!?…]['\"”’)]*$")
+_ASS_ESCAPES = str.maketrans({"\\": "\\\\", "{": r"\{", "}": r"\}"})
+_header_cache: dict[tuple, str] = {}
+
+
+def load_ass_header(style: str | None = None) -> str:
+    """Return the ``[Script Info]``/``[V4+ Styles]``/``[Events]`` header of a style file."""
+    path = STYLES_DIR / f"{style or SUBTITLE_STYLE}.ass"
+    key = (str(path), path.stat().st_mtime_ns)
+    header = _header_cache.get(key)
+    if header is None:
+        header = path.read_text(encoding="utf-8-sig")
+        if not header.endswith("\n"):
+            header += "\n"
+        if "[Events]" not in header:
+            header += "\n[Events]\n" + _EVENTS_FORMAT
+        _header_cache[key] = header
+    return header
+
+
+def ass_timestamp(seconds: float) -> str:
+    # rounded, not truncated: 0.29 * 100 is 28.999...
+    centis_total = int(round(seconds * 100))
+    hours, rest = divmod(centis_total, 360000)
+    minutes, rest = divmod(rest, 6000)
+    secs, centis = divmod(rest, 100)
+    return f"{hours:d}:{minutes:02d}:{secs:02d}.{centis:02d}"
+
+
+def _clean_word(word: str) -> str:
+    return _PUNCTUATION_RE.sub("", word).translate(_ASS_ESCAPES)
+
+
+def group_words(segments, max_words: int, max_gap: float = SUBTITLE_GROUP_GAP):
+    """Yield lists of consecutive words forming one on-screen phrase.
+
+    A phrase ends after ``max_words`` words, at the end of a sentence, or
+    before a pause longer than ``max_gap`` seconds.
+    """
+    phrase = []
     for segment in segments:
-        start = to_ass_timestamp(segment["start"])
-        end = to_ass_timestamp(segment["end"])
-        clean_word = remove_punctuation(segment["word"])
-        text = clean_word.replace("\\", "\\\\").replace("{", r"\{").replace("}", r"\}")
-        body += f"Dialogue: 0,{start},{end},Default,,0,0,0,,{text}\\N\n"
-
+        if phrase and segment["start"] - phrase[-1]["end"] > max_gap:
+            yield phrase
+            phrase = []
+        phrase.append(segment)
+        if len(phrase) >= max_words or _SENTENCE_END_RE.search(segment["word"]):
+            yield phrase
+            phrase = []
+    if phrase:
+        yield phrase
+
+
+def _karaoke_text(phrase) -> str:
+    # each \k lasts until the next word starts so the highlight never stalls
+    parts = []
+    for i, segment in enumerate(phrase):
+        until = phrase[i + 1]["start"] if i + 1 < len(phrase) else segment["end"]
+        centis = max(int(round((until - segment["start"]) * 100)), 0)
+        parts.append(f"{{\\k{centis}}}{_clean_word(segment['word'])}")
+    return " ".join(parts)
+
+
+def save_ass_subtitles(segments, path, *, group: int | None = None, style: str | None = None):
+    """Write word ``segments`` as an ASS file, streaming one event per line.
+
+    With ``group`` > 0 (default ``SUBTITLE_GROUP_WORDS``) words are merged
+    into phrases of up to that many words with karaoke ``\\k`` timing,
+    which leaves libass far fewer events to lay out per frame.
+    """
+    group = SUBTITLE_GROUP_WORDS if group is None else group
     with open(path, "w", encoding="utf-8") as f:
-        f.write(header + body)
+        f.write(load_ass_header(style))
+        if group > 0:
+            for phrase in group_words(segments, group):
+                start = ass_timestamp(phrase[0]["start"])
+                end = ass_timestamp(phrase[-1]["end"])
+                f.write(f"Dialogue: 0,{start},{end},Default,,0,0,0,,{_karaoke_text(phrase)}\\N\n")
+        else:
+            for segment in segments:
+                start = ass_timestamp(segment["start"])
+                end = ass_timestamp(segment["end"])
+                f.write(f"Dialogue: 0,{start},{end},Default,,0,0,0,,{_clean_word(segment['word'])}\\N\n")
 
 
 def sanitize_name(name: str) -> str:
@@ -111,6 +174,11 @@ def sanitize_name(name: str) -> str:
     return cleaned or "job"
 
 
+def estimate_read_time(text: str) -> float:
+    """Estimated narration length in seconds at 180 words per minute."""
+    return round(len(text.split()) / 180 * 60, 1)
+
+
 def extract_title_and_stats(text: str):
     """Extract title and simple stats from text."""
     lines = [l.strip() for l in text.splitlines() if l.strip()]
@@ -124,7 +192,7 @@ def extract_title_and_stats(text: str):
         language = detect(text)
     except Exception:
         language = "unknown"
-    est_read_time = round(word_count / 180 * 60, 1)  # seconds
+    est_read_time = estimate_read_time(text)
     return title, {
         "word_count": word_count,
         "char_count": char_count,
@@ -156,3 +224,8 @@ def get_output_dir() -> Path:
 
 def get_jobs_dir() -> Path:
     return JOBS_DIR
+
+
+def get_data_dir() -> Path:
+    """Return the directory for persistent caches that outlive a job."""
+    return DATA_DIR
@@ -1,14 +1,25 @@
 import os
+import re
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import json
-import requests
 from dotenv import load_dotenv
 import wave
-import struct
+import base64
+import math
+import random
+import sys
+from array import array
 from io import BytesIO
 from pydub import AudioSegment
 
-from .utils import get_logger, get_test_mode, ErrorCode
+from .utils import get_logger, get_test_mode, estimate_read_time, ErrorCode
+from .tts_cache import get_tts_cache, make_key
+from .alignment import words_from_characters, shift_words, proportional_align
+from .http_client import get_http_client
 
 load_dotenv()
 
@@ -19,62 +30,328 @@ TEMP_DIR.mkdir(parents=True, exist_ok=True)
 
 logger = get_logger(__name__)
 
-def generate_dummy_audio(path):
+ELEVENLABS_API_URL = os.getenv("ELEVENLABS_API_URL", "https://api.elevenlabs.io/v1")
+DEFAULT_VOICE_ID = "EXAVITQu4vr4xnSDxMaL"
+VOICE_SETTINGS = {
+    "stability": 0.5,
+    "similarity_boost": 0.75
+}
+
+
+# Chunking for long scripts: max characters per request, parallel requests
+# and extra attempts per failed chunk
+TTS_CHUNK_CHARS = int(os.getenv("TTS_CHUNK_CHARS", "2500"))
+TTS_CONCURRENCY = int(os.getenv("TTS_CONCURRENCY", "3"))
+TTS_CHUNK_RETRIES = int(os.getenv("TTS_CHUNK_RETRIES", "1"))
+# Bytes read from the HTTP body per iteration when streaming audio to disk
+STREAM_CHUNK_BYTES = 64 * 1024
+
+# Test mode audio: "silence", "tone" or "noise"; length follows the script's
+# estimated read time but never drops below the 2s the dummy subtitles span
+TEST_AUDIO_PATTERN = os.getenv("TEST_AUDIO_PATTERN", "silence")
+TEST_AUDIO_MIN_SECONDS = 2.0
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?…])\s+")
+
+
+def get_voice_id() -> str:
+    return os.getenv("ELEVENLABS_VOICE_ID", DEFAULT_VOICE_ID)
+
+
+def split_script(text: str, max_chars: int | None = None) -> list[str]:
+    """Split text into chunks of at most ``max_chars`` on paragraph/sentence boundaries."""
+    max_chars = max_chars or TTS_CHUNK_CHARS
+    units = []
+    for p_index, paragraph in enumerate(_PARAGRAPH_RE.split(text.strip())):
+        for s_index, sentence in enumerate(_SENTENCE_RE.split(paragraph.strip())):
+            sentence = " ".join(sentence.split())
+            if not sentence:
+                continue
+            new_paragraph = p_index > 0 and s_index == 0
+            # a single sentence over the limit is split on words
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(" ", 0, max_chars + 1)
+                if cut <= 0:
+                    cut = max_chars
+                units.append((sentence[:cut].strip(), new_paragraph))
+                sentence = sentence[cut:].strip()
+                new_paragraph = False
+            if sentence:
+                units.append((sentence, new_paragraph))
+
+    chunks = []
+    current = ""
+    for sentence, new_paragraph in units:
+        sep = "\n\n" if new_paragraph else " "
+        if current and len(current) + len(sep) + len(sentence) > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}{sep}{sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+def generate_dummy_audio(path, duration_seconds: float = 2.0, pattern: str = "silence"):
+    """Write a 44.1 kHz mono test WAV of silence, a 440 Hz tone or white noise."""
     try:
+        total = int(44100 * duration_seconds)
         with wave.open(str(path), 'w') as wf:
             wf.setnchannels(1)
             wf.setsampwidth(2)
             wf.setframerate(44100)
-            duration_seconds = 2
-            silence = [0] * int(44100 * duration_seconds)
-            wf.writeframes(b''.join(struct.pack('<h', s) for s in silence))
-        logger.info(f"Dummy audio generated at {path}")
+            # one second per block keeps memory flat for long durations
+            for offset in range(0, total, 44100):
+                wf.writeframes(_dummy_block(offset, min(44100, total - offset), pattern))
+        logger.info(f"Dummy audio generated at {path} ({duration_seconds:.1f}s {pattern})")
     except Exception as e:
         logger.error(f"Failed to generate dummy audio: {e}")
 
+
+def _dummy_block(offset: int, frames: int, pattern: str) -> bytes:
+    if pattern == "silence":
+        return bytes(frames * 2)
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+    if np is not None:
+        if pattern == "tone":
+            t = np.arange(offset, offset + frames) / 44100
+            samples = 0.2 * 32767 * np.sin(2 * np.pi * 440 * t)
+        else:
+            samples = np.random.default_rng(offset).normal(0, 0.1 * 32767, frames)
+        return np.clip(samples, -32768, 32767).astype("<i2").tobytes()
+    samples = array("h")
+    if pattern == "tone":
+        samples.extend(int(0.2 * 32767 * math.sin(2 * math.pi * 440 * (offset + i) / 44100)) for i in range(frames))
+    else:
+        rng = random.Random(offset)
+        samples.extend(max(-32768, min(32767, int(rng.gauss(0, 0.1 * 32767)))) for _ in range(frames))
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return samples.tobytes()
+
+
+def decode_to_wav(chunks, output_path: Path, fmt: str | None = None):
+    """Decode an encoded audio stream to 44.1 kHz mono WAV as it arrives.
+
+    The bytes are piped into a single ffmpeg process that writes straight to
+    disk, so memory use does not grow with the length of the audio. Without
+    ffmpeg on PATH the stream is buffered and decoded with pydub instead,
+    using ``fmt`` (e.g. ``"mp3"``) as the container hint.
+    """
+    if shutil.which("ffmpeg") is None:
+        seg = AudioSegment.from_file(BytesIO(b"".join(chunks)), format=fmt)
+        seg = seg.set_frame_rate(44100).set_channels(1)
+        seg.export(output_path, format="wav")
+        return
+
+    tmp_path = output_path.with_name(output_path.name + ".part")
+    cmd = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-i", "pipe:0",
+        "-ar", "44100", "-ac", "1", "-c:a", "pcm_s16le",
+        "-f", "wav", str(tmp_path),
+    ]
+    with tempfile.TemporaryFile() as stderr:
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=stderr)
+        try:
+            for chunk in chunks:
+                proc.stdin.write(chunk)
+        except BrokenPipeError:
+            pass  # ffmpeg exited early; its return code reports why
+        except BaseException:
+            proc.kill()
+            proc.wait()
+            tmp_path.unlink(missing_ok=True)
+            raise
+        finally:
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+        returncode = proc.wait()
+        if returncode != 0:
+            stderr.seek(0)
+            tmp_path.unlink(missing_ok=True)
+            raise RuntimeError(f"ffmpeg decode failed: {stderr.read().decode(errors='replace').strip()}")
+    os.replace(tmp_path, output_path)
+
+
 def call_elevenlabs_api(text, output_path):
     api_key = os.getenv("ELEVENLABS_API_KEY")
-    voice_id = os.getenv("ELEVENLABS_VOICE_ID", "EXAVITQu4vr4xnSDxMaL")  # Default voice ID
+    voice_id = get_voice_id()
 
     if not api_key:
         logger.error(f"{ErrorCode.ELEVENLABS_FAIL.value}: API key missing")
         return False
 
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
+    url = f"{ELEVENLABS_API_URL}/text-to-speech/{voice_id}"
     headers = {
         "xi-api-key": api_key,
         "Content-Type": "application/json"
     }
     payload = {
         "text": text,
-        "voice_settings": {
-            "stability": 0.5,
-            "similarity_boost": 0.75
-        }
+        "voice_settings": VOICE_SETTINGS
     }
 
     try:
-        response = requests.post(url, headers=headers, json=payload)
-        if response.status_code == 200:
+        response = get_http_client().post(url, headers=headers, json=payload, stream=True)
+        with response:
+            if response.status_code != 200:
+                logger.error(f"{ErrorCode.ELEVENLABS_FAIL.value}: {response.status_code} {response.text}")
+                return False
             content_type = response.headers.get("Content-Type", "audio/mpeg")
-            audio_data = response.content
-            if "mpeg" in content_type or output_path.suffix.lower() != ".wav":
-                seg = AudioSegment.from_file(BytesIO(audio_data))
-                seg = seg.set_frame_rate(44100).set_channels(1)
-                seg.export(output_path, format="wav")
-            else:
-                with open(output_path, "wb") as f:
-                    f.write(audio_data)
-            logger.info(f"Voiceover generated at {output_path}")
-            return True
-        else:
-            logger.error(f"{ErrorCode.ELEVENLABS_FAIL.value}: {response.status_code} {response.text}")
-            return False
+            # even a WAV response is decoded, so every voiceover has the same rate and layout
+            fmt = "wav" if "wav" in content_type else "mp3"
+            decode_to_wav(response.iter_content(chunk_size=STREAM_CHUNK_BYTES), output_path, fmt)
+        logger.info(f"Voiceover generated at {output_path}")
+        return True
     except Exception as e:
         logger.error(f"{ErrorCode.ELEVENLABS_FAIL.value}: {e}")
         return False
 
-def generate_voiceover(script_text, output_path, *, test_mode: bool | None = None):
+def call_elevenlabs_with_timestamps(text, output_path):
+    """Synthesize ``text`` and return its word timings.
+
+    Uses the ``/with-timestamps`` endpoint, which returns base64 audio plus
+    per-character timings. Returns None when the request fails and an empty
+    list when the response has no alignment.
+    """
+    api_key = os.getenv("ELEVENLABS_API_KEY")
+    if not api_key:
+        logger.error(f"{ErrorCode.ELEVENLABS_FAIL.value}: API key missing")
+        return None
+
+    url = f"{ELEVENLABS_API_URL}/text-to-speech/{get_voice_id()}/with-timestamps"
+    headers = {
+        "xi-api-key": api_key,
+        "Content-Type": "application/json"
+    }
+    payload = {
+        "text": text,
+        "voice_settings": VOICE_SETTINGS
+    }
+
+    try:
+        response = get_http_client().post(url, headers=headers, json=payload)
+        if response.status_code != 200:
+            logger.error(f"{ErrorCode.ELEVENLABS_FAIL.value}: {response.status_code} {response.text}")
+            return None
+        data = response.json()
+        decode_to_wav([base64.b64decode(data["audio_base64"])], output_path)
+        alignment = data.get("alignment") or data.get("normalized_alignment") or {}
+        logger.info(f"Voiceover generated at {output_path}")
+        return words_from_characters(alignment)
+    except Exception as e:
+        logger.error(f"{ErrorCode.ELEVENLABS_FAIL.value}: {e}")
+        return None
+
+def _chunk_words_path(chunk_path: Path) -> Path:
+    return chunk_path.with_suffix(".words.json")
+
+def _synthesize_chunk(text: str, chunk_path: Path, cache, timestamps: bool = False) -> bool:
+    """Synthesize one chunk, reusing a cached copy. Return True on a cache hit.
+
+    With ``timestamps`` the chunk's word timings are written next to it.
+    """
+    key = make_key(text, get_voice_id(), VOICE_SETTINGS) if cache else None
+    if cache:
+        words = cache.get_words(key) if timestamps else None
+        if (words is not None or not timestamps) and cache.fetch(key, chunk_path):
+            if timestamps:
+                _write_words(words, _chunk_words_path(chunk_path))
+            return True
+    for attempt in range(1 + TTS_CHUNK_RETRIES):
+        if timestamps:
+            words = call_elevenlabs_with_timestamps(text, chunk_path)
+            ok = words is not None
+        else:
+            ok = call_elevenlabs_api(text, chunk_path)
+        if ok:
+            if timestamps:
+                if not words:
+                    logger.warning(f"No timestamps for chunk {chunk_path.name}, estimating from the audio")
+                    words = proportional_align(text, chunk_path)
+                _write_words(words, _chunk_words_path(chunk_path))
+            if cache:
+                cache.put(key, chunk_path)
+                if timestamps:
+                    cache.put_words(key, words)
+            return False
+        logger.warning(f"Chunk {chunk_path.name} failed (attempt {attempt + 1})")
+    raise RuntimeError(ErrorCode.ELEVENLABS_FAIL.value)
+
+
+def _write_words(words, path: Path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(words, f)
+
+
+def _read_words(path: Path) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def concat_wavs(paths, output_path: Path, block_frames: int = 65536):
+    """Append WAV files in order, streaming frames so only one block is in memory."""
+    output_path = Path(output_path)
+    tmp_path = output_path.with_name(output_path.name + ".part")
+    params = None
+    with wave.open(str(tmp_path), "wb") as out:
+        for path in paths:
+            with wave.open(str(path), "rb") as wf:
+                chunk_params = (wf.getnchannels(), wf.getsampwidth(), wf.getframerate())
+                if params is None:
+                    params = chunk_params
+                    out.setnchannels(params[0])
+                    out.setsampwidth(params[1])
+                    out.setframerate(params[2])
+                elif chunk_params != params:
+                    raise ValueError(f"{path} has format {chunk_params}, expected {params}")
+                while True:
+                    frames = wf.readframes(block_frames)
+                    if not frames:
+                        break
+                    out.writeframes(frames)
+    os.replace(tmp_path, output_path)
+
+
+def synthesize_chunks(chunks: list[str], output_path: Path, cache=None, words: list | None = None) -> int:
+    """Synthesize chunks in parallel and stitch them into ``output_path``.
+
+    When a ``words`` list is passed, word timings are requested from the TTS
+    endpoint and appended to it, shifted by the length of the chunks before.
+    Return the number of chunks served from the cache.
+    """
+    timestamps = words is not None
+    chunk_dir = output_path.parent / f".{output_path.stem}_chunks"
+    chunk_dir.mkdir(parents=True, exist_ok=True)
+    chunk_paths = [chunk_dir / f"{i:04d}.wav" for i in range(len(chunks))]
+    try:
+        workers = max(1, min(TTS_CONCURRENCY, len(chunks)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            hits = list(pool.map(lambda c: _synthesize_chunk(c[0], c[1], cache, timestamps), zip(chunks, chunk_paths)))
+        concat_wavs(chunk_paths, output_path)
+        if timestamps:
+            offset = 0.0
+            for chunk_path in chunk_paths:
+                words.extend(shift_words(_read_words(_chunk_words_path(chunk_path)), offset))
+                with wave.open(str(chunk_path), "rb") as wf:
+                    offset += wf.getnframes() / wf.getframerate()
+    finally:
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+    return sum(hits)
+
+
+def generate_voiceover(script_text, output_path, *, test_mode: bool | None = None, timestamps: bool = False):
+    """Write the voiceover WAV and return info about how it was produced.
+
+    With ``timestamps`` the info also carries the spoken ``words`` with their
+    timings, taken from the TTS alignment instead of speech recognition.
+    """
     if test_mode is None:
         test_mode = get_test_mode()
     output_path = Path(output_path)
@@ -82,10 +359,36 @@ def generate_voiceover(script_text, output_path, *, test_mode: bool | None = Non
 
     if test_mode:
         logger.info("Test mode active: using dummy audio and skipping ElevenLabs")
-        generate_dummy_audio(output_path)
-    else:
-        logger.info("Calling ElevenLabs API...")
-        success = call_elevenlabs_api(script_text, output_path)
-        if not success:
-            logger.error(f"{ErrorCode.ELEVENLABS_FAIL.value}: generation failed")
-            raise RuntimeError(ErrorCode.ELEVENLABS_FAIL.value)
+        duration = max(estimate_read_time(script_text), TEST_AUDIO_MIN_SECONDS)
+        generate_dummy_audio(output_path, duration, TEST_AUDIO_PATTERN)
+        if timestamps:
+            return {"cache": "skipped", "words": proportional_align(script_text, output_path)}
+        return {"cache": "skipped"}
+
+    cache = get_tts_cache()
+    key = make_key(script_text, get_voice_id(), VOICE_SETTINGS) if cache else None
+    if cache:
+        cached_words = cache.get_words(key) if timestamps else None
+        if (cached_words is not None or not timestamps) and cache.fetch(key, output_path):
+            logger.info(f"Voiceover cache hit ({key[:12]}), skipping ElevenLabs")
+            if timestamps:
+                return {"cache": "hit", "cache_key": key, "words": cached_words}
+            return {"cache": "hit", "cache_key": key}
+
+    chunks = split_script(script_text)
+    words = [] if timestamps else None
+    logger.info(f"Calling ElevenLabs API for {len(chunks)} chunk(s)...")
+    try:
+        chunk_hits = synthesize_chunks(chunks, output_path, cache, words)
+    except Exception as e:
+        logger.error(f"{ErrorCode.ELEVENLABS_FAIL.value}: generation failed: {e}")
+        raise RuntimeError(ErrorCode.ELEVENLABS_FAIL.value) from e
+    info = {"chunks": len(chunks), "chunk_cache_hits": chunk_hits}
+    if timestamps:
+        info["words"] = words
+    if cache:
+        cache.put(key, output_path)
+        if timestamps:
+            cache.put_words(key, words)
+        return {"cache": "miss", "cache_key": key, **info}
+    return {"cache": "disabled", **info}
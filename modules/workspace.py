@@ -0,0 +1,69 @@
+"""Per-job scratch directories for pipeline intermediates."""
+import os
+import shutil
+import uuid
+from pathlib import Path
+
+from .utils import get_logger, sanitize_name, ErrorCode, JOBS_DIR
+
+logger = get_logger(__name__)
+
+TMPFS_ROOT = Path("/dev/shm")
+# Per-job limit on intermediate files; 0 disables the check
+WORKSPACE_QUOTA_MB = int(os.getenv("WORKSPACE_QUOTA_MB", "2048"))
+# Use tmpfs only when it has at least this much room besides the quota
+WORKSPACE_TMPFS_HEADROOM_MB = int(os.getenv("WORKSPACE_TMPFS_HEADROOM_MB", "256"))
+
+
+def _tmpfs_usable(quota_bytes: int) -> bool:
+    if os.getenv("WORKSPACE_TMPFS", "1") != "1":
+        return False
+    if not TMPFS_ROOT.is_dir() or not os.access(TMPFS_ROOT, os.W_OK):
+        return False
+    free = shutil.disk_usage(TMPFS_ROOT).free
+    return free >= quota_bytes + WORKSPACE_TMPFS_HEADROOM_MB * 2**20
+
+
+def workspace_root(*, prefer_tmpfs: bool = True, quota_bytes: int = 0) -> Path:
+    """Return the directory new workspaces are created in."""
+    if os.getenv("WORKSPACE_ROOT"):
+        return Path(os.environ["WORKSPACE_ROOT"])
+    if prefer_tmpfs and _tmpfs_usable(quota_bytes):
+        return TMPFS_ROOT / "autocontent"
+    return JOBS_DIR
+
+
+class JobWorkspace:
+    """A scratch directory owned by a single pipeline run."""
+
+    def __init__(self, job_id: str, *, prefer_tmpfs: bool = True, quota_bytes: int | None = None):
+        self.quota_bytes = WORKSPACE_QUOTA_MB * 2**20 if quota_bytes is None else quota_bytes
+        root = workspace_root(prefer_tmpfs=prefer_tmpfs, quota_bytes=self.quota_bytes)
+        self.path = root / f"{sanitize_name(job_id)}-{uuid.uuid4().hex[:8]}"
+        self.path.mkdir(parents=True, exist_ok=False)
+        logger.debug(f"Workspace created at {self.path}")
+
+    def __truediv__(self, name) -> Path:
+        return self.path / name
+
+    def usage_bytes(self) -> int:
+        total = 0
+        for f in self.path.rglob("*"):
+            try:
+                if f.is_file():
+                    total += f.stat().st_size
+            except FileNotFoundError:
+                continue
+        return total
+
+    def check_quota(self):
+        """Raise if the intermediates have outgrown the per-job quota."""
+        if not self.quota_bytes:
+            return
+        used = self.usage_bytes()
+        if used > self.quota_bytes:
+            logger.error(f"{ErrorCode.WORKSPACE_QUOTA.value}: {used / 2**20:.0f} MB in {self.path}")
+            raise RuntimeError(ErrorCode.WORKSPACE_QUOTA.value)
+
+    def cleanup(self):
+        shutil.rmtree(self.path, ignore_errors=True)
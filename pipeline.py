@@ -3,20 +3,41 @@ import json
 import os
 import shutil
 import subprocess
+import sys
+import tempfile
 import time
 import logging
 import wave
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
-from modules.voiceover import generate_voiceover
-from modules.generate_subtitles import generate_subtitles
-from modules.render_video import render_final_video
+from modules.voiceover import generate_voiceover, get_voice_id, VOICE_SETTINGS, TEST_AUDIO_PATTERN
+from modules.generate_subtitles import transcribe_words, align_script
+from modules.model_pool import warm_models
+from modules.asr_batcher import get_asr_batcher, start_asr_batcher, stop_asr_batcher
+from modules.render_video import render_final_video, extract_thumbnail
+from modules.dag import Stage, StageManifest, fingerprint_of, run_stages
+from modules.workspace import JobWorkspace
+from modules.backgrounds import (
+    content_hash,
+    normalize_background,
+    select_offset,
+    BACKGROUND_OFFSET,
+    MEZZANINE_VERSION,
+    OFFSET_STRATEGIES,
+)
 from modules.utils import (
     get_logger,
     sanitize_name,
     extract_title_and_stats,
     init_job_log,
     save_job_log,
+    save_ass_subtitles,
+    load_ass_header,
+    SUBTITLE_BACKEND,
+    SUBTITLE_GROUP_WORDS,
+    SUBTITLE_OVERLAY,
+    SUBTITLE_STYLE,
     ErrorCode,
     is_api_mode,
     OUTPUT_DIR,
@@ -25,6 +46,11 @@ from modules.utils import (
 logger = get_logger(__name__)
 
 
+# "tts" takes word timings from the ElevenLabs alignment and skips WhisperX;
+# "align" force-aligns the script with the alignment model only
+SUBTITLE_BACKENDS = ("whisperx", "tts", "align")
+
+
 def parse_args():
     parser = argparse.ArgumentParser(description="Run the AutoContent pipeline")
     parser.add_argument("--script", required=True, help="Path to script text file")
@@ -41,6 +67,14 @@ def parse_args():
     parser.add_argument("--json", action="store_true", help="Print JSON summary to stdout")
     parser.add_argument("--strict", action="store_true", help="Stop pipeline on first error")
     parser.add_argument("--max-length", type=int, default=0, help="Trim script if duration exceeds this many seconds")
+    parser.add_argument("--bg-cache", action="store_true", help="Render from a cached, pre-normalized copy of the background")
+    parser.add_argument("--bg-offset", choices=OFFSET_STRATEGIES, default=BACKGROUND_OFFSET, help="Where in the background the video starts")
+    parser.add_argument("--single-pass", action="store_true", help="Write final, compressed and thumbnail outputs in one ffmpeg pass")
+    parser.add_argument("--resume", action="store_true", help="Reuse stages whose inputs are unchanged since the last run into the same output folder")
+    parser.add_argument("--subtitle-style", default=SUBTITLE_STYLE, help="Subtitle header from assets/styles/<name>.ass")
+    parser.add_argument("--group-words", type=int, default=SUBTITLE_GROUP_WORDS, help="Merge up to N words per subtitle event with karaoke timing (0 = one word per event)")
+    parser.add_argument("--subtitle-overlay", action="store_true", default=SUBTITLE_OVERLAY, help="Pre-render subtitles into sprites and overlay them instead of burning in with libass")
+    parser.add_argument("--subtitle-backend", choices=SUBTITLE_BACKENDS, default=SUBTITLE_BACKEND, help="Word timings from WhisperX, the TTS alignment, or forced alignment of the script")
     return parser.parse_args()
 
 
@@ -71,6 +105,29 @@ def compress_video(src: Path, dest: Path):
         raise RuntimeError(ErrorCode.COMPRESS_FAIL.value) from e
 
 
+def prepare_background(background_path: Path, args):
+    """Return the background to render from and whether it is already normalized."""
+    if not (getattr(args, "bg_cache", False) or os.getenv("BACKGROUND_CACHE") == "1"):
+        return background_path, False
+    try:
+        return normalize_background(background_path), True
+    except Exception as e:
+        logger.warning(f"Background cache unavailable, rendering from source: {e}")
+        return background_path, False
+
+
+def pick_background_offset(background_path: Path, audio_duration: float, args, seed: str) -> float:
+    strategy = getattr(args, "bg_offset", BACKGROUND_OFFSET)
+    try:
+        offset = select_offset(background_path, audio_duration, strategy, seed=seed)
+    except Exception as e:
+        logger.warning(f"Could not pick a background offset, starting at 0: {e}")
+        return 0.0
+    if offset:
+        logger.info(f"Background starts at {offset:.2f}s ({strategy})")
+    return offset
+
+
 def cleanup_old_jobs(count: int, base: Path = OUTPUT_DIR):
     if count <= 0 or not base.exists():
         return
@@ -81,12 +138,216 @@ def cleanup_old_jobs(count: int, base: Path = OUTPUT_DIR):
         logger.info(f"Removed old output folder: {d}")
 
 
+# Intermediates and stage fingerprints kept in the output folder for --resume
+RESUME_DIR = ".stages"
+
+
 def fmt_time(seconds: float) -> str:
     m, s = divmod(int(seconds), 60)
     return f"{m:02d}:{s:02d}"
 
 
-def run_pipeline(args, job_id: str | None = None, started_at: str | None = None):
+def build_stages(args, background_path: Path, job_id: str | None, progress=None):
+    """Declare the pipeline stages and the context keys each one produces."""
+    resume = getattr(args, "resume", False)
+    backend = getattr(args, "subtitle_backend", SUBTITLE_BACKEND)
+    style = getattr(args, "subtitle_style", SUBTITLE_STYLE)
+    group_size = getattr(args, "group_words", SUBTITLE_GROUP_WORDS)
+    # with a shared batcher the stage only waits, so it must not hold a CPU worker
+    batcher = get_asr_batcher() if backend == "whisperx" else None
+
+    def prepare_script(ctx):
+        with open(ctx["script_path"], "r", encoding="utf-8") as f:
+            script_text = f.read()
+
+        if args.max_length:
+            max_words = args.max_length * 3
+            words = script_text.split()
+            if len(words) > max_words:
+                script_text = " ".join(words[:max_words])
+                logger.info(f"Script trimmed to {args.max_length}s / {max_words} words")
+
+        title, stats = extract_title_and_stats(script_text)
+
+        if args.output_dir:
+            output_dir = Path(args.output_dir)
+        else:
+            output_dir = OUTPUT_DIR / sanitize_name(title)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        workspace = JobWorkspace(job_id or output_dir.name, prefer_tmpfs=not args.keep_temp)
+        outputs = {
+            "script_text": script_text,
+            "title": title,
+            "stats": stats,
+            "output_dir": output_dir,
+            "workspace": workspace,
+            "voice_path": workspace / "voice.wav",
+            "subs_path": workspace / "subtitles.ass",
+            "video_path": output_dir / "final.mp4",
+            "compressed_path": output_dir / "final_compressed.mp4",
+        }
+        if resume:
+            # intermediates must outlive the workspace to be reused next time
+            stage_dir = output_dir / RESUME_DIR
+            stage_dir.mkdir(exist_ok=True)
+            outputs.update(
+                voice_path=stage_dir / "voice.wav",
+                subs_path=stage_dir / "subtitles.ass",
+                stage_manifest=StageManifest(stage_dir / "manifest.json"),
+            )
+        return outputs
+
+    def prepare_bg(ctx):
+        render_background, prenormalized = prepare_background(background_path, args)
+        return {"render_background": render_background, "prenormalized": prenormalized}
+
+    def tts(ctx):
+        voice_path = ctx["voice_path"]
+        info = generate_voiceover(
+            ctx["script_text"], voice_path, test_mode=args.test_mode, timestamps=backend == "tts"
+        ) or {}
+        tts_words = info.pop("words", None)
+        ctx["workspace"].check_quota()
+        with wave.open(str(voice_path)) as wf:
+            audio_duration = wf.getnframes() / wf.getframerate()
+        return {"voiceover_info": info, "audio_duration": audio_duration, "tts_words": tts_words}
+
+    def asr(ctx):
+        if ctx.get("tts_words"):
+            logger.info("Using word timings from the TTS alignment, skipping WhisperX")
+            return {"words": ctx["tts_words"]}
+        if backend == "align":
+            words = align_script(
+                ctx["voice_path"], ctx["script_text"], language=ctx["stats"].get("language"), test_mode=args.test_mode
+            )
+            return {"words": words}
+        if batcher is not None:
+            words = batcher.transcribe(ctx["voice_path"], model_size=args.model_size, test_mode=args.test_mode)
+        else:
+            words = transcribe_words(ctx["voice_path"], model_size=args.model_size, test_mode=args.test_mode)
+        return {"words": words}
+
+    def write_subtitles(ctx):
+        subs_path = ctx["subs_path"]
+        try:
+            save_ass_subtitles(ctx["words"], subs_path, group=group_size, style=style)
+        except Exception as e:
+            logger.error(f"{ErrorCode.WHISPERX_FAIL.value}: {e}")
+            raise RuntimeError(ErrorCode.WHISPERX_FAIL.value) from e
+        ctx["workspace"].check_quota()
+        logger.info(f"Subtitles saved to {subs_path}")
+        return {}
+
+    def render(ctx):
+        video_path = ctx["video_path"]
+        render_background = ctx.get("render_background", background_path)
+        background_offset = pick_background_offset(
+            render_background, ctx.get("audio_duration", 0.0), args, job_id or ctx["output_dir"].name
+        )
+        single_pass = single_pass_enabled(ctx)
+        render_final_video(
+            render_background,
+            ctx["voice_path"],
+            ctx["subs_path"],
+            video_path,
+            thumbnail=args.thumbnail and single_pass,
+            compressed_path=ctx["compressed_path"] if single_pass else None,
+            prenormalized=ctx.get("prenormalized", False),
+            start_offset=background_offset,
+            overlay=getattr(args, "subtitle_overlay", SUBTITLE_OVERLAY),
+            progress=progress.render if progress is not None else None,
+            duration=ctx.get("audio_duration"),
+        )
+        return {"background_offset": background_offset, "single_pass": single_pass}
+
+    def compress(ctx):
+        compress_video(ctx["video_path"], ctx["compressed_path"])
+        return {}
+
+    def thumbnail(ctx):
+        thumb = ctx["video_path"].with_suffix(".png")
+        extract_thumbnail(ctx["video_path"], thumb)
+        return {}
+
+    def single_pass_enabled(ctx):
+        return getattr(args, "single_pass", False) and args.compress and not ctx["job_log"]["errors"]
+
+    def render_files(ctx):
+        files = {"video": ctx["video_path"]}
+        if ctx.get("single_pass"):
+            files["compressed"] = ctx["compressed_path"]
+            if args.thumbnail:
+                files["thumbnail"] = ctx["video_path"].with_suffix(".png")
+        return files
+
+    # Input fingerprints for --resume. Each stage hashes its own settings plus
+    # the fingerprints of the stages it consumes, so a change propagates only
+    # downstream: a new background reruns background and render, nothing else.
+    def upstream(ctx, *names):
+        fps = [ctx["fingerprints"].get(n) for n in names]
+        return None if None in fps else fps
+
+    def tts_fingerprint(ctx):
+        pattern = TEST_AUDIO_PATTERN if args.test_mode else None
+        return fingerprint_of("tts", ctx["script_text"], get_voice_id(), VOICE_SETTINGS, args.test_mode, pattern, backend)
+
+    def asr_fingerprint(ctx):
+        deps = upstream(ctx, "tts")
+        return deps and fingerprint_of("asr", deps, args.model_size, args.test_mode, backend)
+
+    def subtitles_fingerprint(ctx):
+        deps = upstream(ctx, "asr")
+        return deps and fingerprint_of("subtitles", deps, load_ass_header(style), group_size)
+
+    def background_fingerprint(ctx):
+        cached = getattr(args, "bg_cache", False) or os.getenv("BACKGROUND_CACHE") == "1"
+        return fingerprint_of("background", content_hash(background_path), cached, MEZZANINE_VERSION)
+
+    def render_fingerprint(ctx):
+        strategy = getattr(args, "bg_offset", BACKGROUND_OFFSET)
+        deps = upstream(ctx, "tts", "subtitles", "background")
+        if deps is None or strategy in ("random", "round-robin"):
+            return None
+        seed = (job_id or ctx["output_dir"].name) if strategy == "seeded" else None
+        return fingerprint_of(
+            "render", deps, strategy, seed, single_pass_enabled(ctx), args.thumbnail, args.compress,
+            getattr(args, "subtitle_overlay", SUBTITLE_OVERLAY),
+        )
+
+    def after_render(name):
+        def fingerprint(ctx):
+            deps = upstream(ctx, "render")
+            return deps and fingerprint_of(name, deps)
+        return fingerprint
+
+    rendering = not args.dry_run
+    return [
+        Stage("script", prepare_script, critical=True,
+              outputs=("script_text", "title", "stats", "output_dir", "workspace")),
+        Stage("background", prepare_bg, requires=("script",), pool="cpu", when=lambda ctx: rendering,
+              outputs=("render_background", "prenormalized"), fingerprint=background_fingerprint),
+        Stage("tts", tts, requires=("script",), outputs=("voiceover_info", "audio_duration", "tts_words"),
+              fingerprint=tts_fingerprint, artifacts=lambda ctx: {"audio": ctx["voice_path"]}),
+        Stage("asr", asr, requires=("tts",), pool="io" if batcher else "cpu", outputs=("words",), fingerprint=asr_fingerprint),
+        Stage("subtitles", write_subtitles, requires=("asr",), skip_on_failure=True,
+              fingerprint=subtitles_fingerprint, artifacts=lambda ctx: {"subtitles": ctx["subs_path"]}),
+        Stage("render", render, requires=("subtitles", "background"), pool="cpu", when=lambda ctx: rendering,
+              outputs=("background_offset", "single_pass"), fingerprint=render_fingerprint, artifacts=render_files),
+        Stage("compress", compress, requires=("render",), pool="cpu",
+              when=lambda ctx: rendering and args.compress and not ctx.get("single_pass") and not ctx["job_log"]["errors"],
+              fingerprint=after_render("compress"), artifacts=lambda ctx: {"compressed": ctx["compressed_path"]}),
+        Stage("thumbnail", thumbnail, requires=("render",), pool="cpu", skip_on_failure=True,
+              when=lambda ctx: rendering and args.thumbnail and not ctx.get("single_pass"),
+              fingerprint=after_render("thumbnail"),
+              artifacts=lambda ctx: {"thumbnail": ctx["video_path"].with_suffix(".png")}),
+    ]
+
+
+def run_pipeline(args, job_id: str | None = None, started_at: str | None = None, progress=None, cancel=None):
+    """Run every stage for one script; ``progress`` (a :class:`ProgressReporter`) receives stage and render events.
+
+    Setting ``cancel`` (a ``threading.Event``) stops the run before its next stage.
+    """
     if args.verbose:
         logger.setLevel(logging.DEBUG)
     elif is_api_mode(args):
@@ -99,117 +360,77 @@ def run_pipeline(args, job_id: str | None = None, started_at: str | None = None)
     if args.cleanup_old:
         cleanup_old_jobs(args.cleanup_old)
 
-    with open(script_path, "r", encoding="utf-8") as f:
-        script_text = f.read()
-
-    if args.max_length:
-        max_words = args.max_length * 3
-        words = script_text.split()
-        if len(words) > max_words:
-            script_text = " ".join(words[:max_words])
-            logger.info(f"Script trimmed to {args.max_length}s / {max_words} words")
-
-    title, stats = extract_title_and_stats(script_text)
-
-    if args.output_dir:
-        output_dir = Path(args.output_dir)
-    else:
-        output_dir = OUTPUT_DIR / sanitize_name(title)
-
-    output_dir.mkdir(parents=True, exist_ok=True)
-    temp_dir = Path("temp")
-    temp_dir.mkdir(parents=True, exist_ok=True)
-
-    job_log = init_job_log(output_dir.name, args.test_mode)
-
-    voice_path = temp_dir / "voice.wav"
-    subs_path = temp_dir / "subtitles.ass"
-    video_path = output_dir / "final.mp4"
+    job_log = init_job_log(job_id or "", args.test_mode)
+    ctx = {"script_path": script_path, "job_log": job_log}
+    if args.dry_run:
+        logger.info("Dry run enabled - skipping video rendering")
 
     start = time.time()
-
-    try:
-        generate_voiceover(script_text, voice_path, test_mode=args.test_mode)
-        job_log["output_files"]["audio"] = str(voice_path)
-    except Exception as e:
-        job_log["errors"].append(e.args[0] if e.args else str(e))
-        if args.strict:
-            raise
-
-    with wave.open(str(voice_path)) as wf:
-        audio_duration = wf.getnframes() / wf.getframerate()
-
     try:
-        generate_subtitles(voice_path, subs_path, model_size=args.model_size, test_mode=args.test_mode)
-        job_log["output_files"]["subtitles"] = str(subs_path)
-    except Exception as e:
-        job_log["errors"].append(e.args[0] if e.args else str(e))
-        if args.strict:
-            raise
-
-    if not args.dry_run:
-        try:
-            render_final_video(
-                background_path,
-                voice_path,
-                subs_path,
-                video_path,
-                thumbnail=args.thumbnail,
-            )
-            job_log["output_files"]["video"] = str(video_path)
-            if args.thumbnail:
-                job_log["output_files"]["thumbnail"] = str(video_path.with_suffix(".png"))
-        except Exception as e:
-            job_log["errors"].append(e.args[0] if e.args else str(e))
-            if args.strict:
-                raise
-        if args.compress and not job_log["errors"]:
-            try:
-                compressed = output_dir / "final_compressed.mp4"
-                compress_video(video_path, compressed)
-                job_log["output_files"]["compressed"] = str(compressed)
-            except Exception as e:
-                job_log["errors"].append(e.args[0] if e.args else str(e))
-                if args.strict:
-                    raise
-    else:
-        logger.info("Dry run enabled - skipping video rendering")
-
-    end_time = time.time()
-    duration = end_time - start
-
-    metadata = {
-        "job_id": job_id or output_dir.name,
-        "title": title,
-        **stats,
-        "script": script_path.name,
-        "started_at": started_at or time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(start)),
-        "completed_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(end_time)),
-        "duration_seconds": int(duration),
-        "model_size": args.model_size,
-        "voice_id": os.getenv("ELEVENLABS_VOICE_ID", "default"),
-        "audio_duration": round(audio_duration, 2),
-        "total_runtime": round(duration, 2),
-        "flags": {
-            "dry_run": args.dry_run,
-            "test_mode": args.test_mode,
-            "thumbnail": args.thumbnail,
-            "keep_temp": args.keep_temp,
+        states = run_stages(
+            build_stages(args, background_path, job_id, progress),
+            ctx,
+            strict=args.strict,
+            errors=job_log["errors"],
+            timings=job_log.setdefault("stage_timings", {}),
+            listener=progress.stage if progress is not None else None,
+            cancel=cancel,
+        )
+        job_log["output_files"].update({k: str(v) for k, v in ctx.get("artifacts", {}).items()})
+
+        output_dir = ctx["output_dir"]
+        title = ctx["title"]
+        audio_duration = ctx.get("audio_duration", 0.0)
+        job_log["job_id"] = job_id or output_dir.name
+
+        end_time = time.time()
+        duration = end_time - start
+
+        metadata = {
+            "job_id": job_id or output_dir.name,
+            "title": title,
+            **ctx["stats"],
+            "script": script_path.name,
+            "started_at": started_at or time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(start)),
+            "completed_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(end_time)),
+            "duration_seconds": int(duration),
             "model_size": args.model_size,
-            "compress": args.compress,
-        },
-    }
-
-    with open(output_dir / "metadata.json", "w", encoding="utf-8") as f:
-        json.dump(metadata, f, indent=2)
+            "voice_id": get_voice_id(),
+            "voiceover_cache": ctx.get("voiceover_info", {}).get("cache"),
+            "audio_duration": round(audio_duration, 2),
+            "background_offset": round(ctx.get("background_offset", 0.0), 3),
+            "total_runtime": round(duration, 2),
+            "stage_timings": job_log["stage_timings"],
+            "reused_stages": [name for name, state in states.items() if state == "reused"],
+            "flags": {
+                "dry_run": args.dry_run,
+                "test_mode": args.test_mode,
+                "thumbnail": args.thumbnail,
+                "keep_temp": args.keep_temp,
+                "model_size": args.model_size,
+                "compress": args.compress,
+                "single_pass": getattr(args, "single_pass", False),
+                "bg_cache": getattr(args, "bg_cache", False),
+                "resume": getattr(args, "resume", False),
+                "subtitle_backend": getattr(args, "subtitle_backend", SUBTITLE_BACKEND),
+                "subtitle_style": getattr(args, "subtitle_style", SUBTITLE_STYLE),
+                "group_words": getattr(args, "group_words", SUBTITLE_GROUP_WORDS),
+                "subtitle_overlay": getattr(args, "subtitle_overlay", SUBTITLE_OVERLAY),
+            },
+        }
 
-    job_log["duration_sec"] = round(duration, 2)
-    save_job_log(job_log, output_dir)
+        with open(output_dir / "metadata.json", "w", encoding="utf-8") as f:
+            json.dump(metadata, f, indent=2)
 
-    if not args.keep_temp:
-        shutil.rmtree(temp_dir, ignore_errors=True)
-    else:
-        logger.info(f"Temp files retained at {temp_dir}")
+        job_log["duration_sec"] = round(duration, 2)
+        save_job_log(job_log, output_dir)
+    finally:
+        workspace = ctx.get("workspace")
+        if workspace is not None:
+            if not args.keep_temp:
+                workspace.cleanup()
+            else:
+                logger.info(f"Temp files retained at {workspace.path}")
 
     summary_text = (
         f"\n✅ Job complete\n"
@@ -233,7 +454,174 @@ def run_pipeline(args, job_id: str | None = None, started_at: str | None = None)
     return output_dir
 
 
+# Per-item keys a batch manifest may set on top of the batch-wide options
+BATCH_OVERRIDES = (
+    "model_size", "thumbnail", "compress", "max_length", "single_pass", "bg_cache", "bg_offset", "dry_run",
+    "subtitle_backend", "subtitle_style", "group_words", "subtitle_overlay",
+)
+
+
+def parse_batch_args(argv=None):
+    parser = argparse.ArgumentParser(prog="pipeline.py batch", description="Run the pipeline over many scripts")
+    parser.add_argument("source", help="Directory of .txt scripts or a JSONL manifest")
+    parser.add_argument("--background", help="Background video for items that do not name one")
+    parser.add_argument("--output", dest="output_root", default=str(OUTPUT_DIR), help="Folder receiving one output folder per item")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("BATCH_WORKERS", "2")), help="Jobs run in parallel")
+    parser.add_argument("--summary", help="Summary JSONL path (default: <output>/batch_summary.jsonl)")
+    parser.add_argument("--dry-run", action="store_true", help="Run pipeline without rendering final video")
+    parser.add_argument("--test-mode", action="store_true", help="Use dummy audio and subtitles")
+    parser.add_argument("--verbose", action="store_true", help="Enable debug logging")
+    parser.add_argument("--thumbnail", action="store_true", help="Export a thumbnail from each final video")
+    parser.add_argument("--model-size", default="large-v3", help="WhisperX model size")
+    parser.add_argument("--compress", action="store_true", help="Compress final videos")
+    parser.add_argument("--strict", action="store_true", help="Stop each job on its first error")
+    parser.add_argument("--max-length", type=int, default=0, help="Trim scripts if duration exceeds this many seconds")
+    parser.add_argument("--bg-cache", action="store_true", help="Render from cached, pre-normalized backgrounds")
+    parser.add_argument("--bg-offset", choices=OFFSET_STRATEGIES, default=BACKGROUND_OFFSET, help="Where in the background each video starts")
+    parser.add_argument("--single-pass", action="store_true", help="Write final, compressed and thumbnail outputs in one ffmpeg pass")
+    parser.add_argument("--resume", action="store_true", help="Reuse unchanged stages from earlier runs")
+    parser.add_argument("--subtitle-style", default=SUBTITLE_STYLE, help="Subtitle header from assets/styles/<name>.ass")
+    parser.add_argument("--group-words", type=int, default=SUBTITLE_GROUP_WORDS, help="Merge up to N words per subtitle event with karaoke timing")
+    parser.add_argument("--subtitle-overlay", action="store_true", default=SUBTITLE_OVERLAY, help="Overlay pre-rendered subtitle sprites instead of burning in with libass")
+    parser.add_argument("--subtitle-backend", choices=SUBTITLE_BACKENDS, default=SUBTITLE_BACKEND, help="Word timings from WhisperX, the TTS alignment, or forced alignment of the script")
+    return parser.parse_args(argv)
+
+
+def load_batch_items(source: Path, script_dir: Path) -> list[dict]:
+    """Read batch items from a directory of scripts or a JSONL manifest.
+
+    Manifest lines give either a ``script`` path or inline ``text``/``body``
+    (with an optional ``title`` line), an optional ``id``/``request_id``,
+    ``background`` and any of :data:`BATCH_OVERRIDES`. Inline scripts are
+    written to ``script_dir``. Ids are made unique.
+    """
+    if source.is_dir():
+        raw = [{"id": p.stem, "script": str(p)} for p in sorted(source.glob("*.txt"))]
+    else:
+        raw = []
+        with open(source, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    raw.append(json.loads(line))
+
+    items, seen = [], set()
+    for n, entry in enumerate(raw, 1):
+        item_id = sanitize_name(str(entry.get("id") or entry.get("request_id") or f"item_{n}"))
+        unique, suffix = item_id, 2
+        while unique in seen:
+            unique, suffix = f"{item_id}_{suffix}", suffix + 1
+        seen.add(unique)
+
+        script = entry.get("script")
+        text = entry.get("text") or entry.get("body")
+        if not script and text is not None:
+            if entry.get("title"):
+                text = f"{entry['title']}\n\n{text}"
+            script = script_dir / f"{unique}.txt"
+            script.write_text(text, encoding="utf-8")
+        items.append({
+            "id": unique,
+            "script": str(script) if script else "",
+            "background": entry.get("background"),
+            "overrides": {k: entry[k] for k in BATCH_OVERRIDES if k in entry},
+        })
+    return items
+
+
+def run_batch_item(item: dict, batch_args) -> dict:
+    """Run one batch item and return its summary record; never raises."""
+    args = argparse.Namespace(
+        script=item["script"],
+        background=item["background"] or batch_args.background or "",
+        output_dir=str(Path(batch_args.output_root) / item["id"]),
+        dry_run=batch_args.dry_run,
+        test_mode=batch_args.test_mode,
+        verbose=batch_args.verbose,
+        keep_temp=False,
+        thumbnail=batch_args.thumbnail,
+        model_size=batch_args.model_size,
+        compress=batch_args.compress,
+        cleanup_old=0,
+        json=False,
+        strict=batch_args.strict,
+        max_length=batch_args.max_length,
+        bg_cache=batch_args.bg_cache,
+        bg_offset=batch_args.bg_offset,
+        single_pass=batch_args.single_pass,
+        resume=batch_args.resume,
+        subtitle_backend=batch_args.subtitle_backend,
+        subtitle_style=batch_args.subtitle_style,
+        group_words=batch_args.group_words,
+        subtitle_overlay=batch_args.subtitle_overlay,
+    )
+    for key, value in item["overrides"].items():
+        setattr(args, key, value)
+
+    record = {"id": item["id"], "script": item["script"], "output_dir": args.output_dir}
+    start = time.time()
+    try:
+        output_dir = run_pipeline(args, job_id=item["id"])
+        with open(output_dir / "log.json", "r", encoding="utf-8") as f:
+            job_log = json.load(f)
+        record.update(
+            status="failed" if job_log["errors"] else "complete",
+            errors=job_log["errors"],
+            stage_timings=job_log.get("stage_timings", {}),
+        )
+    except Exception as e:
+        logger.error(f"Batch item {item['id']} failed: {e}")
+        record.update(status="failed", errors=[e.args[0] if e.args else str(e)], stage_timings={})
+    record["duration_seconds"] = round(time.time() - start, 2)
+    return record
+
+
+def run_batch(batch_args) -> list[dict]:
+    """Run every item of a batch on one set of shared models and HTTP connections.
+
+    Records are appended to the summary JSONL as items finish; a failing item
+    does not stop the others.
+    """
+    source = Path(batch_args.source)
+    output_root = Path(batch_args.output_root)
+    output_root.mkdir(parents=True, exist_ok=True)
+    summary_path = Path(batch_args.summary) if batch_args.summary else output_root / "batch_summary.jsonl"
+    summary_path.parent.mkdir(parents=True, exist_ok=True)
+
+    if not batch_args.test_mode:
+        # load WhisperX once up front instead of inside the first job of each worker
+        try:
+            warm_models([batch_args.model_size])
+        except Exception as e:
+            logger.warning(f"Could not warm WhisperX before the batch: {e}")
+
+    # concurrent items reaching ASR together share one WhisperX batch
+    own_batcher = batch_args.workers > 1 and get_asr_batcher() is None and start_asr_batcher() is not None
+    records = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="batch-scripts-") as script_dir:
+            items = load_batch_items(source, Path(script_dir))
+            logger.info(f"Running {len(items)} batch item(s) with {batch_args.workers} worker(s)")
+            with open(summary_path, "w", encoding="utf-8") as summary, \
+                    ThreadPoolExecutor(max_workers=max(1, batch_args.workers)) as pool:
+                futures = [pool.submit(run_batch_item, item, batch_args) for item in items]
+                for future in as_completed(futures):
+                    record = future.result()
+                    records.append(record)
+                    summary.write(json.dumps(record) + "\n")
+                    summary.flush()
+    finally:
+        if own_batcher:
+            stop_asr_batcher()
+
+    failed = sum(1 for r in records if r["status"] != "complete")
+    logger.info(f"Batch finished: {len(records) - failed} complete, {failed} failed. Summary: {summary_path}")
+    return records
+
+
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        records = run_batch(parse_batch_args(sys.argv[2:]))
+        sys.exit(1 if any(r["status"] != "complete" for r in records) else 0)
     args = parse_args()
     run_pipeline(args)
 
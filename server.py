@@ -1,18 +1,36 @@
 from fastapi import FastAPI, UploadFile, File, Form, Request, HTTPException
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pathlib import Path
 import shutil
 import uuid
 import asyncio
 import time
 from concurrent.futures import ThreadPoolExecutor
-from typing import Dict
-import argparse
+import hashlib
+import json
 import os
 import threading
+import socket
 
-import pipeline
-from modules.utils import get_logger, OUTPUT_DIR
+from worker import execute_job
+from modules.utils import get_logger, get_test_mode, OUTPUT_DIR
+from modules.model_pool import get_model_pool, warm_models
+from modules.asr_batcher import get_asr_batcher, start_asr_batcher, stop_asr_batcher
+from modules.http_client import get_http_client
+from modules.job_store import JOB_LEASE_SECONDS, TERMINAL_STATUSES, get_job_store
+from modules.rate_limit import get_rate_limiter
+from modules.progress import get_progress_broker
+from modules.admission import (
+    estimate_wait,
+    job_slots,
+    queue_position,
+    queue_state,
+    readiness,
+    recent_job_seconds,
+    retry_after,
+)
+from modules.backgrounds import OFFSET_STRATEGIES, record_hash, ingest_background, get_asset, checkout_asset, prune_hash_index, forget_hash
 
 from contextlib import asynccontextmanager
 
@@ -21,34 +39,76 @@ from contextlib import asynccontextmanager
 async def lifespan(app: FastAPI):
     thread = threading.Thread(target=_cleanup_loop, daemon=True)
     thread.start()
+    if WARM_MODELS and JOB_EXECUTION != "queue" and not get_test_mode():
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, warm_models, WARM_MODELS, WARM_LANGUAGES)
+    if JOB_EXECUTION == "queue":
+        # workers own the models; the web tier only enqueues
+        yield
+        return
+    # nothing else will run jobs left behind by a previous server process
+    await asyncio.get_running_loop().run_in_executor(None, fail_orphaned_jobs)
+    lease_stop = threading.Event()
+    threading.Thread(target=_lease_loop, args=(lease_stop,), daemon=True).start()
+    # jobs reaching ASR together share one WhisperX batch
+    start_asr_batcher()
     yield
+    lease_stop.set()
+    stop_asr_batcher()
 
 
 app = FastAPI(lifespan=lifespan)
 
-executor = ThreadPoolExecutor(max_workers=3)
+# "inline" runs jobs in this process; "queue" only enqueues them for `python -m worker`
+JOB_EXECUTION = os.getenv("JOB_EXECUTION", "inline")
+
+# Jobs use isolated workspaces, so this can grow with the available cores
+executor = ThreadPoolExecutor(max_workers=int(os.getenv("JOB_WORKERS", "3")))
 
-JOBS: Dict[str, dict] = {}
-RATE_LIMITS: Dict[str, list] = {}
+JOBS = get_job_store()
+# inline jobs are leased to this process, so the others can tell when it is gone
+INLINE_OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+ORPHAN_ERROR = "Server restarted before the job finished"
+# token buckets per route and client IP, shared by every worker process
+RATE_LIMITS = get_rate_limiter()
 
 logger = get_logger(__name__)
 
 TEMP_UPLOAD = Path("temp/uploads")
 TEMP_UPLOAD.mkdir(parents=True, exist_ok=True)
 
+# Uploads are copied to disk in chunks of this size; larger files get a 413
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "500"))
+MAX_SCRIPT_KB = int(os.getenv("MAX_SCRIPT_KB", "512"))
+
+# How often /events re-reads the job store for progress written by other processes
+PROGRESS_POLL_SECONDS = float(os.getenv("PROGRESS_POLL_SECONDS", "1"))
+# Comment line sent on idle streams so proxies keep the connection open
+PROGRESS_KEEPALIVE_SECONDS = 15
+
 CLEANUP_INTERVAL = 600  # seconds
 CLEANUP_AGE = 60 * 60  # seconds
 
+# Comma separated WhisperX model sizes / alignment languages to load at startup
+WARM_MODELS = [m for m in os.getenv("WHISPERX_WARM_MODELS", "").split(",") if m]
+WARM_LANGUAGES = [l for l in os.getenv("WHISPERX_WARM_LANGUAGES", "").split(",") if l]
+
 
 def cleanup_output_dir(age_seconds: int = CLEANUP_AGE):
     base = Path(OUTPUT_DIR)
     if not base.exists():
         return
+    for job_id in JOBS.sweep(age_seconds):
+        folder = base / job_id
+        if folder.is_dir():
+            shutil.rmtree(folder, ignore_errors=True)
+            logger.info(f"Removed expired job folder: {folder}")
     cutoff = time.time() - age_seconds
     for folder in base.iterdir():
         if not folder.is_dir():
             continue
-        if folder.name in JOBS and JOBS[folder.name]["status"] in ("queued", "running"):
+        if JOBS.is_active(folder.name):
             continue
         if folder.stat().st_mtime < cutoff:
             shutil.rmtree(folder, ignore_errors=True)
@@ -58,73 +118,150 @@ def cleanup_output_dir(age_seconds: int = CLEANUP_AGE):
 def _cleanup_loop():
     while True:
         cleanup_output_dir()
+        # uploads of jobs that never reached their own cleanup
+        prune_hash_index()
         time.sleep(CLEANUP_INTERVAL)
 
 
 
 
+def fail_orphaned_jobs():
+    """Fail inline jobs whose server process is gone and delete their uploads."""
+    for job in JOBS.fail_orphans(ORPHAN_ERROR):
+        logger.warning(f"Job {job['job_id']} lost its server process; marked failed")
+        if job.get("script_path"):
+            Path(job["script_path"]).unlink(missing_ok=True)
+        if job.get("background_path"):
+            forget_hash(job["background_path"])
+            Path(job["background_path"]).unlink(missing_ok=True)
+
+
+def _lease_loop(stop: threading.Event):
+    while not stop.wait(JOB_LEASE_SECONDS / 3):
+        try:
+            JOBS.renew(INLINE_OWNER, JOB_LEASE_SECONDS)
+            # catches other server processes that died while this one runs
+            fail_orphaned_jobs()
+        except Exception as e:
+            logger.error(f"Inline lease renewal failed: {e}")
+
+
 def run_job(job_id: str, script_path: Path, background_path: Path, params: dict):
-    JOBS[job_id]["status"] = "processing"
-    start_ts = time.time()
-    JOBS[job_id]["started_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(start_ts))
-    args = argparse.Namespace(
-        script=str(script_path),
-        background=str(background_path),
-        output_dir=str(Path(OUTPUT_DIR) / job_id),
-        dry_run=params.get("dry_run", False),
-        test_mode=params.get("test_mode", False),
-        verbose=params.get("verbose", False),
-        keep_temp=params.get("keep_temp", False),
-        thumbnail=params.get("thumbnail", False),
-        model_size=params.get("model_size", "large-v3"),
-        compress=False,
-        cleanup_old=0,
-        json=params.get("json", False),
-        strict=params.get("strict", False),
-        max_length=params.get("max_length", 0),
-    )
+    started_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    if not JOBS.transition(job_id, ("queued",), "processing", started_at=started_at):
+        logger.warning(f"Job {job_id} is no longer queued; skipping")
+        return
+    execute_job(JOBS, job_id, script_path, background_path, params, started_at, owner=INLINE_OWNER)
+
+
+async def _save_upload(upload: UploadFile, dest: Path, max_bytes: int) -> tuple[int, str]:
+    """Stream ``upload`` to ``dest`` chunk by chunk and return its size and SHA-256.
+
+    Disk writes run in the default executor so the event loop keeps serving
+    other requests. Raises a 413 as soon as ``max_bytes`` is exceeded.
+    """
+    loop = asyncio.get_running_loop()
+    too_large = HTTPException(status_code=413, detail=f"{upload.filename} exceeds {max_bytes} bytes")
+    if max_bytes and (getattr(upload, "size", None) or 0) > max_bytes:
+        raise too_large
+    digest = hashlib.sha256()
+    size = 0
+    f = await loop.run_in_executor(None, open, dest, "wb")
     try:
-        out_dir = pipeline.run_pipeline(args, job_id=job_id, started_at=JOBS[job_id]["started_at"])
-        JOBS[job_id]["status"] = "complete"
-        JOBS[job_id]["output_dir"] = str(out_dir)
-        JOBS[job_id]["completed_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
-        JOBS[job_id]["duration_seconds"] = int(time.time() - start_ts)
-        (Path(out_dir) / "log.txt").write_text("Job log placeholder")
-    except Exception as e:
-        JOBS[job_id]["status"] = "failed"
-        JOBS[job_id]["error"] = str(e)
-        JOBS[job_id]["completed_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        while chunk := await upload.read(UPLOAD_CHUNK_BYTES):
+            size += len(chunk)
+            if max_bytes and size > max_bytes:
+                raise too_large
+            digest.update(chunk)
+            await loop.run_in_executor(None, f.write, chunk)
+    except BaseException:
+        f.close()
+        dest.unlink(missing_ok=True)
+        raise
+    await loop.run_in_executor(None, f.close)
+    return size, digest.hexdigest()
+
+
+async def _rate_limited(request: Request, route: str) -> JSONResponse | None:
+    # the SQLite bucket store can wait on other workers' locks, so keep it off the event loop
+    wait = await run_in_threadpool(RATE_LIMITS.check, route, request.client.host)
+    if not wait:
+        return None
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Rate limit exceeded. Try again later.", "retry_after": wait},
+        headers={"Retry-After": str(wait)},
+    )
+
+
+def _queue_full(slots: int, per_job: float) -> JSONResponse:
+    wait = retry_after(slots, per_job)
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Job queue is full. Try again later.", "retry_after": wait},
+        headers={"Retry-After": str(wait)},
+    )
 
 
 @app.post("/generate")
 async def generate(
     request: Request,
     script_file: UploadFile = File(...),
-    background_file: UploadFile = File(...),
+    background_file: UploadFile | None = File(None),
+    background_id: str | None = Form(None),
     dry_run: bool = Form(False),
     test_mode: bool = Form(False),
     verbose: bool = Form(False),
     strict: bool = Form(False),
     json_flag: bool = Form(False),
     max_length: int = Form(0),
+    bg_offset: str | None = Form(None),
 ):
-    ip = request.client.host
-    rl = RATE_LIMITS.get(ip, [time.time(), 0])
-    if time.time() - rl[0] > 60:
-        rl = [time.time(), 0]
-    if rl[1] >= 5:
-        return JSONResponse(status_code=429, content={"detail": "Rate limit exceeded. Try again later."})
-    rl[1] += 1
-    RATE_LIMITS[ip] = rl
+    limited = await _rate_limited(request, "/generate")
+    if limited is not None:
+        return limited
+    slots = job_slots()
+    # admission queries hit the shared job store, so they stay off the event loop
+    if (await run_in_threadpool(queue_state, JOBS, slots))["saturated"]:
+        return _queue_full(slots, await run_in_threadpool(recent_job_seconds, JOBS))
+    if (background_file is None) == (background_id is None):
+        raise HTTPException(status_code=400, detail="Provide either background_file or background_id")
+    if bg_offset is not None and bg_offset not in OFFSET_STRATEGIES:
+        raise HTTPException(status_code=400, detail=f"bg_offset must be one of {', '.join(OFFSET_STRATEGIES)}")
+    asset = None
+    if background_id is not None:
+        asset = get_asset(background_id)
+        if asset is None:
+            raise HTTPException(status_code=404, detail="Background not found")
     job_id = str(uuid.uuid4())
     script_path = TEMP_UPLOAD / f"{job_id}_script.txt"
-    background_path = TEMP_UPLOAD / f"{job_id}_{background_file.filename}"
+    if asset is not None:
+        background_path = TEMP_UPLOAD / f"{job_id}_{asset['file']}"
+    else:
+        background_path = TEMP_UPLOAD / f"{job_id}_{Path(background_file.filename or 'background').name}"
     TEMP_UPLOAD.mkdir(parents=True, exist_ok=True)
-    with open(script_path, "wb") as f:
-        f.write(await script_file.read())
-    with open(background_path, "wb") as f:
-        f.write(await background_file.read())
-    JOBS[job_id] = {"status": "queued"}
+    loop = asyncio.get_running_loop()
+    try:
+        await _save_upload(script_file, script_path, MAX_SCRIPT_KB * 1024)
+        if asset is not None:
+            # a hard link, so the job's cleanup never touches the stored clip
+            try:
+                await loop.run_in_executor(None, checkout_asset, asset["id"], background_path)
+            except FileNotFoundError:
+                raise HTTPException(status_code=404, detail="Background not found")
+            background_bytes, background_sha = asset["bytes"], asset["id"]
+        else:
+            background_bytes, background_sha = await _save_upload(
+                background_file, background_path, MAX_UPLOAD_MB * 2**20
+            )
+            # spares the background cache from hashing the file again
+            await loop.run_in_executor(None, record_hash, background_path, background_sha)
+    except BaseException:
+        # nothing owns the files until the job exists
+        script_path.unlink(missing_ok=True)
+        forget_hash(background_path)
+        background_path.unlink(missing_ok=True)
+        raise
     params = {
         "dry_run": dry_run,
         "test_mode": test_mode,
@@ -132,9 +269,22 @@ async def generate(
         "strict": strict,
         "json": json_flag,
         "max_length": max_length,
+        "bg_offset": bg_offset,
     }
-    loop = asyncio.get_event_loop()
-    if not loop.is_closed():
+    JOBS.create(
+        job_id,
+        status="queued",
+        owner=INLINE_OWNER if JOB_EXECUTION != "queue" else None,
+        script_path=str(script_path.resolve()),
+        background_path=str(background_path.resolve()),
+        params=params,
+        background_sha256=background_sha,
+        background_bytes=background_bytes,
+    )
+    # measured before an inline job can start and leave the queue
+    position = await run_in_threadpool(queue_position, JOBS, job_id)
+    eta = estimate_wait(position, slots, await run_in_threadpool(recent_job_seconds, JOBS))
+    if JOB_EXECUTION != "queue" and not loop.is_closed():
         loop.run_in_executor(
             executor,
             run_job,
@@ -143,7 +293,36 @@ async def generate(
             background_path,
             params,
         )
-    return {"job_id": job_id, "status": "queued"}
+    return {"job_id": job_id, "status": "queued", "queue_position": position, "eta_seconds": eta}
+
+
+@app.post("/backgrounds")
+async def upload_background(request: Request, background_file: UploadFile = File(...)):
+    """Store a background once and return its id for later ``/generate`` calls."""
+    limited = await _rate_limited(request, "/backgrounds")
+    if limited is not None:
+        return limited
+    tmp = TEMP_UPLOAD / f"bg-{uuid.uuid4()}_{Path(background_file.filename or 'background').name}"
+    TEMP_UPLOAD.mkdir(parents=True, exist_ok=True)
+    _, sha = await _save_upload(background_file, tmp, MAX_UPLOAD_MB * 2**20)
+    loop = asyncio.get_running_loop()
+    try:
+        meta, created = await loop.run_in_executor(
+            None, ingest_background, tmp, background_file.filename, sha
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    finally:
+        tmp.unlink(missing_ok=True)
+    return JSONResponse(status_code=201 if created else 200, content={**meta, "duplicate": not created})
+
+
+@app.get("/backgrounds/{background_id}")
+async def background_info(background_id: str):
+    asset = get_asset(background_id)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Background not found")
+    return asset
 
 
 @app.get("/status/{job_id}")
@@ -160,9 +339,103 @@ async def status(job_id: str):
         "video_url": f"/download/{job_id}",
         "log_url": f"/logs/{job_id}" if (Path(job.get("output_dir", "")) / "log.txt").exists() else None,
     }
+    if job.get("status") == "queued":
+        payload["queue_position"] = await run_in_threadpool(queue_position, JOBS, job_id)
     return payload
 
 
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _progress_stream(job_id: str, job: dict):
+    """Yield SSE messages until the job finishes.
+
+    Events published in this process arrive immediately; progress saved to
+    the job store by another process (queue mode) is picked up every
+    ``PROGRESS_POLL_SECONDS``. ``seq`` numbers keep the two from repeating.
+    """
+    sub = get_progress_broker().subscribe(job_id)
+    try:
+        snapshot = job.get("progress") or {}
+        last_seq = snapshot.get("seq", 0)
+        yield _sse("snapshot", {"status": job["status"], "progress": snapshot})
+        if job["status"] in TERMINAL_STATUSES:
+            return
+        idle = 0.0
+        while True:
+            event = await sub.get(PROGRESS_POLL_SECONDS)
+            if event is not None:
+                idle = 0.0
+                if event["seq"] > last_seq:
+                    last_seq = event["seq"]
+                    yield _sse(event["type"], event)
+                if event["type"] == "status" and event["status"] in TERMINAL_STATUSES:
+                    return
+                continue
+            job = await asyncio.get_running_loop().run_in_executor(None, JOBS.get, job_id)
+            if job is None:
+                return
+            snapshot = job.get("progress") or {}
+            if snapshot.get("seq", 0) > last_seq:
+                idle = 0.0
+                last_seq = snapshot["seq"]
+                yield _sse("snapshot", {"status": job["status"], "progress": snapshot})
+            if job["status"] in TERMINAL_STATUSES:
+                yield _sse("status", {"status": job["status"], "error": job.get("error"), "seq": last_seq})
+                return
+            idle += PROGRESS_POLL_SECONDS
+            if idle >= PROGRESS_KEEPALIVE_SECONDS:
+                idle = 0.0
+                yield ": keepalive\n\n"
+    finally:
+        sub.close()
+
+
+@app.get("/events/{job_id}")
+async def job_events(job_id: str):
+    """Server-sent events with stage transitions and render percent for one job."""
+    job = JOBS.get(job_id)
+    if not job:
+        return JSONResponse(status_code=404, content={"error": "job not found"})
+    return StreamingResponse(
+        _progress_stream(job_id, job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready():
+    """503 while the job queue is full, or no worker is alive to drain it, so the load balancer sends work elsewhere."""
+    state = await run_in_threadpool(readiness, JOBS, job_slots(), queue_mode=JOB_EXECUTION == "queue")
+    if not state["ready"]:
+        wait = retry_after(state["slots"], await run_in_threadpool(recent_job_seconds, JOBS))
+        return JSONResponse(status_code=503, content=state, headers={"Retry-After": str(wait)})
+    return state
+
+
+@app.get("/stats/models")
+async def model_stats():
+    return get_model_pool().stats()
+
+
+@app.get("/stats/asr")
+async def asr_stats():
+    batcher = get_asr_batcher()
+    return {"batching": batcher is not None, **(batcher.stats() if batcher else {})}
+
+
+@app.get("/stats/http")
+async def http_stats():
+    return get_http_client().stats()
+
+
 @app.get("/download/{job_id}")
 async def download_video(job_id: str):
     file_path = OUTPUT_DIR / job_id / "final.mp4"
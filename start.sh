@@ -1,8 +1,46 @@
 #!/bin/bash
-# Launch the FastAPI app with Gunicorn and multiple Uvicorn workers
-exec gunicorn server:app \
+# Launch one job worker and the FastAPI app with Gunicorn and multiple Uvicorn workers.
+# The web workers only enqueue; WORKER_CONCURRENCY caps jobs for the whole container.
+# The worker is restarted whenever it exits, and SIGTERM is passed to both
+# processes so running jobs finish before the container stops.
+export JOB_EXECUTION=queue
+WORKER_RESTART_SECONDS=${WORKER_RESTART_SECONDS:-5}
+
+stopping=0
+shutdown() {
+  stopping=1
+  kill -TERM "$worker_pid" "$web_pid" 2>/dev/null
+}
+trap shutdown TERM INT
+
+gunicorn server:app \
   --workers 4 \
   --worker-class uvicorn.workers.UvicornWorker \
   --bind 0.0.0.0:8000 \
   --timeout 120 \
-  --log-level info
+  --log-level info &
+web_pid=$!
+python -m worker &
+worker_pid=$!
+
+while [ "$stopping" = 0 ]; do
+  # returns when either process exits or a signal arrives
+  wait -n
+  [ "$stopping" = 1 ] && break
+  if ! kill -0 "$web_pid" 2>/dev/null; then
+    echo "gunicorn exited; stopping the worker" >&2
+    web_failed=1
+    shutdown
+    break
+  fi
+  if ! kill -0 "$worker_pid" 2>/dev/null; then
+    echo "Job worker exited; restarting in ${WORKER_RESTART_SECONDS}s" >&2
+    sleep "$WORKER_RESTART_SECONDS"
+    [ "$stopping" = 1 ] && break
+    python -m worker &
+    worker_pid=$!
+  fi
+done
+# let running jobs and requests drain
+wait
+exit "${web_failed:-0}"
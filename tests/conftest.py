@@ -0,0 +1,37 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# set before any test module imports the server, whose stores open at import time
+_SCRATCH = tempfile.mkdtemp(prefix="autocontent-tests-")
+os.environ["JOB_STORE_PATH"] = os.path.join(_SCRATCH, "jobs.db")
+os.environ["BACKGROUND_CACHE_DIR"] = os.path.join(_SCRATCH, "backgrounds")
+os.environ["RATE_LIMIT_PATH"] = os.path.join(_SCRATCH, "rate_limits.db")
+
+# the background clip the tests upload; only its bytes are hashed and copied, never decoded
+TEST_BACKGROUND = Path("assets/backgrounds/test_video.webm")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def test_background():
+    if not TEST_BACKGROUND.exists():
+        TEST_BACKGROUND.parent.mkdir(parents=True, exist_ok=True)
+        TEST_BACKGROUND.write_bytes(os.urandom(1000))
+    return TEST_BACKGROUND
+
+
+@pytest.fixture(autouse=True)
+def isolated_stores(tmp_path, monkeypatch):
+    """Give every test its own job database, rate limit buckets and background cache instead of the repo's data/."""
+    from modules import backgrounds, job_store, rate_limit
+
+    monkeypatch.setattr(job_store, "JOB_STORE_PATH", tmp_path / "jobs.db")
+    monkeypatch.setattr(backgrounds, "BACKGROUND_CACHE_DIR", tmp_path / "backgrounds")
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_PATH", tmp_path / "rate_limits.db")
+    server = sys.modules.get("server")
+    if server is not None:
+        monkeypatch.setattr(server, "JOBS", job_store.get_job_store())
+        monkeypatch.setattr(server, "RATE_LIMITS", rate_limit.get_rate_limiter())
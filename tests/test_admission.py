@@ -0,0 +1,27 @@
+from modules import admission
+from modules.job_store import MemoryJobStore
+
+
+def test_wait_estimates_use_recent_stage_timings():
+    store = MemoryJobStore()
+    assert admission.recent_job_seconds(store) == admission.DEFAULT_JOB_SECONDS
+    store.create("a")
+    store.transition("a", ("queued",), "complete", stage_timings={"tts": 10.0, "render": 20.0}, duration_seconds=40)
+    store.create("b")
+    store.transition("b", ("queued",), "complete", duration_seconds=50)
+    assert admission.recent_job_seconds(store) == 40.0
+    assert admission.estimate_wait(1, 2, 40.0) == 40
+    assert admission.estimate_wait(3, 2, 40.0) == 80
+    assert admission.retry_after(2, 40.0) == 20
+
+
+def test_queue_state_and_position():
+    store = MemoryJobStore()
+    for job_id in ("a", "b", "c"):
+        store.create(job_id)
+    store.transition("a", ("queued",), "processing")
+    state = admission.queue_state(store, slots=1, max_depth=2)
+    assert state["queued"] == 2 and state["processing"] == 1 and state["saturated"]
+    assert not admission.queue_state(store, slots=1, max_depth=0)["saturated"]
+    assert admission.queue_position(store, "c") == 2
+    assert admission.queue_position(store, "a") == 0
@@ -0,0 +1,112 @@
+import json
+import wave
+from array import array
+from pathlib import Path
+
+from modules import voiceover
+from modules.alignment import words_from_characters, proportional_align
+
+FIXTURE = Path(__file__).parent / 'fixtures' / 'elevenlabs_with_timestamps.json'
+
+
+def test_words_from_recorded_alignment():
+    data = json.loads(FIXTURE.read_text(encoding='utf-8'))
+    words = words_from_characters(data['alignment'], offset=1.0)
+    assert [w['word'] for w in words] == ['Hello', 'there', 'friend.']
+    assert words[0] == {'start': 1.0, 'end': 1.35, 'word': 'Hello'}
+    assert words[2]['start'] == 2.13 and words[2]['end'] == 2.62
+
+
+def test_with_timestamps_endpoint_uses_fixture(tmp_path, monkeypatch):
+    data = json.loads(FIXTURE.read_text(encoding='utf-8'))
+
+    class FakeResponse:
+        status_code = 200
+        text = ''
+
+        def json(self):
+            return data
+
+    class FakeClient:
+        def post(self, url, **kwargs):
+            assert url.endswith('/with-timestamps')
+            return FakeResponse()
+
+    monkeypatch.setenv('ELEVENLABS_API_KEY', 'key')
+    monkeypatch.setattr(voiceover, 'get_http_client', lambda: FakeClient())
+    monkeypatch.setattr(voiceover, 'decode_to_wav', lambda chunks, path: voiceover.generate_dummy_audio(path, 2.0))
+    words = voiceover.call_elevenlabs_with_timestamps('Hello there — friend.', tmp_path / 'c.wav')
+    assert [w['word'] for w in words] == ['Hello', 'there', 'friend.']
+
+
+def _write_wav(path, pattern):
+    """Write 16-bit mono audio: 1 = loud 0.5s block, 0 = silent 0.5s block."""
+    samples = array('h')
+    for loud in pattern:
+        samples.extend(([8000, -8000] if loud else [0, 0]) * 4000)
+    with wave.open(str(path), 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(16000)
+        wf.writeframes(samples.tobytes())
+
+
+def test_proportional_align_skips_pauses(tmp_path):
+    audio = tmp_path / 'speech.wav'
+    _write_wav(audio, [1, 1, 0, 0, 1, 1])
+    words = proportional_align('aaa bbb', audio)
+    assert words[0]['start'] == 0.0 and words[0]['end'] <= 1.0
+    assert words[1]['start'] >= 2.0 and words[1]['end'] <= 3.0
+
+
+def test_tts_backend_skips_asr(tmp_path, monkeypatch):
+    from argparse import Namespace
+    import pipeline
+
+    monkeypatch.setattr(pipeline, 'transcribe_words', lambda *a, **k: (_ for _ in ()).throw(AssertionError('ASR ran')))
+    args = Namespace(script='scripts/test_script.txt', background='assets/backgrounds/test_video.webm', output_dir=str(tmp_path), dry_run=True, test_mode=True, verbose=False, keep_temp=False, thumbnail=False, model_size='tiny', compress=False, cleanup_old=0, json=False, strict=True, max_length=0, subtitle_backend='tts')
+    pipeline.run_pipeline(args)
+    log = json.loads((tmp_path / 'log.json').read_text())
+    assert log['errors'] == [] and 'subtitles' in log['output_files']
+
+
+def test_sentence_segments_break_at_pauses(tmp_path):
+    from modules.alignment import sentence_segments
+
+    audio = tmp_path / 'two.wav'
+    # a short sentence then a long one, with the pause between them at 1.0-2.0s
+    _write_wav(audio, [1, 1, 0, 0, 1, 1, 1, 1, 1, 1])
+    segments = sentence_segments('Short one. This second sentence is a good deal longer.', audio)
+    assert [s['text'] for s in segments] == ['Short one.', 'This second sentence is a good deal longer.']
+    assert segments[0]['end'] == segments[1]['start'] == 1.5
+    assert segments[1]['end'] == 5.0
+
+
+def test_align_script_uses_only_alignment_model(tmp_path, monkeypatch):
+    import sys
+    import types
+    from modules import generate_subtitles
+    from modules.model_pool import ModelPool
+
+    loads = []
+
+    def loader(name, device):
+        loads.append(name)
+        return ('align-model', {})
+
+    def fake_align(segments, model_a, metadata, audio, device):
+        words = [{'word': w} for s in segments for w in s['text'].split()]
+        words[0].update(start=0.0, end=0.4)
+        words[-1].update(start=1.0, end=1.5)
+        return {'word_segments': words}
+
+    audio = tmp_path / 'speech.wav'
+    _write_wav(audio, [1, 1, 1])
+    monkeypatch.setitem(sys.modules, 'whisperx', types.SimpleNamespace(load_audio=lambda p: p, align=fake_align))
+    monkeypatch.setattr(generate_subtitles, 'get_model_pool', lambda: ModelPool(loaders={'align': loader, 'asr': None}, size_of=lambda m: 1))
+    monkeypatch.setattr(generate_subtitles, 'default_device', lambda: 'cpu')
+
+    words = generate_subtitles.align_script(audio, 'One 2 three.', language='unknown', test_mode=False)
+    assert loads == ['en']
+    assert [w['word'] for w in words] == ['One', '2', 'three.']
+    assert words[1] == {'word': '2', 'start': 0.4, 'end': 1.0}
@@ -0,0 +1,101 @@
+import sys
+import threading
+import types
+
+from modules import generate_subtitles
+from modules.asr_batcher import ASRBatcher
+from modules.model_pool import ModelPool
+
+
+def test_batcher_combines_concurrent_requests():
+    calls = []
+
+    def fake_transcribe(paths, *, model_size, test_mode, on_result=None):
+        calls.append((list(paths), model_size))
+        return [[{"start": 0.0, "end": 1.0, "word": p}] for p in paths]
+
+    batcher = ASRBatcher(window_seconds=0.5, max_batch=3, transcribe=fake_transcribe).start()
+    results = {}
+
+    def worker(name):
+        results[name] = batcher.transcribe(name, model_size="tiny", test_mode=False)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in ("a", "b", "c")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.stop()
+
+    assert len(calls) == 1 and sorted(calls[0][0]) == ["a", "b", "c"]
+    assert results["b"][0]["word"] == "b"
+    assert batcher.stats()["largest_batch"] == 3
+
+
+def test_transcribe_batch_loads_each_model_once_and_reports_every_file(monkeypatch):
+    loads = []
+
+    class FakeModel:
+        def transcribe(self, audio, batch_size):
+            return {"language": audio.split("-")[0], "segments": [audio]}
+
+    def loader(name, device):
+        loads.append(name)
+        return FakeModel() if name == "tiny" else (f"align-{name}", {})
+
+    pool = ModelPool(max_bytes=0, loaders={"asr": loader, "align": loader}, size_of=lambda m: 1)
+    fake_whisperx = types.SimpleNamespace(
+        load_audio=lambda path: path,
+        align=lambda segments, model_a, metadata, audio, device: {"word_segments": [{"word": model_a}]},
+    )
+    monkeypatch.setitem(sys.modules, "whisperx", fake_whisperx)
+    monkeypatch.setattr(generate_subtitles, "get_model_pool", lambda: pool)
+    monkeypatch.setattr(generate_subtitles, "default_device", lambda: "cpu")
+
+    reported = []
+    results = generate_subtitles.transcribe_batch(
+        ["en-1", "de-1", "en-2"], model_size="tiny", test_mode=False, on_result=lambda i, r: reported.append(i)
+    )
+
+    assert [r[0]["word"] for r in results] == ["align-en", "align-de", "align-en"]
+    assert loads == ["tiny", "en", "de"]
+    assert reported == [0, 1, 2]
+
+
+def test_batcher_resolves_every_future_and_survives_errors():
+    def short_transcribe(paths, *, model_size, test_mode, on_result=None):
+        return [[] for _ in paths][:-1]
+
+    batcher = ASRBatcher(window_seconds=0, max_batch=4, transcribe=short_transcribe).start()
+    try:
+        result = batcher.submit("a", model_size="tiny", test_mode=False).result(timeout=5)
+        assert isinstance(result, RuntimeError)
+        # an unhashable model size breaks the grouping itself, outside the model call
+        failed = batcher.submit("b", model_size=["tiny"], test_mode=False)
+        assert isinstance(failed.exception(timeout=5), TypeError)
+        batcher._transcribe = lambda paths, **kw: [[] for _ in paths]
+        assert batcher.transcribe("c", model_size="tiny", test_mode=False) == []
+    finally:
+        batcher.stop()
+
+
+def test_each_future_resolves_when_its_own_file_is_done():
+    first_done = threading.Event()
+
+    def slow_transcribe(paths, *, model_size, test_mode, on_result=None):
+        for i, path in enumerate(paths):
+            if i:
+                # the second file only starts once the first caller has its words
+                assert first_done.wait(5)
+            on_result(i, [{"word": path}])
+        return [[{"word": p}] for p in paths]
+
+    batcher = ASRBatcher(window_seconds=0.5, max_batch=2, transcribe=slow_transcribe).start()
+    try:
+        first = batcher.submit("a", model_size="tiny", test_mode=False)
+        second = batcher.submit("b", model_size="tiny", test_mode=False)
+        assert first.result(timeout=5) == [{"word": "a"}]
+        first_done.set()
+        assert second.result(timeout=5) == [{"word": "b"}]
+    finally:
+        batcher.stop()
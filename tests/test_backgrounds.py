@@ -0,0 +1,100 @@
+import shutil
+
+import pytest
+
+from modules import backgrounds
+
+
+def test_content_hash_is_memoized(tmp_path, monkeypatch):
+    monkeypatch.setattr(backgrounds, "BACKGROUND_CACHE_DIR", tmp_path / "cache")
+    clip = tmp_path / "clip.webm"
+    clip.write_bytes(b"abc")
+    first = backgrounds.content_hash(clip)
+    assert backgrounds.content_hash(clip) == first
+    clip.write_bytes(b"abcd")
+    assert backgrounds.content_hash(clip) != first
+
+
+def test_normalize_background_reuses_cached_copy(tmp_path, monkeypatch):
+    monkeypatch.setattr(backgrounds, "BACKGROUND_CACHE_DIR", tmp_path / "cache")
+    clip = tmp_path / "clip.webm"
+    clip.write_bytes(b"abc")
+    dest = backgrounds.mezzanine_path(backgrounds.content_hash(clip))
+    dest.write_bytes(b"cached")
+    monkeypatch.setattr(backgrounds.subprocess, "run", lambda *a, **k: pytest.fail("should not transcode"))
+    assert backgrounds.normalize_background(clip) == dest
+
+
+def test_select_offset_snaps_to_keyframe(tmp_path, monkeypatch):
+    monkeypatch.setattr(backgrounds, "BACKGROUND_CACHE_DIR", tmp_path / "cache")
+    clip = tmp_path / "clip.webm"
+    clip.write_bytes(b"abc")
+    index = {"duration": 100.0, "keyframes": [0.0, 10.0, 20.0, 30.0, 40.0, 50.0]}
+    monkeypatch.setattr(backgrounds, "probe_keyframes", lambda path: index)
+
+    assert backgrounds.select_offset(clip, 30.0, "start") == 0.0
+    seeded = backgrounds.select_offset(clip, 30.0, "seeded", seed="job-1")
+    assert seeded in index["keyframes"]
+    assert seeded == backgrounds.select_offset(clip, 30.0, "seeded", seed="job-1")
+    offsets = [backgrounds.select_offset(clip, 30.0, "round-robin") for _ in range(3)]
+    assert offsets == [0.0, 30.0, 50.0]
+    # clip shorter than the audio always starts at 0
+    assert backgrounds.select_offset(clip, 120.0, "random") == 0.0
+
+
+def test_ingest_background_dedupes_and_links(tmp_path, monkeypatch):
+    monkeypatch.setattr(backgrounds, "BACKGROUND_CACHE_DIR", tmp_path / "cache")
+    probes = []
+    info = {"duration": 60.0, "keyframes": [0.0, 2.0], "width": 1080, "height": 1920}
+    monkeypatch.setattr(backgrounds, "probe_video", lambda path: probes.append(path) or info)
+    clip = tmp_path / "clip.webm"
+    clip.write_bytes(b"abc")
+    copy = tmp_path / "copy.webm"
+    copy.write_bytes(b"abc")
+
+    meta, created = backgrounds.ingest_background(clip)
+    again, created_again = backgrounds.ingest_background(copy)
+    assert created and not created_again
+    assert again == meta and len(probes) == 1
+    assert meta["width"] == 1080 and meta["keyframes"] == 2
+
+    job_copy = backgrounds.checkout_asset(meta["id"], tmp_path / "job.webm")
+    assert job_copy.stat().st_ino == backgrounds.asset_path(meta["id"]).stat().st_ino
+    monkeypatch.setattr(backgrounds, "probe_keyframes", lambda path: pytest.fail("should use the ingest probe"))
+    assert backgrounds.keyframe_index(job_copy)["keyframes"] == [0.0, 2.0]
+    assert backgrounds.get_asset("../etc") is None
+
+
+def test_ingest_never_removes_a_file_another_process_stored(tmp_path, monkeypatch):
+    monkeypatch.setattr(backgrounds, "BACKGROUND_CACHE_DIR", tmp_path / "cache")
+    clip = tmp_path / "clip.webm"
+    clip.write_bytes(b"abc")
+    sha = backgrounds.content_hash(clip)
+    # another worker has linked the clip into place but not yet written its metadata
+    stored = backgrounds.library_dir() / f"{sha}.webm"
+    stored.parent.mkdir(parents=True)
+    stored.write_bytes(b"abc")
+
+    monkeypatch.setattr(backgrounds, "probe_video", lambda path: (_ for _ in ()).throw(ValueError("bad")))
+    with pytest.raises(ValueError):
+        backgrounds.ingest_background(clip)
+    assert stored.exists()
+
+    info = {"duration": 60.0, "keyframes": [0.0], "width": 1080, "height": 1920}
+    monkeypatch.setattr(backgrounds, "probe_video", lambda path: info)
+    meta, created = backgrounds.ingest_background(clip)
+    assert not created and meta["file"] == stored.name and stored.exists()
+    assert [p.name for p in backgrounds.library_dir().iterdir() if p.name.startswith(".")] == []
+
+
+def test_hash_index_forgets_and_prunes_deleted_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(backgrounds, "BACKGROUND_CACHE_DIR", tmp_path / "cache")
+    kept, upload, gone = (tmp_path / f"{name}.webm" for name in ("kept", "upload", "gone"))
+    for clip in (kept, upload, gone):
+        clip.write_bytes(b"abc")
+        backgrounds.content_hash(clip)
+    backgrounds.forget_hash(upload)
+    gone.unlink()
+    assert backgrounds.prune_hash_index() == 1
+    rows = [p for (p,) in backgrounds._hash_db().execute("SELECT path FROM hashes")]
+    assert rows == [str(kept.resolve())]
@@ -0,0 +1,74 @@
+import threading
+
+import pytest
+
+from modules.dag import Cancelled, Stage, run_stages
+
+
+def test_independent_stages_overlap():
+    barrier = threading.Barrier(2, timeout=5)
+
+    def meet(name):
+        def fn(ctx):
+            barrier.wait()  # deadlocks unless both stages run at once
+            return {name: True}
+        return fn
+
+    ctx = {}
+    state = run_stages([Stage("a", meet("a"), pool="io"), Stage("b", meet("b"), pool="cpu")], ctx)
+    assert ctx == {"a": True, "b": True}
+    assert state == {"a": "done", "b": "done"}
+
+
+def test_errors_are_ordered_and_dependents_follow_rules():
+    def fail(code):
+        def fn(ctx):
+            raise RuntimeError(code)
+        return fn
+
+    errors = []
+    state = run_stages(
+        [
+            Stage("first", fail("FIRST")),
+            Stage("second", fail("SECOND")),
+            Stage("runs_anyway", lambda ctx: {"ran": True}, requires=("first",)),
+            Stage("skipped", lambda ctx: None, requires=("second",), skip_on_failure=True),
+        ],
+        {},
+        errors=errors,
+    )
+    assert errors == ["FIRST", "SECOND"]
+    assert state["runs_anyway"] == "done" and state["skipped"] == "skipped"
+
+
+def test_strict_stops_and_reraises():
+    ran = []
+
+    def boom(ctx):
+        raise ValueError("BOOM")
+
+    with pytest.raises(ValueError, match="BOOM"):
+        run_stages(
+            [Stage("boom", boom), Stage("after", lambda ctx: ran.append(1), requires=("boom",))],
+            {},
+            strict=True,
+        )
+    assert ran == []
+
+
+def test_cancel_stops_before_next_stage():
+    cancel = threading.Event()
+    ran = []
+
+    def first(ctx):
+        ran.append("first")
+        cancel.set()
+        return {}
+
+    stages = [
+        Stage("first", first),
+        Stage("second", lambda ctx: ran.append("second") or {}, requires=("first",)),
+    ]
+    with pytest.raises(Cancelled):
+        run_stages(stages, {}, cancel=cancel)
+    assert ran == ["first"]
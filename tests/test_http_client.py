@@ -0,0 +1,76 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from modules.http_client import CircuitOpenError, HTTPClient, parse_retry_after
+
+
+def start_stub(statuses):
+    """Serve the given status codes in order, repeating the last one."""
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            status = statuses[min(len(hits), len(statuses) - 1)]
+            hits.append(status)
+            self.send_response(status)
+            if status == 429:
+                self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/", hits
+
+
+def test_retries_honor_retry_after():
+    server, url, hits = start_stub([429, 200])
+    try:
+        client = HTTPClient(max_retries=2, backoff_base=0)
+        resp = client.post(url, json={})
+    finally:
+        server.shutdown()
+    assert resp.status_code == 200
+    assert hits == [429, 200]
+    assert client.stats()["retries"] == 1
+
+
+def test_circuit_opens_after_failures():
+    server, url, hits = start_stub([503])
+    try:
+        client = HTTPClient(max_retries=0, breaker_threshold=2, breaker_reset=60)
+        for _ in range(2):
+            assert client.post(url).status_code == 503
+        with pytest.raises(CircuitOpenError):
+            client.post(url)
+    finally:
+        server.shutdown()
+    assert len(hits) == 2
+    assert client.stats()["circuit_open"]
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(None) is None
+
+
+def test_failed_probe_with_unexpected_error_closes_half_open_state():
+    server, url, hits = start_stub([200])
+    try:
+        client = HTTPClient(max_retries=0, breaker_threshold=1, breaker_reset=0)
+        client._record(False)
+        with pytest.raises(requests.exceptions.InvalidURL):
+            client.post("http://")
+        # the failed probe re-opened the circuit for 0s, so the next call probes again
+        assert client.post(url).status_code == 200
+        assert client.post(url).status_code == 200
+    finally:
+        server.shutdown()
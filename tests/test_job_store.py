@@ -0,0 +1,117 @@
+import time
+
+import pytest
+
+from modules.job_store import MemoryJobStore, SQLiteJobStore
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteJobStore(tmp_path / "jobs.db")
+    return MemoryJobStore()
+
+
+def test_transitions_are_guarded(store):
+    store.create("a")
+    assert store.transition("a", ("queued",), "processing", started_at="now")
+    # a second worker cannot claim the same job
+    assert not store.transition("a", ("queued",), "processing")
+    job = store.get("a")
+    assert job["status"] == "processing" and job["started_at"] == "now"
+    assert store.is_active("a")
+    assert [j["job_id"] for j in store.list_by_status("processing")] == ["a"]
+
+
+def test_sweep_removes_only_expired_finished_jobs(store):
+    store.create("done")
+    store.transition("done", ("queued",), "complete")
+    store.create("waiting")
+    time.sleep(0.01)
+    assert store.sweep(0) == ["done"]
+    assert store.get("done") is None
+    assert store.get("waiting") is not None
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    SQLiteJobStore(tmp_path / "jobs.db").create("x", script="a.txt")
+    assert SQLiteJobStore(tmp_path / "jobs.db").get("x")["script"] == "a.txt"
+
+
+def test_lease_hands_out_each_job_once(store):
+    store.create("a")
+    store.create("b")
+    store.create("inline")
+    store.transition("inline", ("queued",), "processing")
+    first = store.lease("w1", 60)
+    second = store.lease("w2", 60)
+    assert (first["job_id"], second["job_id"]) == ("a", "b")
+    assert store.lease("w3", 60) is None
+    assert store.heartbeat("a", "w1", 60)
+    assert not store.heartbeat("a", "w2", 60)
+    assert store.get("a")["lease_owner"] == "w1"
+
+
+def test_expired_lease_is_retried_then_failed(store, monkeypatch):
+    from modules import job_store
+    monkeypatch.setattr(job_store, "JOB_MAX_ATTEMPTS", 2)
+    store.create("a")
+    assert store.lease("w1", 0)["attempts"] == 1
+    time.sleep(0.01)
+    retried = store.lease("w2", 0)
+    assert retried["lease_owner"] == "w2" and retried["attempts"] == 2
+    assert not store.heartbeat("a", "w1", 60)
+    time.sleep(0.01)
+    assert store.lease("w3", 0) is None
+    assert store.get("a")["status"] == "failed"
+
+
+def test_transition_is_fenced_on_lease_owner(store):
+    store.create("a")
+    store.lease("w1", 0)
+    time.sleep(0.01)
+    store.lease("w2", 60)
+    assert not store.transition("a", ("processing",), "complete", owner="w1")
+    assert store.transition("a", ("processing",), "complete", owner="w2")
+
+
+def test_queue_counts_and_recent_jobs(store):
+    for job_id in ("a", "b", "c", "d"):
+        store.create(job_id)
+        time.sleep(0.01)
+    store.transition("a", ("queued",), "processing")
+    store.transition("b", ("queued",), "complete")
+    time.sleep(0.01)
+    store.transition("c", ("queued",), "complete")
+    store.create("e")
+    assert store.count_by_status("queued") == 2
+    assert store.count_by_status("queued", "processing") == 3
+    assert store.queue_position("d") == 1 and store.queue_position("e") == 2
+    assert store.queue_position("a") == 0 and store.queue_position("missing") == 0
+    assert [j["job_id"] for j in store.recent("complete", 1)] == ["c"]
+    assert [j["job_id"] for j in store.recent("complete", 5)] == ["c", "b"]
+
+
+def test_owned_jobs_expire_into_orphans(store):
+    store.create("inline", owner="server-1", lease_seconds=0.05)
+    store.create("renewed", owner="server-2", lease_seconds=0.05)
+    store.create("unowned")
+    # workers never take a job that a server process runs itself
+    assert store.lease("worker")["job_id"] == "unowned"
+    assert store.lease("worker") is None
+    time.sleep(0.1)
+    assert store.renew("server-2", 60) == 1
+    assert store.count_by_status("queued") == 1 and store.queue_position("inline") == 0
+    assert [j["job_id"] for j in store.fail_orphans("gone")] == ["inline"]
+    assert store.get("inline")["status"] == "failed" and store.get("inline")["error"] == "gone"
+    assert store.get("renewed")["status"] == "queued"
+
+
+def test_live_workers_counts_recent_heartbeats(store):
+    assert store.live_workers(60) == 0
+    store.mark_worker_alive("w1")
+    store.mark_worker_alive("w1")
+    store.mark_worker_alive("w2")
+    assert store.live_workers(60) == 2
+    time.sleep(0.02)
+    assert store.live_workers(0.01) == 0
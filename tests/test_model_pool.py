@@ -0,0 +1,44 @@
+import threading
+
+from modules.model_pool import ModelPool
+
+
+def make_pool(max_bytes=0):
+    loads = []
+
+    def loader(name, device):
+        loads.append(name)
+        return f"model-{name}"
+
+    pool = ModelPool(max_bytes=max_bytes, loaders={"asr": loader, "align": loader}, size_of=lambda m: 100)
+    return pool, loads
+
+
+def test_pool_reuses_loaded_model():
+    pool, loads = make_pool()
+    with pool.acquire("asr", "tiny", "cpu") as model:
+        assert model == "model-tiny"
+    with pool.acquire("asr", "tiny", "cpu"):
+        pass
+    assert loads == ["tiny"]
+    stats = pool.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+
+def test_pool_evicts_least_recently_used():
+    pool, loads = make_pool(max_bytes=200)
+    for name in ("a", "b", "a", "c"):
+        pool.warm("asr", name, "cpu")
+    remaining = {m["name"] for m in pool.stats()["models"]}
+    assert remaining == {"a", "c"}
+    assert pool.stats()["evictions"] == 1
+
+
+def test_pool_loads_once_across_threads():
+    pool, loads = make_pool()
+    threads = [threading.Thread(target=pool.warm, args=("align", "en", "cpu")) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert loads == ["en"]
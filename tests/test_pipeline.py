@@ -29,13 +29,23 @@ def test_verbose_log_level(monkeypatch, tmp_path):
 
 
 def test_keep_temp_retains_files(tmp_path):
-    temp_dir = Path('temp')
-    if temp_dir.exists():
-        shutil.rmtree(temp_dir)
     args = Namespace(script=str(SCRIPT), background=str(BACKGROUND), output_dir=str(tmp_path), dry_run=True, test_mode=True, verbose=False, keep_temp=True, thumbnail=False, model_size='tiny', compress=False, cleanup_old=0, json=False, strict=False, max_length=0)
     pipeline.run_pipeline(args)
-    assert (temp_dir / 'voice.wav').exists()
-    shutil.rmtree(temp_dir)
+    log = json.loads((Path(tmp_path) / 'log.json').read_text())
+    voice = Path(log['output_files']['audio'])
+    assert voice.exists()
+    shutil.rmtree(voice.parent)
+
+
+def test_temp_workspace_is_per_job_and_removed(tmp_path):
+    args = Namespace(script=str(SCRIPT), background=str(BACKGROUND), output_dir=str(tmp_path / 'a'), dry_run=True, test_mode=True, verbose=False, keep_temp=False, thumbnail=False, model_size='tiny', compress=False, cleanup_old=0, json=False, strict=False, max_length=0)
+    pipeline.run_pipeline(args)
+    args.output_dir = str(tmp_path / 'b')
+    pipeline.run_pipeline(args)
+    voice_a = Path(json.loads((tmp_path / 'a' / 'log.json').read_text())['output_files']['audio'])
+    voice_b = Path(json.loads((tmp_path / 'b' / 'log.json').read_text())['output_files']['audio'])
+    assert voice_a.parent != voice_b.parent
+    assert not voice_a.parent.exists() and not voice_b.parent.exists()
 
 
 def test_model_override(tmp_path):
@@ -114,3 +124,93 @@ def test_strict_halts(tmp_path, monkeypatch):
     args = Namespace(script=str(SCRIPT), background=str(BACKGROUND), output_dir=str(tmp_path), dry_run=False, test_mode=True, verbose=False, keep_temp=False, thumbnail=False, model_size='tiny', compress=False, cleanup_old=0, json=False, strict=True, max_length=0)
     with pytest.raises(RuntimeError):
         pipeline.run_pipeline(args)
+
+
+def test_single_pass_render(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_render(bg, audio, subs, out, *, compressed_path=None, **kwargs):
+        calls.append(compressed_path)
+
+    monkeypatch.setattr(pipeline, 'render_final_video', fake_render)
+    monkeypatch.setattr(pipeline, 'compress_video', lambda *a: pytest.fail('compress pass should be skipped'))
+    args = Namespace(script=str(SCRIPT), background=str(BACKGROUND), output_dir=str(tmp_path), dry_run=False, test_mode=True, verbose=False, keep_temp=False, thumbnail=True, model_size='tiny', compress=True, cleanup_old=0, json=False, strict=True, max_length=0, single_pass=True)
+    pipeline.run_pipeline(args)
+    assert calls == [Path(tmp_path) / 'final_compressed.mp4']
+    log = json.loads((Path(tmp_path) / 'log.json').read_text())
+    assert log['output_files']['compressed'].endswith('final_compressed.mp4')
+
+
+def test_stage_timings_recorded(tmp_path):
+    args = Namespace(script=str(SCRIPT), background=str(BACKGROUND), output_dir=str(tmp_path), dry_run=True, test_mode=True, verbose=False, keep_temp=False, thumbnail=False, model_size='tiny', compress=False, cleanup_old=0, json=False, strict=False, max_length=0)
+    pipeline.run_pipeline(args)
+    meta = json.loads((Path(tmp_path) / 'metadata.json').read_text())
+    assert {'script', 'tts', 'asr', 'subtitles'} <= set(meta['stage_timings'])
+    assert 'render' not in meta['stage_timings']
+
+
+def test_resume_rerenders_only_on_background_change(tmp_path, monkeypatch):
+    calls = {'tts': 0, 'render': 0}
+    real_voiceover = pipeline.generate_voiceover
+
+    def counting_voiceover(*a, **k):
+        calls['tts'] += 1
+        return real_voiceover(*a, **k)
+
+    def fake_render(bg, audio, subs, out, **kwargs):
+        calls['render'] += 1
+        Path(out).write_bytes(b'video')
+
+    monkeypatch.setattr(pipeline, 'generate_voiceover', counting_voiceover)
+    monkeypatch.setattr(pipeline, 'render_final_video', fake_render)
+    background = tmp_path / 'bg.webm'
+    background.write_bytes(b'one')
+    args = Namespace(script=str(SCRIPT), background=str(background), output_dir=str(tmp_path / 'out'), dry_run=False, test_mode=True, verbose=False, keep_temp=False, thumbnail=False, model_size='tiny', compress=False, cleanup_old=0, json=False, strict=True, max_length=0, resume=True)
+    pipeline.run_pipeline(args)
+    pipeline.run_pipeline(args)
+    assert calls == {'tts': 1, 'render': 1}
+
+    background.write_bytes(b'two')
+    pipeline.run_pipeline(args)
+    assert calls == {'tts': 1, 'render': 2}
+    meta = json.loads((tmp_path / 'out' / 'metadata.json').read_text())
+    assert set(meta['reused_stages']) == {'tts', 'asr', 'subtitles'}
+
+
+def test_batch_manifest_continues_after_failure(tmp_path):
+    manifest = tmp_path / 'batch.jsonl'
+    manifest.write_text(
+        json.dumps({'request_id': 'one', 'title': 'First', 'body': 'Hello batch world'}) + '\n'
+        + json.dumps({'id': 'broken', 'script': str(tmp_path / 'missing.txt')}) + '\n'
+        + json.dumps({'script': str(SCRIPT), 'model_size': 'small'}) + '\n'
+    )
+    args = pipeline.parse_batch_args([str(manifest), '--background', str(BACKGROUND), '--output', str(tmp_path / 'out'), '--test-mode', '--dry-run', '--workers', '2'])
+    pipeline.run_batch(args)
+    lines = (tmp_path / 'out' / 'batch_summary.jsonl').read_text().splitlines()
+    records = {r['id']: r for r in map(json.loads, lines)}
+    assert records['one']['status'] == 'complete'
+    assert 'tts' in records['one']['stage_timings']
+    assert records['broken']['status'] == 'failed'
+    assert records['broken']['errors'] == [pipeline.ErrorCode.SCRIPT_NOT_FOUND.value]
+    assert json.loads((tmp_path / 'out' / 'item_3' / 'metadata.json').read_text())['model_size'] == 'small'
+
+
+def test_metadata_voice_id_matches_tts_voice(tmp_path, monkeypatch):
+    from modules.voiceover import DEFAULT_VOICE_ID
+    monkeypatch.delenv('ELEVENLABS_VOICE_ID', raising=False)
+    args = Namespace(script=str(SCRIPT), background=str(BACKGROUND), output_dir=str(tmp_path), dry_run=True, test_mode=True, verbose=False, keep_temp=False, thumbnail=False, model_size='tiny', compress=False, cleanup_old=0, json=False, strict=False, max_length=0)
+    pipeline.run_pipeline(args)
+    meta = json.loads((tmp_path / 'metadata.json').read_text())
+    assert meta['voice_id'] == DEFAULT_VOICE_ID
+
+
+def test_api_jobs_use_configured_subtitle_settings(tmp_path, monkeypatch):
+    import worker
+    monkeypatch.setattr(pipeline, 'SUBTITLE_BACKEND', 'tts')
+    monkeypatch.setattr(pipeline, 'SUBTITLE_OVERLAY', True)
+    args = worker.build_args('job', SCRIPT, BACKGROUND, {'dry_run': True, 'test_mode': True, 'model_size': 'tiny'})
+    args.output_dir = str(tmp_path)
+    pipeline.run_pipeline(args)
+    meta = json.loads((tmp_path / 'metadata.json').read_text())
+    assert meta['flags']['subtitle_backend'] == 'tts'
+    assert meta['flags']['subtitle_overlay'] is True
@@ -0,0 +1,49 @@
+import asyncio
+
+from modules.job_store import MemoryJobStore
+from modules.progress import ProgressBroker, ProgressReporter
+from modules.render_video import parse_progress
+
+
+def test_broker_fans_out_to_every_subscriber():
+    async def scenario():
+        broker = ProgressBroker()
+        subs = [broker.subscribe("j1") for _ in range(3)]
+        other = broker.subscribe("j2")
+        store = MemoryJobStore()
+        store.create("j1")
+        reporter = ProgressReporter(store, "j1", broker)
+        reporter.stage("render", "started")
+        reporter.render(10)
+        received = [[await s.get(1), await s.get(1)] for s in subs]
+        assert await other.get(0.05) is None
+        for s in subs + [other]:
+            s.close()
+        assert broker.subscriber_count("j1") == 0
+        return received, store.get("j1")["progress"]
+
+    received, snapshot = asyncio.run(scenario())
+    assert all(r == received[0] for r in received)
+    assert [e["seq"] for e in received[0]] == [1, 2]
+    assert received[0][1] == {"type": "render", "percent": 10, "seq": 2}
+    assert snapshot["stages"] == {"render": "started"} and snapshot["render_percent"] == 10
+
+
+def test_render_percent_is_persisted_in_steps():
+    store = MemoryJobStore()
+    store.create("j1")
+    reporter = ProgressReporter(store, "j1", ProgressBroker())
+    reporter.render(1)
+    reporter.render(3)
+    assert store.get("j1")["progress"]["render_percent"] == 1
+    reporter.render(6)
+    assert store.get("j1")["progress"]["render_percent"] == 6
+
+
+def test_parse_ffmpeg_progress():
+    lines = [
+        "frame=10\n", "out_time_us=1000000\n", "progress=continue\n",
+        "out_time_us=1200000\n", "out_time_us=N/A\n",
+        "out_time_us=5000000\n", "out_time_us=11000000\n", "progress=end\n",
+    ]
+    assert list(parse_progress(lines, 10.0)) == [10, 12, 50, 99, 100]
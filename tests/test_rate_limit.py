@@ -0,0 +1,39 @@
+from modules.rate_limit import Limit, MemoryBucketStore, RateLimiter, SQLiteBucketStore, parse_rules
+
+
+def test_token_bucket_refills_and_reports_wait():
+    limit = Limit(2, 10)
+    tokens, wait = limit.take(None, None, 0.0)
+    tokens, wait = limit.take(tokens, 0.0, 0.0)
+    assert wait == 0 and tokens == 0
+    tokens, wait = limit.take(tokens, 0.0, 1.0)
+    assert wait == 4.0
+    # refused requests take nothing, so the wait keeps shrinking
+    assert limit.take(tokens, 1.0, 5.0)[1] == 0
+
+
+def test_rules_with_per_key_override():
+    rules = parse_rules("/generate=5/60, /generate@10.0.0.1=50/60")
+    limiter = RateLimiter(rules, MemoryBucketStore(600))
+    assert limiter.limit_for("/generate", "10.0.0.1").capacity == 50
+    assert limiter.limit_for("/generate", "other").capacity == 5
+    assert limiter.limit_for("/status", "other") is None
+    assert [limiter.check("/generate", "a") for _ in range(6)] == [0, 0, 0, 0, 0, 12]
+
+
+def test_sqlite_buckets_are_shared_between_processes(tmp_path):
+    rules = parse_rules("/generate=2/60")
+    first = RateLimiter(rules, SQLiteBucketStore(tmp_path / "rl.db", 600))
+    second = RateLimiter(rules, SQLiteBucketStore(tmp_path / "rl.db", 600))
+    assert first.check("/generate", "ip") == 0
+    assert second.check("/generate", "ip") == 0
+    assert first.check("/generate", "ip") > 0
+
+
+def test_idle_buckets_are_evicted():
+    store = MemoryBucketStore(idle_seconds=60)
+    limit = Limit(5, 60)
+    store.take("a", limit, 0.0)
+    store.take("b", limit, 30.0)
+    store.take("c", limit, 100.0)
+    assert len(store) == 1
@@ -1,4 +1,5 @@
 import time
+import json
 import os
 from pathlib import Path
 from fastapi.testclient import TestClient
@@ -63,6 +64,23 @@ def test_rate_limiting(tmp_path):
     assert extra.status_code == 429
 
 
+def test_rate_limit_check_runs_off_the_event_loop(monkeypatch):
+    import asyncio
+    loops = []
+
+    def check(route, key):
+        try:
+            loops.append(asyncio.get_running_loop())
+        except RuntimeError:
+            loops.append(None)
+        return 7
+
+    monkeypatch.setattr(server.RATE_LIMITS, 'check', check)
+    resp = client.post('/backgrounds', files={'background_file': ('b.webm', b'x', 'video/webm')})
+    assert resp.status_code == 429 and resp.headers['Retry-After'] == '7'
+    assert loops == [None]
+
+
 def test_cleanup_function(tmp_path):
     old_folder = Path('output/oldjob')
     old_folder.mkdir(parents=True, exist_ok=True)
@@ -72,3 +90,187 @@ def test_cleanup_function(tmp_path):
     os.utime(old_folder, (past, past))
     server.cleanup_output_dir(age_seconds=0)
     assert not old_folder.exists()
+
+
+def test_oversized_upload_rejected(monkeypatch):
+    monkeypatch.setattr(server, 'MAX_UPLOAD_MB', 1)
+    monkeypatch.setattr(server, 'UPLOAD_CHUNK_BYTES', 64 * 1024)
+    before = set(server.TEMP_UPLOAD.iterdir())
+    resp = client.post(
+        '/generate',
+        files={'script_file': ('a.txt', b'hello', 'text/plain'),
+               'background_file': ('big.webm', b'x' * (2 * 1024 * 1024), 'video/webm')},
+        data={'test_mode': '1', 'dry_run': '1'}
+    )
+    assert resp.status_code == 413
+    assert set(server.TEMP_UPLOAD.iterdir()) == before
+
+
+def test_upload_hash_recorded(tmp_path):
+    import hashlib
+    job_id = submit_job()
+    job = server.JOBS.get(job_id)
+    assert job['background_sha256'] == hashlib.sha256(BACKGROUND.read_bytes()).hexdigest()
+    assert job['background_bytes'] == BACKGROUND.stat().st_size
+    wait_for_completion(job_id)
+
+
+def test_background_registry(tmp_path, monkeypatch):
+    from modules import backgrounds
+    monkeypatch.setattr(backgrounds, 'BACKGROUND_CACHE_DIR', tmp_path / 'cache')
+    info = {'duration': 60.0, 'keyframes': [0.0], 'width': 1080, 'height': 1920}
+    monkeypatch.setattr(backgrounds, 'probe_video', lambda path: info)
+    data = BACKGROUND.read_bytes()
+    first = client.post('/backgrounds', files={'background_file': ('bg.webm', data, 'video/webm')})
+    assert first.status_code == 201
+    second = client.post('/backgrounds', files={'background_file': ('other.webm', data, 'video/webm')})
+    assert second.status_code == 200 and second.json()['duplicate']
+    asset_id = first.json()['id']
+    assert client.get(f'/backgrounds/{asset_id}').json()['duration'] == 60.0
+    assert client.get('/backgrounds/unknown').status_code == 404
+
+    with SCRIPT.open('rb') as sf:
+        resp = client.post(
+            '/generate',
+            files={'script_file': ('script.txt', sf.read(), 'text/plain')},
+            data={'background_id': asset_id, 'test_mode': '1', 'dry_run': '1'}
+        )
+    assert resp.status_code == 200
+    job_id = resp.json()['job_id']
+    assert server.JOBS.get(job_id)['background_sha256'] == asset_id
+    wait_for_completion(job_id)
+    # the job's files are removed just after its status is recorded
+    job_link = Path(server.JOBS.get(job_id)['background_path'])
+    for _ in range(40):
+        if not job_link.exists():
+            break
+        time.sleep(0.05)
+    assert backgrounds.asset_path(asset_id).exists()
+    # the job's hard link is gone and so is its hash index entry
+    indexed = [p for (p,) in backgrounds._hash_db().execute('SELECT path FROM hashes')]
+    assert not [p for p in indexed if job_id in p]
+
+
+def test_full_queue_returns_503(monkeypatch):
+    from modules import admission
+    from modules.job_store import MemoryJobStore
+    monkeypatch.setattr(server, 'JOBS', MemoryJobStore())
+    monkeypatch.setattr(server, 'JOB_EXECUTION', 'queue')
+    monkeypatch.setattr(admission, 'MAX_QUEUE_DEPTH', 2)
+    files = {'script_file': ('a.txt', b'hello', 'text/plain'),
+             'background_file': ('b.webm', b'x', 'video/webm')}
+    first = client.post('/generate', files=files, data={'test_mode': '1'})
+    second = client.post('/generate', files=files, data={'test_mode': '1'})
+    assert first.json()['queue_position'] == 1 and second.json()['queue_position'] == 2
+    assert second.json()['eta_seconds'] > 0
+    assert client.get(f"/status/{second.json()['job_id']}").json()['queue_position'] == 2
+    assert client.get('/ready').status_code == 503
+    full = client.post('/generate', files=files, data={'test_mode': '1'})
+    assert full.status_code == 503
+    assert int(full.headers['Retry-After']) >= 1
+    assert client.get('/health').status_code == 200
+    for job in server.JOBS.list_by_status('queued'):
+        os.unlink(job['script_path'])
+        os.unlink(job['background_path'])
+
+
+def test_ready_needs_a_live_worker_in_queue_mode(monkeypatch):
+    from modules.job_store import MemoryJobStore
+    monkeypatch.setattr(server, 'JOBS', MemoryJobStore())
+    monkeypatch.setattr(server, 'JOB_EXECUTION', 'queue')
+    resp = client.get('/ready')
+    assert resp.status_code == 503 and resp.json()['workers'] == 0 and not resp.json()['saturated']
+    server.JOBS.mark_worker_alive('w1')
+    ready = client.get('/ready')
+    assert ready.status_code == 200 and ready.json()['workers'] == 1
+
+
+def test_generate_removes_uploads_when_the_background_fails(monkeypatch):
+    import pytest
+    before = set(server.TEMP_UPLOAD.iterdir())
+    asset = {'id': 'a' * 64, 'file': 'bg.webm', 'bytes': 1}
+    monkeypatch.setattr(server, 'get_asset', lambda asset_id: asset)
+
+    def vanished(asset_id, dest):
+        raise FileNotFoundError(asset_id)
+
+    monkeypatch.setattr(server, 'checkout_asset', vanished)
+    resp = client.post('/generate', files={'script_file': ('a.txt', b'hello', 'text/plain')},
+                       data={'background_id': asset['id'], 'test_mode': '1'})
+    assert resp.status_code == 404
+    assert not set(server.TEMP_UPLOAD.iterdir()) - before
+
+    def broken(path, sha):
+        raise RuntimeError('index unavailable')
+
+    monkeypatch.setattr(server, 'record_hash', broken)
+    files = {'script_file': ('a.txt', b'hello', 'text/plain'),
+             'background_file': ('b.webm', b'x', 'video/webm')}
+    with pytest.raises(RuntimeError):
+        client.post('/generate', files=files, data={'test_mode': '1'})
+    assert not set(server.TEMP_UPLOAD.iterdir()) - before
+
+
+def test_generate_rejects_unknown_offset():
+    files = {'script_file': ('a.txt', b'hello', 'text/plain'),
+             'background_file': ('b.webm', b'x', 'video/webm')}
+    resp = client.post('/generate', files=files, data={'test_mode': '1', 'bg_offset': 'middle'})
+    assert resp.status_code == 400 and 'seeded' in resp.json()['detail']
+
+
+def test_orphaned_inline_jobs_do_not_fill_the_queue(monkeypatch, tmp_path):
+    from modules import admission
+    from modules.job_store import MemoryJobStore
+    store = MemoryJobStore()
+    monkeypatch.setattr(server, 'JOBS', store)
+    monkeypatch.setattr(admission, 'MAX_QUEUE_DEPTH', 1)
+    script = tmp_path / 'script.txt'
+    script.write_text('hello')
+    # left behind by a server process that was killed mid-job
+    store.create('orphan', owner='dead-server', lease_seconds=0, script_path=str(script))
+    store.create('running', owner=server.INLINE_OWNER)
+    store.transition('running', ('queued',), 'processing')
+    assert client.get('/ready').status_code == 200
+    server.fail_orphaned_jobs()
+    assert store.get('orphan')['status'] == 'failed' and not script.exists()
+    assert store.get('running')['status'] == 'processing'
+
+
+def _read_events(resp):
+    events = []
+    for block in resp.iter_text():
+        for chunk in block.split('\n\n'):
+            lines = dict(l.split(': ', 1) for l in chunk.splitlines() if l and not l.startswith(':'))
+            if lines:
+                events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def test_events_stream_progress_from_job_store(monkeypatch):
+    from modules.job_store import MemoryJobStore
+    from modules.progress import ProgressReporter
+    store = MemoryJobStore()
+    monkeypatch.setattr(server, 'JOBS', store)
+    monkeypatch.setattr(server, 'PROGRESS_POLL_SECONDS', 0.05)
+    store.create('j1', status='processing')
+    reporter = ProgressReporter(store, 'j1')
+    reporter.stage('tts', 'done')
+
+    def finish():
+        time.sleep(0.2)
+        reporter.render(50)
+        reporter.render(100)
+        store.transition('j1', ('processing',), 'complete')
+        reporter.status('complete')
+
+    import threading
+    threading.Thread(target=finish).start()
+    with client.stream('GET', '/events/j1') as resp:
+        assert resp.headers['content-type'].startswith('text/event-stream')
+        events = _read_events(resp)
+    assert events[0] == ('snapshot', {'status': 'processing', 'progress': {
+        'seq': 1, 'stages': {'tts': 'done'}, 'render_percent': None, 'status': None}})
+    assert events[-1][1]['status'] == 'complete'
+    seqs = [data.get('seq', data.get('progress', {}).get('seq')) for _, data in events]
+    assert seqs == sorted(set(seqs))
+    assert client.get('/events/missing').status_code == 404
@@ -0,0 +1,58 @@
+from pathlib import Path
+
+from modules import render_video
+from modules.subtitle_overlay import parse_ass, plan_overlay, write_ffconcat
+from modules.utils import save_ass_subtitles
+
+
+def test_identical_words_share_a_sprite(tmp_path):
+    subs = tmp_path / 'subs.ass'
+    save_ass_subtitles([
+        {'start': 0.5, 'end': 1.0, 'word': 'go'},
+        {'start': 1.0, 'end': 1.5, 'word': 'team'},
+        {'start': 2.0, 'end': 2.5, 'word': 'go!'},
+    ], subs, group=0)
+    header, events = parse_ass(subs)
+    assert header.rstrip().endswith('Text')
+    sprites, timeline = plan_overlay(events)
+    assert [text for _, text in sprites] == ['go\\N', 'team\\N']
+    assert timeline == [(None, 0.5), (0, 0.5), (1, 0.5), (None, 0.5), (0, 0.5)]
+
+    playlist = write_ffconcat(timeline, len(sprites), tmp_path).read_text()
+    assert playlist.count("00002.png'") == 4  # blank frame: two gaps plus the trailer
+    assert 'duration 0.500' in playlist
+
+
+def test_karaoke_phrase_expands_into_highlight_states(tmp_path):
+    subs = tmp_path / 'subs.ass'
+    save_ass_subtitles([
+        {'start': 0.0, 'end': 0.4, 'word': 'one'},
+        {'start': 0.4, 'end': 1.0, 'word': 'two'},
+    ], subs, group=4)
+    sprites, timeline = plan_overlay(parse_ass(subs)[1])
+    assert len(sprites) == 2
+    # word i is highlighted once the durations before it (all 0) elapse; word i+1 never is
+    assert sprites[0][1].startswith('{\\k1000000}one {\\k1000000}two')
+    assert sprites[1][1].startswith('{\\k0}one {\\k1000000}two')
+    assert timeline == [(0, 0.4), (1, 0.6)]
+
+
+def test_overlay_render_composites_sprite_playlist(tmp_path, monkeypatch):
+    for name in ('bg.mp4', 'voice.wav'):
+        (tmp_path / name).write_bytes(b'x')
+    subs = tmp_path / 'subs.ass'
+    save_ass_subtitles([{'start': 0.0, 'end': 1.0, 'word': 'hi'}], subs, group=0)
+    commands = []
+
+    def fake_build(subtitle_file, out_dir):
+        return Path(out_dir) / 'overlay.ffconcat'
+
+    monkeypatch.setattr(render_video, 'build_overlay', fake_build)
+    monkeypatch.setattr(render_video.subprocess, 'run', lambda cmd, check: commands.append(cmd))
+    render_video.render_final_video(tmp_path / 'bg.mp4', tmp_path / 'voice.wav', subs, tmp_path / 'out.mp4', overlay=True)
+
+    cmd = commands[0]
+    assert cmd[cmd.index('-f') + 1] == 'concat'
+    graph = cmd[cmd.index('-filter_complex') + 1]
+    assert 'subtitles=' not in graph and 'overlay=' in graph
+    assert not list(tmp_path.glob('.overlay-*'))
@@ -0,0 +1,41 @@
+import os
+
+from modules.tts_cache import TTSCache, make_key
+
+
+def test_key_ignores_whitespace_but_not_voice():
+    settings = {"stability": 0.5}
+    assert make_key("Hello  world\n", "v1", settings) == make_key("Hello world", "v1", settings)
+    assert make_key("Hello world", "v1", settings) != make_key("Hello world", "v2", settings)
+
+
+def test_put_fetch_and_evict(tmp_path):
+    cache = TTSCache(tmp_path / "cache", max_bytes=10)
+    src = tmp_path / "a.wav"
+    src.write_bytes(b"x" * 6)
+    cache.put("aa11", src)
+    os.utime(cache.path_for("aa11"), (1, 1))
+    cache.put("bb22", src)
+    # oldest entry is evicted to stay under the size limit
+    assert cache.get("aa11") is None
+    dest = tmp_path / "out.wav"
+    assert cache.fetch("bb22", dest)
+    assert dest.read_bytes() == b"x" * 6
+
+
+def test_put_scans_only_when_the_total_crosses_the_limit(tmp_path, monkeypatch):
+    cache = TTSCache(tmp_path / "cache", max_bytes=20)
+    src = tmp_path / "a.wav"
+    src.write_bytes(b"x" * 6)
+    scans = []
+    evict = cache.evict
+    monkeypatch.setattr(cache, "evict", lambda: scans.append(1) or evict())
+    cache.put("aa11", src)
+    assert len(scans) == 1  # first put learns the cache's size
+    cache.put("bb22", src)
+    cache.put("bb22", src)  # replacing an entry does not grow the total
+    cache.put("cc33", src)
+    assert len(scans) == 1
+    cache.put("dd44", src)
+    assert len(scans) == 2
+    assert sum(1 for k in ("aa11", "bb22", "cc33", "dd44") if cache.get(k)) == 3
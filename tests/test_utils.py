@@ -10,3 +10,37 @@ def test_save_ass_subtitles(tmp_path):
     output = tmp_path / "subs.ass"
     save_ass_subtitles(segments, output)
     assert output.exists()
+
+
+def test_ass_header_comes_from_style_file(tmp_path):
+    output = tmp_path / "subs.ass"
+    save_ass_subtitles([{"start": 0.0, "end": 1.0, "word": "hi!"}], output, group=0)
+    text = output.read_text(encoding="utf-8")
+    style = (Path("assets/styles/default.ass")).read_text(encoding="utf-8")
+    assert text.startswith(style)
+    assert text.endswith("Dialogue: 0,0:00:00.00,0:00:01.00,Default,,0,0,0,,hi\\N\n")
+
+
+def test_grouped_subtitles_use_karaoke_phrases(tmp_path):
+    segments = [
+        {"start": 0.0, "end": 0.3, "word": "One"},
+        {"start": 0.4, "end": 0.7, "word": "two"},
+        {"start": 0.7, "end": 1.0, "word": "three."},
+        {"start": 1.2, "end": 1.5, "word": "Four"},
+        {"start": 3.0, "end": 3.5, "word": "five"},
+    ]
+    output = tmp_path / "subs.ass"
+    save_ass_subtitles(segments, output, group=4)
+    events = [l for l in output.read_text(encoding="utf-8").splitlines() if l.startswith("Dialogue")]
+    assert events == [
+        "Dialogue: 0,0:00:00.00,0:00:01.00,Default,,0,0,0,,{\\k40}One {\\k30}two {\\k30}three\\N",
+        "Dialogue: 0,0:00:01.20,0:00:01.50,Default,,0,0,0,,{\\k30}Four\\N",
+        "Dialogue: 0,0:00:03.00,0:00:03.50,Default,,0,0,0,,{\\k50}five\\N",
+    ]
+
+
+def test_ass_timestamp_rounds_to_the_nearest_centisecond():
+    from modules.utils import ass_timestamp
+    assert ass_timestamp(0.29) == '0:00:00.29'
+    assert ass_timestamp(1 / 30) == '0:00:00.03'
+    assert ass_timestamp(3723.456) == '1:02:03.46'
@@ -8,3 +8,132 @@ def test_generate_voiceover(tmp_path):
     output = tmp_path / "voice.wav"
     generate_voiceover("Hello world", output, test_mode=True)
     assert output.exists()
+
+
+def test_generate_voiceover_cache_hit(tmp_path, monkeypatch):
+    from modules import voiceover
+    from modules.tts_cache import TTSCache
+
+    cache = TTSCache(tmp_path / "cache", max_bytes=2**20)
+    monkeypatch.setattr(voiceover, "get_tts_cache", lambda: cache)
+    calls = []
+
+    def fake_api(text, output_path):
+        calls.append(text)
+        voiceover.generate_dummy_audio(output_path)
+        return True
+
+    monkeypatch.setattr(voiceover, "call_elevenlabs_api", fake_api)
+    first = generate_voiceover("Hello world", tmp_path / "a.wav", test_mode=False)
+    second = generate_voiceover("Hello  world", tmp_path / "b.wav", test_mode=False)
+    assert first["cache"] == "miss" and second["cache"] == "hit"
+    assert len(calls) == 1
+    assert (tmp_path / "b.wav").read_bytes() == (tmp_path / "a.wav").read_bytes()
+
+
+def _wav_bytes(seconds=0.5, rate=44100, channels=1):
+    import io
+    import wave
+
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(bytes(int(rate * seconds) * 2 * channels))
+    return buf.getvalue()
+
+
+def test_chunked_voiceover_against_fake_server(tmp_path, monkeypatch):
+    import json
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from modules import voiceover
+
+    received = []
+    failed_once = set()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            received.append(body["text"])
+            # first attempt for the second chunk fails and must be retried alone
+            if body["text"].startswith("Second") and "second" not in failed_once:
+                failed_once.add("second")
+                self.send_response(500)
+                self.end_headers()
+                return
+            # not the pipeline's format, so it has to be resampled rather than written as is
+            data = _wav_bytes(rate=22050, channels=2)
+            self.send_response(200)
+            self.send_header("Content-Type", "audio/wav")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        monkeypatch.setenv("ELEVENLABS_API_KEY", "test")
+        monkeypatch.setattr(voiceover, "ELEVENLABS_API_URL", f"http://127.0.0.1:{server.server_port}/v1")
+        monkeypatch.setattr(voiceover, "TTS_CHUNK_CHARS", 30)
+        monkeypatch.setattr(voiceover, "get_tts_cache", lambda: None)
+        output = tmp_path / "voice.wav"
+        info = generate_voiceover("First chunk of text.\n\nSecond chunk of text.", output, test_mode=False)
+    finally:
+        server.shutdown()
+
+    import wave
+
+    assert info["chunks"] == 2
+    assert len(received) == 3
+    with wave.open(str(output)) as wf:
+        # resampling may drop a frame per chunk
+        assert abs(wf.getnframes() - 2 * int(44100 * 0.5)) <= 2
+        assert wf.getframerate() == 44100 and wf.getnchannels() == 1
+
+
+def test_decode_to_wav_streams_and_resamples(tmp_path):
+    import io
+    import shutil
+    import wave
+    import pytest
+    from modules.voiceover import decode_to_wav
+
+    if shutil.which("ffmpeg") is None:
+        pytest.skip("ffmpeg not available")
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(2)
+        wf.setsampwidth(2)
+        wf.setframerate(22050)
+        wf.writeframes(bytes(22050 * 4))
+    data = buf.getvalue()
+    output = tmp_path / "voice.wav"
+    decode_to_wav((data[i:i + 4096] for i in range(0, len(data), 4096)), output)
+    with wave.open(str(output)) as wf:
+        assert wf.getframerate() == 44100
+        assert wf.getnchannels() == 1
+
+
+def test_dummy_audio_duration_and_pattern(tmp_path):
+    import wave
+    from modules.voiceover import generate_dummy_audio
+
+    output = tmp_path / "tone.wav"
+    generate_dummy_audio(output, 3.5, "tone")
+    with wave.open(str(output)) as wf:
+        assert wf.getnframes() == int(44100 * 3.5)
+        assert any(wf.readframes(1000))
+
+
+def test_test_mode_audio_follows_script_length(tmp_path):
+    import wave
+
+    output = tmp_path / "voice.wav"
+    generate_voiceover("word " * 360, output, test_mode=True)
+    with wave.open(str(output)) as wf:
+        assert wf.getnframes() == 44100 * 120
@@ -0,0 +1,79 @@
+import threading
+import time
+from pathlib import Path
+
+import worker
+from modules.job_store import MemoryJobStore
+
+
+def test_worker_runs_leased_job(tmp_path, monkeypatch):
+    script = tmp_path / "script.txt"
+    background = tmp_path / "bg.webm"
+    script.write_text("hi")
+    background.write_bytes(b"x")
+    seen = {}
+
+    def fake_run(args, job_id=None, started_at=None, progress=None, cancel=None):
+        seen.update(script=args.script, test_mode=args.test_mode, started_at=started_at)
+        progress.stage("tts", "done")
+        out = tmp_path / job_id
+        out.mkdir()
+        return out
+
+    monkeypatch.setattr(worker.pipeline, "run_pipeline", fake_run)
+    store = MemoryJobStore()
+    store.create("j1", script_path=str(script), background_path=str(background), params={"test_mode": True})
+    w = worker.Worker(store, lease_seconds=60)
+
+    assert w.run_once()
+    assert not w.run_once()
+    job = store.get("j1")
+    assert job["status"] == "complete" and job["lease_owner"] == w.owner
+    assert seen["script"] == str(script) and seen["test_mode"] and seen["started_at"]
+    assert not script.exists() and not background.exists()
+    assert Path(job["output_dir"]).is_dir()
+    assert job["progress"]["stages"] == {"tts": "done"} and job["progress"]["status"] == "complete"
+
+
+def test_stale_worker_cannot_overwrite_new_owner(tmp_path, monkeypatch):
+    script = tmp_path / "script.txt"
+    background = tmp_path / "bg.webm"
+    script.write_text("hi")
+    background.write_bytes(b"x")
+    store = MemoryJobStore()
+    store.create("j1", script_path=str(script), background_path=str(background), params={})
+    # every lease and renewal it takes is already expired, so another worker can always claim the job
+    stale = worker.Worker(store, lease_seconds=-1)
+
+    def run_while_taken_over(args, job_id=None, started_at=None, progress=None, cancel=None):
+        # the lease expired and another worker claimed the job meanwhile
+        assert store.lease("w2", 60)["lease_owner"] == "w2"
+        raise RuntimeError("RENDER_FAIL")
+
+    monkeypatch.setattr(worker.pipeline, "run_pipeline", run_while_taken_over)
+    assert stale.run_once()
+    job = store.get("j1")
+    assert job["status"] == "processing" and job["lease_owner"] == "w2"
+    assert script.exists() and background.exists()
+
+
+def test_build_args_uses_requested_or_default_offset(monkeypatch):
+    monkeypatch.setattr(worker, "BACKGROUND_OFFSET", "seeded")
+    assert worker.build_args("j", "s.txt", "b.webm", {}).bg_offset == "seeded"
+    assert worker.build_args("j", "s.txt", "b.webm", {"bg_offset": "random"}).bg_offset == "random"
+
+
+def test_idle_worker_reports_itself_alive():
+    store = MemoryJobStore()
+    w = worker.Worker(store, concurrency=1, poll_seconds=0.01)
+    runner = threading.Thread(target=w.run)
+    runner.start()
+    try:
+        for _ in range(100):
+            if store.live_workers(60):
+                break
+            time.sleep(0.01)
+        assert store.live_workers(60) == 1
+    finally:
+        w.stop()
+        runner.join()
@@ -0,0 +1,16 @@
+import pytest
+
+from modules.workspace import JobWorkspace
+
+
+def test_quota_guard(tmp_path, monkeypatch):
+    monkeypatch.setenv("WORKSPACE_ROOT", str(tmp_path))
+    ws = JobWorkspace("job 1", quota_bytes=10)
+    assert ws.path.parent == tmp_path
+    (ws / "small.bin").write_bytes(b"x" * 5)
+    ws.check_quota()
+    (ws / "big.bin").write_bytes(b"x" * 20)
+    with pytest.raises(RuntimeError, match="WORKSPACE_QUOTA"):
+        ws.check_quota()
+    ws.cleanup()
+    assert not ws.path.exists()
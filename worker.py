@@ -0,0 +1,197 @@
+"""Worker process that leases queued jobs from the shared job store and runs them.
+
+Start one per machine with ``python -m worker``; ``WORKER_CONCURRENCY`` jobs
+run at once in that process, sharing its WhisperX models, however many web
+workers are enqueueing.
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import pipeline
+from modules.asr_batcher import start_asr_batcher, stop_asr_batcher
+from modules.backgrounds import BACKGROUND_OFFSET, forget_hash
+from modules.job_store import JOB_LEASE_SECONDS, get_job_store
+from modules.model_pool import warm_models
+from modules.progress import ProgressReporter
+from modules.utils import get_logger, get_test_mode, OUTPUT_DIR
+
+logger = get_logger(__name__)
+
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "2"))
+WORKER_POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", "1"))
+
+WARM_MODELS = [m for m in os.getenv("WHISPERX_WARM_MODELS", "").split(",") if m]
+WARM_LANGUAGES = [l for l in os.getenv("WHISPERX_WARM_LANGUAGES", "").split(",") if l]
+
+
+def _utc(ts: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts))
+
+
+def build_args(job_id: str, script_path, background_path, params: dict) -> argparse.Namespace:
+    return argparse.Namespace(
+        script=str(script_path),
+        background=str(background_path),
+        output_dir=str(Path(OUTPUT_DIR) / job_id),
+        dry_run=params.get("dry_run", False),
+        test_mode=params.get("test_mode", False),
+        verbose=params.get("verbose", False),
+        keep_temp=params.get("keep_temp", False),
+        thumbnail=params.get("thumbnail", False),
+        model_size=params.get("model_size", "large-v3"),
+        compress=False,
+        cleanup_old=0,
+        json=params.get("json", False),
+        strict=params.get("strict", False),
+        max_length=params.get("max_length", 0),
+        bg_offset=params.get("bg_offset") or BACKGROUND_OFFSET,
+    )
+
+
+def _stage_timings(out_dir) -> dict:
+    # kept on the job so the server can estimate queue wait times
+    try:
+        with open(Path(out_dir) / "log.json", "r", encoding="utf-8") as f:
+            return json.load(f).get("stage_timings", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def execute_job(store, job_id: str, script_path, background_path, params: dict, started_at: str,
+                *, owner: str | None = None, cancel=None):
+    """Run a job that is already ``processing`` and record its outcome.
+
+    A leased job passes its ``owner``: the outcome is only recorded, and the
+    inputs only deleted, while that worker still holds the lease. Otherwise
+    the job now belongs to another worker and this run's result is dropped.
+    Setting ``cancel`` stops the pipeline before its next stage.
+    """
+    start_ts = time.time()
+    args = build_args(job_id, script_path, background_path, params)
+    progress = ProgressReporter(store, job_id)
+    progress.status("processing")
+    try:
+        out_dir = pipeline.run_pipeline(args, job_id=job_id, started_at=started_at, progress=progress, cancel=cancel)
+        (Path(out_dir) / "log.txt").write_text("Job log placeholder")
+        status, fields = "complete", {
+            "output_dir": str(out_dir),
+            "stage_timings": _stage_timings(out_dir),
+            "completed_at": _utc(time.time()),
+            "duration_seconds": int(time.time() - start_ts),
+        }
+    except Exception as e:
+        status, fields = "failed", {"error": str(e), "completed_at": _utc(time.time())}
+    if not store.transition(job_id, ("processing",), status, owner=owner, **fields) and owner is not None:
+        logger.warning(f"Job {job_id} was taken over by another worker; dropping this run's result")
+        return
+    progress.status(status, **({"error": fields["error"]} if status == "failed" else {}))
+    Path(script_path).unlink(missing_ok=True)
+    forget_hash(background_path)
+    Path(background_path).unlink(missing_ok=True)
+
+
+class Worker:
+    """Lease loop: claim a job, keep its lease alive while it runs, repeat."""
+
+    def __init__(self, store, *, concurrency: int = WORKER_CONCURRENCY, lease_seconds: float = JOB_LEASE_SECONDS,
+                 poll_seconds: float = WORKER_POLL_SECONDS):
+        self.store = store
+        self.concurrency = max(1, concurrency)
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+
+    def stop(self):
+        """Stop leasing new jobs; running jobs finish first."""
+        self._stop.set()
+
+    def run_once(self) -> bool:
+        """Lease and run one job; ``False`` when the queue was empty."""
+        started_at = _utc(time.time())
+        job = self.store.lease(self.owner, self.lease_seconds, started_at=started_at)
+        if job is None:
+            return False
+        job_id = job["job_id"]
+        if job.get("attempts", 1) > 1:
+            logger.warning(f"Job {job_id} lost its previous worker; retrying (attempt {job['attempts']})")
+        beat_stop = threading.Event()
+        lease_lost = threading.Event()
+        beat = threading.Thread(target=self._heartbeat, args=(job_id, beat_stop, lease_lost), daemon=True)
+        beat.start()
+        try:
+            execute_job(
+                self.store, job_id, job["script_path"], job["background_path"], job.get("params", {}), started_at,
+                owner=self.owner, cancel=lease_lost,
+            )
+        finally:
+            beat_stop.set()
+            beat.join()
+        return True
+
+    def _heartbeat(self, job_id: str, stop: threading.Event, lost: threading.Event):
+        while not stop.wait(self.lease_seconds / 3):
+            if not self.store.heartbeat(job_id, self.owner, self.lease_seconds):
+                logger.warning(f"Lost the lease on job {job_id}; stopping it after the current stage")
+                lost.set()
+                return
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                ran = self.run_once()
+            except Exception as e:
+                logger.error(f"Worker loop error: {e}")
+                ran = False
+            if not ran:
+                self._stop.wait(self.poll_seconds)
+
+    def _presence(self):
+        # lets the web tier's /ready tell an idle worker from a dead one
+        while True:
+            try:
+                self.store.mark_worker_alive(self.owner)
+            except Exception as e:
+                logger.warning(f"Could not record worker heartbeat: {e}")
+            if self._stop.wait(self.lease_seconds / 3):
+                return
+
+    def run(self):
+        logger.info(f"Worker {self.owner} running {self.concurrency} job(s) at a time")
+        threading.Thread(target=self._presence, name="worker-presence", daemon=True).start()
+        threads = [
+            threading.Thread(target=self._loop, name=f"worker-{i}", daemon=True) for i in range(self.concurrency)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run queued video jobs")
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY, help="Jobs run at the same time")
+    args = parser.parse_args(argv)
+
+    if WARM_MODELS and not get_test_mode():
+        warm_models(WARM_MODELS, WARM_LANGUAGES)
+    start_asr_batcher()
+    worker = Worker(get_job_store(), concurrency=args.concurrency)
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        worker.stop()
+    finally:
+        stop_asr_batcher()
+
+
+if __name__ == "__main__":
+    main()